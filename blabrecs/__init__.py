@@ -0,0 +1,5 @@
+"""
+Python tooling for BLABRECS: fake-word generation, dataset building and
+scoring helpers shared by the CNN training script (train_cnn.py) and the
+`python -m blabrecs` command line.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from blabrecs.cli import main
+
+sys.exit(main())
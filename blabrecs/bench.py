@@ -0,0 +1,195 @@
+"""
+Benchmarks for the hot paths: word generation, tokenization, CNN inference,
+Markov scoring and dictionary lookup.
+
+Every stage runs on the same fixed-seed synthetic words at each size, and is
+timed (best of `repeat` runs) and then run once more under `tracemalloc`
+for its peak memory. Results are plain JSON, so two runs (say, on two
+commits) can be compared with `compare`:
+
+    python -m blabrecs.bench --sizes 10000 1000000 --out bench.json
+    python -m blabrecs.bench --baseline bench.json --max-slowdown 0.1
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+DEFAULT_SIZES = (10_000, 1_000_000, 10_000_000)
+STAGES = ('generate', 'tokenize', 'predict', 'markov', 'lookup')
+SEED = 20210
+BENCH_DICTIONARY_SIZE = 200_000
+# The CNN runs at tens of thousands of words/sec, so 10M words would take
+# most of an hour with repeats; it is skipped above this size by default.
+DEFAULT_PREDICT_LIMIT = 1_000_000
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _stage_functions(stages, model_json, markov_edn, dictionary_sources):
+    """Map stage name -> callable taking the packed words, with setup done up front."""
+    vectorizer = CharVectorizer()
+    functions = {}
+    if 'generate' in stages:
+        functions['generate'] = lambda packed: generate_words(len(packed), letter_dist='english', seed=SEED)
+    if 'tokenize' in stages:
+        functions['tokenize'] = vectorizer.transform_packed
+    if 'predict' in stages:
+        from blabrecs.inference import NumpyModel
+        model = NumpyModel.load(model_json)
+        functions['predict'] = lambda packed: model.predict(vectorizer.transform_packed(packed))
+    if 'markov' in stages:
+        from blabrecs.markov import MarkovModel
+        functions['markov'] = MarkovModel.load(markov_edn).sufficiently_probable
+    if 'lookup' in stages:
+        from blabrecs.dictionary import DictionaryIndex
+        if dictionary_sources:
+            dictionary = DictionaryIndex.from_files(dictionary_sources)
+        else:
+            from blabrecs.packed import unpack_words
+            dictionary = DictionaryIndex.from_words(
+                unpack_words(generate_words(BENCH_DICTIONARY_SIZE, letter_dist='english', seed=SEED + 1)))
+        functions['lookup'] = dictionary.contains
+    return functions
+
+
+def measure(function, packed, repeat=3):
+    """Best wall time over `repeat` calls, then the peak traced memory of one more."""
+    seconds = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(packed)
+        seconds = min(seconds, time.perf_counter() - started)
+    tracemalloc.start()
+    try:
+        function(packed)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+
+def run(sizes=DEFAULT_SIZES, stages=STAGES, repeat=3, model_json='model.json', markov_edn='model.edn',
+        dictionary_sources=None, predict_limit=DEFAULT_PREDICT_LIMIT, verbose=True):
+    """Benchmark `stages` at every size in `sizes`.
+
+    # Arguments
+        sizes: word counts to benchmark.
+        stages: subset of `STAGES`.
+        repeat: timing runs per measurement (the fastest is kept).
+        model_json, markov_edn: models for the 'predict' and 'markov' stages.
+        dictionary_sources: word list files for the 'lookup' stage; by
+            default a fixed-seed synthetic dictionary is used so the result
+            does not depend on local files.
+        predict_limit: largest size the 'predict' stage runs at (None for
+            no limit).
+
+    # Returns
+        A dict with a 'meta' section (commit, versions, date) and a 'results'
+        list of `{'stage', 'size', 'seconds', 'words_per_second', 'peak_bytes'}`.
+    """
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"unknown stages {sorted(unknown)}, expected some of {STAGES}")
+    functions = _stage_functions(stages, model_json, markov_edn, dictionary_sources)
+    results = []
+    for size in sizes:
+        packed = generate_words(size, letter_dist='english', seed=SEED)
+        for stage in stages:
+            if stage == 'predict' and predict_limit is not None and size > predict_limit:
+                continue
+            seconds, peak = measure(functions[stage], packed, repeat)
+            results.append({'stage': stage, 'size': int(size), 'seconds': seconds,
+                            'words_per_second': size / seconds if seconds else float('inf'),
+                            'peak_bytes': int(peak)})
+            if verbose:
+                r = results[-1]
+                print(f"{stage:>9} {size:>10,d} words: {r['words_per_second']:>14,.0f} words/s, "
+                      f"peak {peak / 2**20:9.1f} MiB", flush=True)
+        del packed
+    meta = {'commit': _git_commit(), 'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'machine': platform.machine(), 'repeat': repeat}
+    return {'meta': meta, 'results': results}
+
+
+def compare(current, baseline, max_slowdown=0.1, max_memory_growth=0.25):
+    """Find the stages that got slower or hungrier than the baseline.
+
+    # Arguments
+        current, baseline: `run` results (or the JSON they were saved as).
+        max_slowdown: allowed fractional drop in words/sec.
+        max_memory_growth: allowed fractional growth in peak memory.
+
+    # Returns
+        A list of `{'stage', 'size', 'metric', 'baseline', 'current', 'change'}`
+        dicts, one per regression; empty if everything is within limits.
+    """
+    previous = {(r['stage'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        old = previous.get((r['stage'], r['size']))
+        if old is None:
+            continue
+        speed = r['words_per_second'] / old['words_per_second'] - 1
+        if speed < -max_slowdown:
+            regressions.append({'stage': r['stage'], 'size': r['size'], 'metric': 'words_per_second',
+                                'baseline': old['words_per_second'], 'current': r['words_per_second'],
+                                'change': speed})
+        if old['peak_bytes']:
+            memory = r['peak_bytes'] / old['peak_bytes'] - 1
+            if memory > max_memory_growth:
+                regressions.append({'stage': r['stage'], 'size': r['size'], 'metric': 'peak_bytes',
+                                    'baseline': old['peak_bytes'], 'current': r['peak_bytes'],
+                                    'change': memory})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m blabrecs.bench', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--model', default='model.json')
+    parser.add_argument('--markov', default='model.edn')
+    parser.add_argument('--predict-limit', type=int, default=DEFAULT_PREDICT_LIMIT)
+    parser.add_argument('--dictionary', nargs='*', help='word list files for the lookup stage')
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--max-slowdown', type=float, default=0.1)
+    parser.add_argument('--max-memory-growth', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.stages, args.repeat, args.model, args.markov, args.dictionary,
+                  args.predict_limit)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_slowdown, args.max_memory_growth)
+        for r in regressions:
+            print(f"REGRESSION {r['stage']} @ {r['size']:,d}: {r['metric']} "
+                  f"{r['baseline']:.4g} -> {r['current']:.4g} ({r['change']:+.1%})")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
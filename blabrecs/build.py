@@ -0,0 +1,182 @@
+"""
+Building the training dataset.
+
+OK, here's the big data pre-processing step: load our word lists, generate
+some fake words, label them both, tokenize everything and cache the result
+(see `blabrecs.dataset`). Nothing here imports TensorFlow.
+"""
+
+import os
+
+import numpy as np
+
+from blabrecs.dataset import Split, cached_dataset
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.packed import MAX_WORD_LENGTH, pack_words, unique_packed, unpack_words
+from blabrecs.trace import NullTracer
+from blabrecs.vectorize import CharVectorizer, fit_char_index
+from blabrecs.wordgen import generate_words_parallel
+from blabrecs.words import WORD_LISTS, loadData, saveTextData, wordStats
+
+DEFAULT_DATASET = {'random_dist': 'english_table',
+                   'char_list': 'english',
+                   'seed': 26890,
+                   'data_size': 336000,
+                   'validation_size': 84000,
+                   'test_data_size': 20000,
+                   'fake_words_multiplier': 6,
+                   'workers': 4}
+
+
+def makeUpSomeWords(random_dist='english_table', char_list='random',
+                    seed = 26890,
+                    data_size = 336000, # size for training
+                    validation_size = 84000, # size for validation
+                    test_data_size = 20000, # size for testing afterwards
+                    fake_words_multiplier = 6, # I'm not sure that it's a good idea to have so much more false examples compared to real examples, but it is more data...
+                    workers = 4, # processes for word generation; the output depends on this and the seed
+                    save_text = False,
+                    word_lists = WORD_LISTS,
+                    tracer = None):
+    tracer = tracer or NullTracer()
+
+    with tracer.stage("load_data") as stage:
+      loaded = [loadData(filename) for filename in word_lists]
+      stage['items'] = sum(len(words) for words in loaded)
+
+    print("Loaded Words")
+
+    with tracer.stage("dedupe_real_words") as stage:
+      # Sorted first so the shuffle below doesn't depend on set iteration order.
+      wordlist = sorted(set(word for words in loaded for word in words))
+      stage['items'] = len(wordlist)
+    del loaded
+
+    print("Unique-ify Words")
+
+    # One independent random stream each for the word list shuffle, the
+    # three sets of fake words and the three final shuffles.
+    shuffle_seed, train_seed, valid_seed, test_seed, *split_seeds = np.random.SeedSequence(seed).spawn(7)
+
+    wordlist = [wordlist[i] for i in np.random.default_rng(shuffle_seed).permutation(len(wordlist))]
+    print("Wordlist shuffled: " + str(len(wordlist)))
+    print(f"Using {(data_size + validation_size + test_data_size)} words.")
+    print("Data ratio: " + str((data_size + validation_size + test_data_size) / len(wordlist)))
+    print(wordlist[:100])
+
+    wordStats(wordlist)
+
+    print("Making up some words...")
+    with tracer.stage("generate_fake_words", workers=workers) as stage:
+      fakewords = generate_words_parallel(data_size * fake_words_multiplier, random_dist=random_dist, letter_dist=char_list, seed=train_seed, workers=workers)
+      print("Fake words!")
+      morefakewords = generate_words_parallel(validation_size * fake_words_multiplier, random_dist=random_dist, letter_dist=char_list, seed=valid_seed, workers=workers)
+      print("More fake words!")
+      evenmorefakewords = generate_words_parallel(test_data_size, random_dist=random_dist, letter_dist='english', seed=test_seed, workers=workers)
+      print("Even more fake words!")
+      stage['items'] = len(fakewords) + len(morefakewords) + len(evenmorefakewords)
+    print("Words generated: " + str(len(fakewords) + len(morefakewords) + len(evenmorefakewords)))
+
+    fake_lengths = [len(fakewords), len(morefakewords), len(evenmorefakewords)]
+    print(fake_lengths)
+    print("uniquify generated words...")
+    with tracer.stage("dedupe_fake_words", items=sum(fake_lengths)) as stage:
+      real_words = DictionaryIndex.from_words(wordlist)
+      def uniqueFakeWords(packed):
+        packed = unique_packed(packed)
+        return unpack_words(packed[~real_words.contains(packed)])
+      fakewords = uniqueFakeWords(fakewords)
+      morefakewords = uniqueFakeWords(morefakewords)
+      evenmorefakewords = uniqueFakeWords(evenmorefakewords)
+      stage['kept'] = len(fakewords) + len(morefakewords) + len(evenmorefakewords)
+    print("...done. Removed words:")
+    print(f"1: {fake_lengths[0] - len(fakewords)}")
+    print(f"2: {fake_lengths[1] - len(morefakewords)}")
+    print(f"3: {fake_lengths[2] - len(evenmorefakewords)}")
+    print([len(fakewords), len(morefakewords), len(evenmorefakewords)])
+
+    train_data = wordlist[:data_size] + fakewords
+    train_labels = [True for n in range(data_size)] + [False for n in fakewords]
+    valid_data = wordlist[data_size:data_size + validation_size] + morefakewords
+    valid_labels = [True for n in range(validation_size)] + [False for n in morefakewords]
+    test_data = wordlist[data_size + validation_size:data_size + validation_size + test_data_size] + evenmorefakewords
+    test_labels = [True for n in range(test_data_size)] + [False for n in evenmorefakewords]
+
+    print("Labels made")
+
+    # A single permutation per split keeps words and labels aligned.
+    def shuffled(data, labels, split_seed):
+      order = np.random.default_rng(split_seed).permutation(len(data))
+      return [data[i] for i in order], np.array(labels, dtype=bool)[order]
+
+    train_data, train_labels = shuffled(train_data, train_labels, split_seeds[0])
+    valid_data, valid_labels = shuffled(valid_data, valid_labels, split_seeds[1])
+    test_data, test_labels = shuffled(test_data, test_labels, split_seeds[2])
+
+    print("Datasets shuffled")
+
+    train_dataset = [train_data, train_labels]
+    valid_dataset = [valid_data, valid_labels]
+    test_dataset = [test_data, test_labels]
+
+    if save_text:
+      with tracer.stage("save_text", items=len(train_data) + len(valid_data) + len(test_data)):
+        saveTextData(train_data, f"data_training_{random_dist}_{char_list}.txt")
+        saveTextData(valid_data, f"data_validation_{random_dist}_{char_list}.txt")
+        saveTextData(test_data, f"data_testing_{random_dist}_{char_list}.txt")
+        np.savetxt(f"data_labels_train_{random_dist}_{char_list}.txt", train_dataset[1])
+        np.savetxt(f"data_labels_valid_{random_dist}_{char_list}.txt", valid_dataset[1])
+        np.savetxt(f"data_labels_test_{random_dist}_{char_list}.txt", test_dataset[1])
+
+        print("Datsets written")
+
+    return train_dataset, valid_dataset, test_dataset
+
+
+def vectorize_data(training_text, validation_text, test_text, tracer=None):
+  # Same char-level tokenization as the Keras Tokenizer(lower=True, char_level=True, oov_token='@')
+  # plus pad_sequences(padding='post') we used to use, but through a lookup table.
+  tracer = tracer or NullTracer()
+  with tracer.stage("tokenize", items=len(training_text) + len(validation_text) + len(test_text)):
+    glyph_dictionary = fit_char_index(training_text + validation_text + test_text, oov_token='@')
+    vectorizer = CharVectorizer(glyph_dictionary, oov_token='@', max_length=MAX_WORD_LENGTH)
+
+    train = vectorizer.transform(training_text)
+    validate = vectorizer.transform(validation_text)
+    testing = vectorizer.transform(test_text)
+  return train, validate, testing, glyph_dictionary, vectorizer
+
+
+def dataset_params(word_lists=WORD_LISTS, **overrides):
+  """`DEFAULT_DATASET` with `overrides`, plus the sizes of the source word lists.
+
+  This dict is what the dataset cache is keyed on.
+  """
+  params = dict(DEFAULT_DATASET, **overrides)
+  params['sources'] = [[f, os.path.getsize(f)] for f in word_lists]
+  return params
+
+
+def buildDataset(params, tracer=None):
+  """Generate and tokenize the splits for `params` (see `dataset_params`)."""
+  word_lists = [f for f, _ in params['sources']]
+  train_dataset, valid_dataset, test_dataset = makeUpSomeWords(word_lists=word_lists, tracer=tracer,
+                                                               **{k: v for k, v in params.items() if k != 'sources'})
+  train, valid, test, character_index, _ = vectorize_data(train_dataset[0], valid_dataset[0], test_dataset[0], tracer)
+  splits = {'train': Split(train, train_dataset[1], pack_words(train_dataset[0])),
+            'valid': Split(valid, valid_dataset[1], pack_words(valid_dataset[0])),
+            'test': Split(test, test_dataset[1], pack_words(test_dataset[0]))}
+  return splits, character_index
+
+
+def load_or_build(params, rebuild=False, root='datasets', tracer=None):
+  """The cached dataset for `params`, building it first if needed.
+
+  # Returns
+      A `(splits, character_index)` tuple, memory-mapped from disk.
+  """
+  tracer = tracer or NullTracer()
+  with tracer.stage("dataset", **{k: v for k, v in params.items() if k != 'sources'}) as stage:
+    splits, character_index = cached_dataset(params, lambda: buildDataset(params, tracer), root, rebuild)
+    stage['items'] = sum(len(split.labels) for split in splits.values())
+  return splits, character_index
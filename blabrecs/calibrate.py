@@ -0,0 +1,260 @@
+"""
+Threshold calibration over full prediction sets.
+
+The CNN cutoff is 0.82 in the app and 0.8 or 0.9 in the checks. Nothing
+measured those values. `calibrate` sorts a labelled set of scores once, in
+descending order. Cumulative sums over the sorted labels then give the
+true/false positive counts at every distinct score. That yields the whole
+ROC and precision/recall curve, AUC, accept rates by word length and the
+best threshold for each objective in O(n log n). Tens of millions of scores
+take a few seconds.
+
+The cutoffs are returned per word length as well. A length's curve comes
+from a stable integer sort of the already score-sorted words, so there is
+no second float sort. `save_cutoffs` writes them to a thresholds.json that
+`load_cutoffs` reads back as a `(25,)` array indexed by word length.
+`CascadeScorer`, `WordChecker` and `sample_plausible_words` accept that
+array anywhere they accept a single float threshold.
+
+Every comparison is `score > threshold` in the precision of the scores
+(float32 for the CNN), at calibration and at serving time alike. The
+calibrated cutoffs are themselves float32 values, so comparing them in
+float64, as the app does, gives the same decisions.
+
+    report = calibrate(scores, splits['test'].labels, splits['test'].words)
+    save_cutoffs('thresholds.json', report)
+    scorer = CascadeScorer(markov, cnn, threshold=load_cutoffs('thresholds.json'))
+"""
+
+import json
+
+import numpy as np
+
+from blabrecs.evaluate import DEFAULT_THRESHOLDS
+from blabrecs.packed import MAX_WORD_LENGTH, word_lengths
+
+OBJECTIVES = ('accuracy', 'f1', 'youden')
+
+
+def cutoffs_for(threshold, words, dtype=np.float32):
+    """The threshold of every word, in the precision of the scores.
+
+    # Arguments
+        threshold: a float, or an array of cutoffs indexed by word length
+            (see `load_cutoffs`).
+        words: packed `(n, 24)` word matrix, or word lengths.
+        dtype: dtype of the scores the thresholds are compared with.
+
+    # Returns
+        A 0-d array for a single float, else one threshold per word, cast
+        to `dtype` so that `scores > cutoffs_for(...)` compares in the
+        scores' own precision.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+    if threshold.ndim:
+        words = np.asarray(words)
+        lengths = word_lengths(words) if words.ndim == 2 else words
+        threshold = threshold[np.minimum(lengths, len(threshold) - 1)]
+    return threshold.astype(dtype)
+
+
+def _as_scores(scores):
+    scores = np.asarray(scores).reshape(-1)
+    return scores if scores.dtype.kind == 'f' else scores.astype(np.float64)
+
+
+def _curve(ranked, positive):
+    """Counts at every distinct score of `ranked` (sorted in descending order).
+
+    Point 0 accepts nothing. Point `i` accepts exactly the `i` highest
+    distinct scores: every word scoring above `thresholds[i]`, which lies
+    about halfway to the next lower distinct score, so a slightly different
+    score does not flip its decision. Thresholds have the dtype of `ranked`.
+    """
+    n = len(ranked)
+    ends = np.append(np.flatnonzero(ranked[1:] != ranked[:-1]), n - 1) if n else np.zeros(0, dtype=np.int64)
+    tp = np.cumsum(positive, dtype=np.int64)[ends]
+    top = ranked[ends]
+    below = np.append(ranked[ends[:-1] + 1], np.nextafter(ranked[-1:], -np.inf)) if n else top
+    middle = ((top.astype(np.float64) + below) / 2).astype(ranked.dtype)
+    # Rounded to the scores' precision the midpoint can land on `top` itself.
+    thresholds = np.where(middle < top, middle, np.nextafter(top, -np.inf))
+    return {'thresholds': np.concatenate([ranked[:1] if n else np.ones(1, ranked.dtype), thresholds]),
+            'scores': top,
+            'tp': np.concatenate([[0], tp]),
+            'fp': np.concatenate([[0], ends + 1 - tp]),
+            'positives': int(tp[-1]) if n else 0,
+            'negatives': int(n - tp[-1]) if n else 0}
+
+
+def _rates(curve):
+    """Add tpr, fpr, precision and the objective values to a `_curve` dict."""
+    tp, fp = curve['tp'], curve['fp']
+    p, n = curve['positives'], curve['negatives']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        curve['tpr'] = tp / p if p else np.zeros(len(tp))
+        curve['fpr'] = fp / n if n else np.zeros(len(fp))
+        curve['precision'] = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        curve['accuracy'] = (tp + n - fp) / (p + n) if p + n else np.zeros(len(tp))
+        curve['f1'] = np.where(tp > 0, 2 * tp / (tp + fp + p), 0.0)
+    curve['youden'] = curve['tpr'] - curve['fpr']
+    return curve
+
+
+def roc_curve(scores, labels):
+    """The full ROC and precision/recall curve of one scored set.
+
+    # Arguments
+        scores: `(n,)` model probabilities.
+        labels: `(n,)` bool, True for real words.
+
+    # Returns
+        A dict of arrays, one entry per distinct score plus the empty
+        starting point ('thresholds', 'tp', 'fp', 'tpr', 'fpr', 'precision',
+        'accuracy', 'f1', 'youden'), plus 'positives' and 'negatives'.
+    """
+    scores = _as_scores(scores)
+    order = np.argsort(scores)[::-1]
+    return _rates(_curve(scores[order], np.asarray(labels, dtype=bool).reshape(-1)[order]))
+
+
+def auc(curve):
+    """Area under the ROC curve, and average precision."""
+    tpr, fpr = curve['tpr'], curve['fpr']
+    roc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+    ap = float(np.sum(np.diff(tpr) * curve['precision'][1:]))
+    return roc, ap
+
+
+def best_threshold(curve, objective='accuracy', max_fpr=None):
+    """The curve point that maximizes `objective`.
+
+    # Arguments
+        objective: one of `OBJECTIVES`.
+        max_fpr: optional float; only points that accept at most this share
+            of the negatives are considered.
+
+    # Returns
+        A dict with the threshold and the rates at that point.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"unknown objective {objective!r}, expected one of {OBJECTIVES}")
+    allowed = curve['fpr'] <= max_fpr if max_fpr is not None else np.ones(len(curve['fpr']), dtype=bool)
+    i = int(np.argmax(np.where(allowed, curve[objective], -np.inf)))
+    return {'threshold': float(curve['thresholds'][i]),
+            **{key: float(curve[key][i]) for key in ('tpr', 'fpr', 'precision', 'accuracy', 'f1', 'youden')}}
+
+
+def _accept_rates(curve, thresholds):
+    """(tpr, fpr) at each of `thresholds`, by lookup in a descending curve.
+
+    The thresholds are compared in the precision of the scores, like
+    `scores > cutoffs_for(threshold, words, scores.dtype)`.
+    """
+    # Point k accepts the k highest distinct scores, so a threshold t lands
+    # on the point that accepts every distinct score above it.
+    thresholds = np.asarray(thresholds, dtype=np.float64).astype(curve['scores'].dtype)
+    i = np.searchsorted(-curve['scores'], -thresholds, side='left')
+    return curve['tpr'][i], curve['fpr'][i]
+
+
+def _downsample(curve, points):
+    keep = np.unique(np.linspace(0, len(curve['thresholds']) - 1, min(points, len(curve['thresholds'])))
+                     .round().astype(np.int64))
+    return {key: curve[key][keep].tolist() for key in ('thresholds', 'tpr', 'fpr', 'precision')}
+
+
+def calibrate(scores, labels, words, objective='accuracy', max_fpr=None, min_count=1000,
+              thresholds=DEFAULT_THRESHOLDS, points=200, max_length=MAX_WORD_LENGTH):
+    """Calibrate the CNN cutoff, overall and per word length.
+
+    # Arguments
+        scores: `(n,)` model probabilities for a labelled set, e.g. the test
+            split scored with `blabrecs.evaluate.predict_all`.
+        labels: `(n,)` bool, True for real words.
+        words: packed `(n, 24)` words (for their lengths), or an `(n,)` int
+            array of lengths.
+        objective, max_fpr: how the best threshold is chosen (see
+            `best_threshold`).
+        min_count: int, lengths with fewer words, or without both real and
+            fake ones, use the overall cutoff.
+        thresholds: fixed thresholds whose accept rates are reported.
+        points: int, curve points kept per curve in the report.
+
+    # Returns
+        A JSON-serializable report: the overall curve, AUC and best
+        thresholds per objective, and under 'by_length' the count, cutoff
+        and accept rates of every length. 'cutoffs' is the per-length
+        cutoff list that `save_cutoffs` writes.
+    """
+    scores = _as_scores(scores)
+    labels = np.asarray(labels, dtype=bool).reshape(-1)
+    words = np.asarray(words)
+    lengths = word_lengths(words) if words.ndim == 2 else words
+    lengths = np.minimum(lengths, max_length)
+
+    order = np.argsort(scores)[::-1]
+    ranked = scores[order]
+    positive = labels[order]
+    curve = _rates(_curve(ranked, positive))
+    roc_auc, average_precision = auc(curve)
+    best = {name: best_threshold(curve, name, max_fpr) for name in OBJECTIVES}
+    cutoff = best[objective]['threshold']
+    tpr, fpr = _accept_rates(curve, list(thresholds) + [cutoff])
+    report = {'count': len(scores),
+              'positives': curve['positives'],
+              'negatives': curve['negatives'],
+              'objective': objective,
+              'max_fpr': max_fpr,
+              'auc': roc_auc,
+              'average_precision': average_precision,
+              'best': best,
+              'cutoff': cutoff,
+              'accept_rate': {str(t): {'real': float(r), 'fake': float(f)}
+                              for t, r, f in zip(list(thresholds) + ['cutoff'], tpr, fpr)},
+              'curve': _downsample(curve, points),
+              'by_length': {}}
+
+    # A stable sort by length keeps every length group in score order.
+    ranked_lengths = lengths[order].astype(np.uint8)
+    by_length = np.argsort(ranked_lengths, kind='stable')
+    bounds = np.searchsorted(ranked_lengths[by_length], np.arange(max_length + 2))
+    cutoffs = []
+    for length in range(max_length + 1):
+        group = by_length[bounds[length]:bounds[length + 1]]
+        length_curve = _rates(_curve(ranked[group], positive[group]))
+        calibrated = (len(group) >= min_count and length_curve['positives'] and length_curve['negatives'])
+        length_cutoff = best_threshold(length_curve, objective, max_fpr)['threshold'] if calibrated else cutoff
+        cutoffs.append(length_cutoff)
+        if not len(group):
+            continue
+        tpr, fpr = _accept_rates(length_curve, [cutoff, length_cutoff])
+        report['by_length'][str(length)] = {'count': len(group),
+                                            'positives': length_curve['positives'],
+                                            'calibrated': bool(calibrated),
+                                            'cutoff': length_cutoff,
+                                            'accept_rate': {'overall_cutoff': {'real': float(tpr[0]), 'fake': float(fpr[0])},
+                                                            'length_cutoff': {'real': float(tpr[1]), 'fake': float(fpr[1])}}}
+    report['cutoffs'] = cutoffs
+    accepted = scores > cutoffs_for(cutoffs, lengths, scores.dtype)
+    report['length_cutoff_accuracy'] = float(np.mean(accepted == labels)) if len(labels) else 0.0
+    return report
+
+
+def save_cutoffs(path, report):
+    """Write the overall and per-length cutoffs of a `calibrate` report."""
+    with open(path, 'w') as f:
+        json.dump({'objective': report['objective'], 'max_fpr': report['max_fpr'],
+                   'cutoff': report['cutoff'], 'by_length': report['cutoffs']}, f, indent=1)
+
+
+def load_cutoffs(path, per_length=True):
+    """The cutoffs saved by `save_cutoffs`.
+
+    # Returns
+        A float array indexed by word length, or the overall cutoff as a
+        float if `per_length` is False.
+    """
+    with open(path) as f:
+        saved = json.load(f)
+    return np.asarray(saved['by_length'], dtype=np.float64) if per_length else float(saved['cutoff'])
@@ -0,0 +1,101 @@
+"""
+Two-stage cascade scorer.
+
+Most candidate words are obvious junk, and the trigram Markov check rejects
+those for a tiny fraction of the cost of a CNN forward pass. The cascade
+runs the Markov check (the app's :markov rule) on everything first and only
+tokenizes and scores the survivors with the CNN (the app's :neural rule,
+probability above 0.82), in batches.
+"""
+
+import time
+
+import numpy as np
+
+from blabrecs.calibrate import cutoffs_for
+from blabrecs.packed import as_packed
+from blabrecs.vectorize import CharVectorizer
+
+APP_CNN_THRESHOLD = 0.82
+
+
+class CascadeScorer:
+    """Accept words that pass both the Markov and the CNN check.
+
+    # Arguments
+        markov: a `blabrecs.markov.MarkovModel`.
+        cnn: anything with a Keras-style `predict(tokens)`, e.g. a
+            `blabrecs.inference.NumpyModel` or a Keras model.
+        vectorizer: `CharVectorizer` matching the CNN's tokenizer.
+        threshold: float, CNN probability a word must exceed, or per-length
+            cutoffs (see `blabrecs.calibrate.load_cutoffs`).
+        batch_size: int, maximum number of words per CNN call.
+        scorer: optional `blabrecs.scorecache.CachedScorer` wrapping `cnn`;
+            Markov survivors are then scored through its cache.
+    """
+
+    def __init__(self, markov, cnn, vectorizer=None, threshold=APP_CNN_THRESHOLD, batch_size=4096, scorer=None):
+        self.markov = markov
+        self.cnn = cnn
+        self.vectorizer = vectorizer or CharVectorizer()
+        self.threshold = threshold
+        self.batch_size = batch_size
+        self.scorer = scorer
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'words': 0, 'markov_passed': 0, 'cnn_passed': 0,
+                      'markov_seconds': 0.0, 'cnn_seconds': 0.0}
+
+    def cnn_scores(self, packed):
+        """CNN probability for every row of a packed word matrix."""
+        if self.scorer is not None:
+            return self.scorer.score_packed(packed)
+        tokens = self.vectorizer.transform_packed(packed)
+        scores = np.empty(len(tokens), dtype=np.float32)
+        for start in range(0, len(tokens), self.batch_size):
+            batch = tokens[start:start + self.batch_size]
+            scores[start:start + len(batch)] = np.asarray(self.cnn.predict(batch)).reshape(-1)
+        return scores
+
+    def score(self, words):
+        """Run the cascade over a list of strings or a packed word matrix.
+
+        # Returns
+            An `(accepted, scores)` tuple: a bool array of the words that
+            passed both stages, and the CNN probabilities (NaN for words the
+            Markov stage rejected, which the CNN never saw).
+        """
+        packed = as_packed(words)
+        started = time.perf_counter()
+        survivors = np.flatnonzero(self.markov.sufficiently_probable(packed))
+        markov_done = time.perf_counter()
+        scores = np.full(len(packed), np.nan, dtype=np.float32)
+        if len(survivors):
+            scores[survivors] = self.cnn_scores(packed[survivors])
+        cnn_done = time.perf_counter()
+        accepted = np.zeros(len(packed), dtype=bool)
+        accepted[survivors] = scores[survivors] > cutoffs_for(self.threshold, packed[survivors], scores.dtype)
+
+        self.stats['words'] += len(packed)
+        self.stats['markov_passed'] += len(survivors)
+        self.stats['cnn_passed'] += int(accepted.sum())
+        self.stats['markov_seconds'] += markov_done - started
+        self.stats['cnn_seconds'] += cnn_done - markov_done
+        return accepted, scores
+
+    def accept(self, words):
+        """Just the bool mask of `score`."""
+        return self.score(words)[0]
+
+    def report(self):
+        """Per-stage pass rates, timings and throughput since the last reset."""
+        s = self.stats
+        total_seconds = s['markov_seconds'] + s['cnn_seconds']
+        return {'words': s['words'],
+                'markov_pass_rate': s['markov_passed'] / s['words'] if s['words'] else 0.0,
+                'cnn_pass_rate': s['cnn_passed'] / s['markov_passed'] if s['markov_passed'] else 0.0,
+                'accept_rate': s['cnn_passed'] / s['words'] if s['words'] else 0.0,
+                'markov_seconds': s['markov_seconds'],
+                'cnn_seconds': s['cnn_seconds'],
+                'words_per_second': s['words'] / total_seconds if total_seconds else 0.0}
@@ -0,0 +1,121 @@
+"""
+Sanity checks for a trained model: score batches of made-up words, build a
+word bank and write the evaluation report.
+
+`model` is anything with a Keras-style `predict(tokens)` (a Keras model or a
+`blabrecs.inference.NumpyModel`).
+"""
+
+import os
+
+import numpy as np
+
+from blabrecs.evaluate import evaluate_sets
+from blabrecs.markov import generate_pronounceable_words
+from blabrecs.packed import pack_words, unpack_words
+from blabrecs.sampler import sample_plausible_words
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+
+def theseAreTotallyRealWords(model, run_count=1000, cutoff=0.9, vectorizer=None, dictionary=None, rng=None):
+  # One batch instead of run_count single-word predict calls.
+  vectorizer = vectorizer or CharVectorizer()
+  real_words = unpack_words(generate_words(run_count, seed=rng))
+  real_words_result = model.predict(vectorizer.transform(real_words))
+  in_dictionary = dictionary.contains(real_words) if dictionary is not None else np.zeros(run_count, dtype=bool)
+  totally_real_words = []
+  is_in_dictionary = []
+  for i in range(run_count):
+    if real_words_result[i] > cutoff:
+      print(f"{i}\t{real_words[i]}")
+      totally_real_words.append(real_words[i])
+    if in_dictionary[i]:
+      is_in_dictionary.append(real_words[i])
+  return totally_real_words, is_in_dictionary
+
+def makeWordBank(model, word_count=1000, cutoff=0.9, random_dist='english_table', letter_dist='english',
+                 vectorizer=None, dictionary=None, rng=None):
+  """Exactly word_count non-dictionary words the model scores above cutoff."""
+  return [word for word, score in sample_plausible_words(word_count, cutoff,
+                                                         predict=model.predict,
+                                                         vectorizer=vectorizer,
+                                                         dictionary=dictionary,
+                                                         random_dist=random_dist,
+                                                         letter_dist=letter_dist,
+                                                         seed=rng)]
+
+def theseAreTotallyRealWordsOneshot(model, run_count=100, cutoff=0.9, random_dist='uniform', letter_dist='random',
+                                    vectorizer=None, dictionary=None, rng=None):
+  vectorizer = vectorizer or CharVectorizer()
+  totally_real_words = []
+  almost_real_words = []
+  is_in_dictionary = []
+  real_words = unpack_words(generate_words(run_count, random_dist=random_dist, letter_dist=letter_dist, seed=rng))
+  padded_real_words = vectorizer.transform(real_words)
+  real_words_result = model.predict(padded_real_words)
+  rwr = real_words_result.tolist()
+  in_dictionary = dictionary.contains(real_words) if dictionary is not None else np.zeros(run_count, dtype=bool)
+  for idx in range(len(rwr)):
+    predict = real_words_result[idx]
+    if predict[0] > cutoff:
+      totally_real_words.append(real_words[idx])
+    else:
+      if predict[0] > 0.5:
+        almost_real_words.append(real_words[idx])
+    if in_dictionary[idx]:
+      is_in_dictionary.append(real_words[idx])
+  return totally_real_words, is_in_dictionary, almost_real_words
+
+def check_model(model, model_name, wordlist, report_dir=None, vectorizer=None, dictionary=None, rng=None,
+                pronounceable=True, scorer=None):
+    """Print the made-up-word checks and write the evaluation report.
+
+    # Arguments
+        wordlist: list of real words, scored as "All English Words".
+        report_dir: str, defaults to reports/<model_name>.
+        pronounceable: bool, include a set of non-dictionary trigram-chain
+            words from model.edn (see `blabrecs.markov.MarkovSampler`).
+        scorer: optional `blabrecs.scorecache.CachedScorer` for the report.
+
+    # Returns
+        The `evaluate_sets` report dict.
+    """
+    vectorizer = vectorizer or CharVectorizer()
+    rng = np.random.default_rng(rng)
+    #totally_real_words = ["test", "weyhws", "agglution", "glyph", "tyro", "pfxx"]
+    #padded_real_words = vectorizer.transform(totally_real_words)
+    #real_words_result = model.predict(padded_real_words)
+    #[int(i * 100) for i in real_words_result]
+    for random_dist, letter_dist in [('uniform', 'random'), ('english_table', 'english')]:
+        totally_real, in_dic, almost_words = theseAreTotallyRealWordsOneshot(model, run_count=10000, cutoff=0.8, random_dist=random_dist, letter_dist=letter_dist,
+                                                                             vectorizer=vectorizer, dictionary=dictionary, rng=rng)
+        print("\nTotally Real Words\n============")
+        [print(i) for i in set(totally_real)]
+        print("\nSuper Fake Words\n============")
+        [print(i) for i in set(in_dic)]
+        print("\nDictionary Words Found\n============")
+        [print(i) for i in (set(totally_real) & set(in_dic))]
+        print("\nDictionary Words Not Found (False Negatives)\n============")
+        [print(i) for i in (set(in_dic) - set(totally_real))]
+        print("\nAlmost Words\n============")
+        [print(i) for i in set(almost_words)]
+
+        print("\n")
+
+    # Everything below runs headless: scores, histograms and plots go to a report directory.
+    word_sets = {"All English Words": pack_words(wordlist)}
+    if pronounceable:
+        word_sets["Pronounceable Words"] = generate_pronounceable_words(10000, random_dist=None, seed=rng, dictionary=dictionary)
+    word_sets.update({"Random English-Distribution Words": generate_words(10000, random_dist='english_table', letter_dist='english', seed=rng),
+                      "Random-Random Words": generate_words(10000, random_dist='english_table', letter_dist='random', seed=rng),
+                      "Uniform-Random Words": generate_words(10000, random_dist='uniform', letter_dist='random', seed=rng)})
+    report_dir = report_dir or os.path.join("reports", model_name)
+    report = evaluate_sets(model.predict, vectorizer, word_sets, report_dir, model_name, extremes=1000, scorer=scorer)
+
+    for name, summary in report['sets'].items():
+        print(f"{name}: Average: {summary['mean']}, Median: {summary['median']}")
+        [print(f"{w} {p:03.2f}") for w, p in summary['lowest'][:10]]
+        [print(f"{w} {p:03.2f}") for w, p in summary['highest'][:10]]
+    print(f"Report written to {report_dir}")
+    return report
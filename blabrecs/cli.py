@@ -0,0 +1,444 @@
+"""
+Command line entry points.
+
+    python -m blabrecs generate -n 1000 --letter-dist english
+    python -m blabrecs generate --dataset
+    python -m blabrecs shards negatives/english -n 500000000
+    python -m blabrecs export-markov model.edn -o model.bin --verify
+    python -m blabrecs train --epochs 250 --quantize
+    python -m blabrecs evaluate --model model.json
+    python -m blabrecs score glorp wug < more_words.txt
+    python -m blabrecs sweep --dataset datasets/<key> --grid filters=32,64 --folds 5
+    python -m blabrecs distill --teacher model.json --out export/student
+    python -m blabrecs calibrate --model model.json --out reports/calibration
+
+Every subcommand imports what it needs when it runs: `generate` and `score`
+never load TensorFlow, and `train` and `evaluate` only do so for Keras
+models.
+"""
+
+import argparse
+import os
+import sys
+
+from blabrecs.cascade import APP_CNN_THRESHOLD
+from blabrecs.packed import MAX_WORD_LENGTH
+from blabrecs.wordgen import LETTER_DISTS, RANDOM_DISTS
+
+SEED = 6890
+
+
+def _add_dataset_args(parser):
+    from blabrecs.build import DEFAULT_DATASET
+    from blabrecs.words import WORD_LISTS
+
+    group = parser.add_argument_group('dataset')
+    group.add_argument('--random-dist', choices=RANDOM_DISTS, default=DEFAULT_DATASET['random_dist'])
+    group.add_argument('--letter-dist', choices=LETTER_DISTS, default=DEFAULT_DATASET['char_list'])
+    group.add_argument('--dataset-seed', type=int, default=DEFAULT_DATASET['seed'])
+    group.add_argument('--data-size', type=int, default=DEFAULT_DATASET['data_size'])
+    group.add_argument('--validation-size', type=int, default=DEFAULT_DATASET['validation_size'])
+    group.add_argument('--test-data-size', type=int, default=DEFAULT_DATASET['test_data_size'])
+    group.add_argument('--fake-words-multiplier', type=int, default=DEFAULT_DATASET['fake_words_multiplier'])
+    group.add_argument('--workers', type=int, default=DEFAULT_DATASET['workers'])
+    group.add_argument('--word-lists', nargs='+', default=list(WORD_LISTS))
+    group.add_argument('--rebuild', action='store_true', help='regenerate even if a cached dataset exists')
+
+
+def _dataset(args, tracer=None):
+    from blabrecs.build import dataset_params, load_or_build
+    from blabrecs.dataset import dataset_key
+
+    params = dataset_params(args.word_lists,
+                            random_dist=args.random_dist,
+                            char_list=args.letter_dist,
+                            seed=args.dataset_seed,
+                            data_size=args.data_size,
+                            validation_size=args.validation_size,
+                            test_data_size=args.test_data_size,
+                            fake_words_multiplier=args.fake_words_multiplier,
+                            workers=args.workers)
+    splits, character_index = load_or_build(params, rebuild=args.rebuild, tracer=tracer)
+    return splits, character_index, os.path.join('datasets', dataset_key(params))
+
+
+def _load_model(path):
+    """A `NumpyModel` for TF.js model.json files, otherwise a Keras model."""
+    if path.endswith('.json'):
+        from blabrecs.inference import NumpyModel
+        return NumpyModel.load(path)
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+
+def _vectorizer(tokenizer):
+    from blabrecs.vectorize import CharVectorizer
+    return CharVectorizer.from_file(tokenizer) if tokenizer else CharVectorizer()
+
+
+def _split_vectorizer(args, model_path, character_index):
+    """The vectorizer of a model scored against a cached dataset.
+
+    An explicit --tokenizer wins; a TF.js model.json is the app's, which uses
+    the app's tokenizer; anything else was trained on the dataset.
+    """
+    from blabrecs.vectorize import CharVectorizer
+    if args.tokenizer or model_path.endswith('.json'):
+        return _vectorizer(args.tokenizer)
+    return CharVectorizer(character_index, oov_token='@', max_length=MAX_WORD_LENGTH)
+
+
+def cmd_generate(args):
+    if args.dataset:
+        splits, _, path = _dataset(args)
+        print(path)
+        return 0
+    if args.markov:
+        from blabrecs.markov import generate_pronounceable_words
+        words = generate_pronounceable_words(args.n, args.markov, args.random_dist, args.seed)
+    else:
+        from blabrecs.wordgen import generate_words_parallel
+        words = generate_words_parallel(args.n, args.random_dist, args.letter_dist, args.seed, workers=args.workers)
+    out = open(args.out, 'wb') if args.out else sys.stdout.buffer
+    try:
+        # Rows are zero-padded ASCII; strip the padding and write one word per line.
+        out.write(b'\n'.join(row.tobytes().rstrip(b'\0') for row in words) + b'\n')
+    finally:
+        if args.out:
+            out.close()
+    return 0
+
+
+def cmd_shards(args):
+    from blabrecs.dictionary import DictionaryIndex
+    from blabrecs.shards import build_shards
+    from blabrecs.trace import Tracer
+
+    manifest = build_shards(args.out, args.n, random_dist=args.random_dist, letter_dist=args.letter_dist,
+                            seed=args.seed, dictionary=DictionaryIndex.cached(args.word_lists, "dictionary_index"),
+                            shard_size=args.shard_size, bucket_size=args.bucket_size, tracer=Tracer())
+    print(f"{manifest['count']} words in {len(manifest['shards'])} shards: {manifest['stats']}")
+    return 0
+
+
+def cmd_export_markov(args):
+    import json
+
+    from blabrecs.markovbin import export_model, verify
+
+    data = export_model(args.model, args.out, args.encoding)
+    print(f"wrote {args.out}: {len(data):,} bytes")
+    if not args.verify:
+        return 0
+    from blabrecs.words import loadWordLists
+    report = verify(args.model, args.out, loadWordLists(args.verify_words))
+    print(json.dumps(report, indent=1))
+    return 0 if report['ok'] else 1
+
+
+def cmd_train(args):
+    from blabrecs.dictionary import DictionaryIndex
+    from blabrecs.trace import Tracer
+    from blabrecs.training import train_model
+
+    tracer = Tracer()
+    splits, character_index, _ = _dataset(args, tracer)
+    model_name = args.name or f"model_{args.random_dist}_{args.letter_dist}"
+    with open(f"tokenizer_{args.random_dist}_{args.letter_dist}.txt", "w") as f:
+        f.write(str(character_index))
+    dictionary = DictionaryIndex.cached(args.word_lists, "dictionary_index")
+    negative_shards = None
+    if args.negative_shards:
+        from blabrecs.shards import NegativeShards
+        negative_shards = NegativeShards(args.negative_shards)
+    model = train_model(splits, character_index, model_name=model_name,
+                        blocks=args.blocks, filters=args.filters, dropout_rate=args.dropout_rate,
+                        embedding_dim=args.embedding_dim, kernel_size=args.kernel_size,
+                        epochs=args.epochs, batch_size=args.batch_size, patience=args.patience,
+                        learning_rate=args.learning_rate, streaming=args.streaming,
+                        random_dist=args.random_dist, letter_dist=args.letter_dist,
+                        dictionary=dictionary, seed=args.seed, negative_shards=negative_shards,
+                        hard_negatives=args.hard_negatives, mine_every=args.mine_every,
+                        mine_candidates=args.mine_candidates, mine_threshold=args.mine_threshold,
+                        tracer=tracer)
+    if args.quantize:
+        from blabrecs.quantize import quantize_and_report
+        report = quantize_and_report(model, os.path.join("export", f"{model_name}_int8"),
+                                     splits['test'].tokens, splits['test'].labels)
+        [print(f"{name}: accuracy {r['accuracy']:.5f}") for name, r in report.items() if isinstance(r, dict) and 'accuracy' in r]
+    if args.check:
+        from blabrecs.checks import check_model
+        from blabrecs.vectorize import CharVectorizer
+        from blabrecs.words import loadWordLists
+
+        check_model(model, model_name, sorted(set(loadWordLists(args.word_lists))),
+                    vectorizer=CharVectorizer(character_index, oov_token='@', max_length=MAX_WORD_LENGTH),
+                    dictionary=dictionary, rng=args.seed)
+    return 0
+
+
+def _scorer(model, vectorizer, cache_path):
+    if not cache_path:
+        return None
+    from blabrecs.scorecache import CachedScorer, ScoreCache
+    return CachedScorer.for_model(model, vectorizer, ScoreCache(cache_path))
+
+
+def cmd_evaluate(args):
+    from blabrecs.checks import check_model
+    from blabrecs.dictionary import DictionaryIndex
+    from blabrecs.words import loadWordLists
+
+    model = _load_model(args.model)
+    # Only a Keras model without --tokenizer needs the dataset, for its character index.
+    character_index = None
+    if not (args.tokenizer or args.model.endswith('.json')):
+        _, character_index, _ = _dataset(args)
+    vectorizer = _split_vectorizer(args, args.model, character_index)
+    scorer = _scorer(model, vectorizer, args.cache)
+    name = args.name or os.path.splitext(os.path.basename(args.model))[0]
+    check_model(model, name, sorted(set(loadWordLists(args.word_lists))), report_dir=args.out,
+                vectorizer=vectorizer,
+                dictionary=DictionaryIndex.cached(args.word_lists, "dictionary_index"),
+                rng=args.seed, pronounceable=not args.no_pronounceable, scorer=scorer)
+    if scorer is not None:
+        print(f"score cache: {scorer.cache.report()}")
+    return 0
+
+
+def cmd_score(args):
+    import numpy as np
+
+    vectorizer = _vectorizer(args.tokenizer)
+    model = _load_model(args.model)
+    if args.words:
+        words = [w.lower() for w in args.words]
+    else:
+        data = sys.stdin.buffer.read().lower().replace(b'\r', b'')
+        words = data.decode('ascii', 'replace').splitlines()
+    scorer = _scorer(model, vectorizer, args.cache)
+    if scorer is not None and max(map(len, words), default=0) <= MAX_WORD_LENGTH:
+        scores = scorer.score_words(words)
+    elif args.words:
+        scores = np.asarray(model.predict(vectorizer.transform(words))).reshape(-1)
+    else:
+        scores = np.asarray(model.predict(vectorizer.transform_buffer(data))).reshape(-1)
+    columns = [scores]
+    if args.markov:
+        from blabrecs.markov import MarkovModel
+        columns.append(MarkovModel.load(args.markov).sufficiently_probable(words))
+    out = sys.stdout
+    for i, word in enumerate(words):
+        out.write(word + ''.join(f'\t{c[i]:.6f}' if c.dtype.kind == 'f' else f'\t{int(c[i])}' for c in columns) + '\n')
+    return 0
+
+
+def cmd_sweep(args):
+    from blabrecs.sweep import SWEEP_PARAMS, grid, random_search, run_sweep
+
+    space = {}
+    for spec in args.grid:
+        name, _, values = spec.partition('=')
+        if name not in SWEEP_PARAMS:
+            raise SystemExit(f"cannot sweep {name!r}, expected one of {SWEEP_PARAMS}")
+        kind = float if name in ('dropout_rate', 'learning_rate') else int
+        space[name] = [kind(v) for v in values.split(',')]
+    configs = random_search(space, args.random, args.seed) if args.random else grid(space)
+    rows = run_sweep(args.dataset, configs, folds=args.folds, out_dir=args.out, workers=args.workers,
+                     epochs=args.epochs, batch_size=args.batch_size, patience=args.patience, seed=args.seed)
+    for row in rows[:10]:
+        print(f"{row['rank']:>3} {row['val_acc']:.5f} ±{row['val_acc_std']:.5f} {row['wall_seconds']:8.1f}s {row['config']}")
+    return 0
+
+
+def cmd_distill(args):
+    from blabrecs.dictionary import DictionaryIndex
+    from blabrecs.distill import distill
+    from blabrecs.trace import Tracer
+
+    tracer = Tracer()
+    splits, character_index, _ = _dataset(args, tracer)
+    vectorizer = _split_vectorizer(args, args.teacher, character_index)
+    student = {'blocks': args.blocks, 'filters': args.filters, 'kernel_size': args.kernel_size,
+               'embedding_dim': args.embedding_dim, 'dropout_rate': args.dropout_rate}
+    report = distill(_load_model(args.teacher), splits, vectorizer, args.out, student=student,
+                     candidates=args.candidates, markov_fraction=args.markov_fraction, markov=args.markov,
+                     temperature=args.temperature, hard_weight=args.hard_weight,
+                     dictionary=DictionaryIndex.cached(args.word_lists, "dictionary_index"),
+                     threshold=args.threshold, seed=args.seed,
+                     epochs=args.epochs, batch_size=args.batch_size, patience=args.patience,
+                     learning_rate=args.learning_rate, tracer=tracer)
+    for name in ('teacher', 'student'):
+        r = report[name]
+        print(f"{name}: accuracy {r['accuracy']:.5f}, {r['words_per_second']:,.0f} words/s, {r['parameters']:,} parameters")
+    print(f"agreement {report['agreement']:.5f}, speedup {report['speedup']:.1f}x; student written to {args.out}")
+    return 0
+
+
+def cmd_calibrate(args):
+    import json
+
+    from blabrecs.calibrate import calibrate, save_cutoffs
+    from blabrecs.evaluate import predict_all
+
+    splits, character_index, _ = _dataset(args)
+    split = splits[args.split]
+    model = _load_model(args.model)
+    vectorizer = _split_vectorizer(args, args.model, character_index)
+    scorer = _scorer(model, vectorizer, args.cache)
+    if scorer is not None:
+        scores = scorer.score_packed(split.words)
+    else:
+        scores = predict_all(model.predict, vectorizer.transform_packed(split.words))
+    report = calibrate(scores, split.labels, split.words, objective=args.objective, max_fpr=args.max_fpr,
+                       min_count=args.min_count)
+    os.makedirs(args.out, exist_ok=True)
+    with open(os.path.join(args.out, 'calibration.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    save_cutoffs(os.path.join(args.out, 'thresholds.json'), report)
+    print(f"AUC {report['auc']:.5f}, average precision {report['average_precision']:.5f}")
+    for name, best in report['best'].items():
+        print(f"best {name}: threshold {best['threshold']:.4f} (accuracy {best['accuracy']:.5f}, "
+              f"real accepted {best['tpr']:.4f}, fake accepted {best['fpr']:.4f})")
+    for t, rates in report['accept_rate'].items():
+        print(f"at {t}: real accepted {rates['real']:.4f}, fake accepted {rates['fake']:.4f}")
+    print(f"per-length cutoffs: accuracy {report['length_cutoff_accuracy']:.5f}; written to {args.out}")
+    return 0
+
+
+def build_parser():
+    from blabrecs.words import WORD_LISTS
+
+    parser = argparse.ArgumentParser(prog='python -m blabrecs', description='BLABRECS word tools.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('generate', help='generate fake words, or build the cached training dataset')
+    p.add_argument('-n', type=int, default=1000, help='number of words')
+    p.add_argument('--seed', type=int, default=None)
+    p.add_argument('-o', '--out', help='output file (default stdout)')
+    p.add_argument('--dataset', action='store_true', help='build the training dataset and print its directory')
+    p.add_argument('--markov', metavar='MODEL_EDN', help='walk the trigram chain of this model instead (pronounceable words)')
+    _add_dataset_args(p)
+    p.set_defaults(func=cmd_generate)
+
+    p = commands.add_parser('shards', help='generate a large deduplicated negative set on disk, in shards')
+    p.add_argument('out', help='output directory')
+    p.add_argument('-n', type=int, required=True, help='number of words to generate')
+    p.add_argument('--random-dist', choices=RANDOM_DISTS, default='english_table')
+    p.add_argument('--letter-dist', choices=LETTER_DISTS, default='english')
+    p.add_argument('--seed', type=int, default=SEED)
+    p.add_argument('--shard-size', type=int, default=1 << 22, help='words per shard')
+    p.add_argument('--bucket-size', type=int, default=1 << 23, help='words per dedup bucket (bounds memory)')
+    p.add_argument('--word-lists', nargs='+', default=list(WORD_LISTS), help='dictionary words to exclude')
+    p.set_defaults(func=cmd_shards)
+
+    p = commands.add_parser('export-markov', help='write the Markov model as a compact binary asset for the app')
+    p.add_argument('model', nargs='?', default='model.edn')
+    p.add_argument('-o', '--out', default='model.bin')
+    p.add_argument('--encoding', choices=('float32', 'uint16'), default='float32',
+                   help='float32 log-probabilities, or quantized 16-bit ones (half the size)')
+    p.add_argument('--verify', action='store_true', help='check the export against the model.edn')
+    p.add_argument('--verify-words', nargs='+', default=['enable.txt'],
+                   help='word lists whose decisions are compared when verifying')
+    p.set_defaults(func=cmd_export_markov)
+
+    p = commands.add_parser('train', help='train the CNN on the cached dataset')
+    _add_dataset_args(p)
+    p.add_argument('--name', help='model name (default model_<random-dist>_<letter-dist>)')
+    p.add_argument('--blocks', type=int, default=3)
+    p.add_argument('--filters', type=int, default=64)
+    p.add_argument('--kernel-size', type=int, default=3)
+    p.add_argument('--embedding-dim', type=int, default=200)
+    p.add_argument('--dropout-rate', type=float, default=0.3)
+    p.add_argument('--learning-rate', type=float, default=1e-3)
+    p.add_argument('--epochs', type=int, default=250)
+    p.add_argument('--batch-size', type=int, default=512)
+    p.add_argument('--patience', type=int, default=15)
+    p.add_argument('--streaming', action='store_true', help='draw fresh negatives every epoch')
+    p.add_argument('--negative-shards', help='stream negatives from a directory written by `shards`')
+    p.add_argument('--hard-negatives', type=float, default=0.0, metavar='FRACTION',
+                   help='share of streamed negatives taken from mined hard negatives')
+    p.add_argument('--mine-every', type=int, default=5, help='epochs between mining rounds')
+    p.add_argument('--mine-candidates', type=int, default=200000, help='candidates scored per mining round')
+    p.add_argument('--mine-threshold', type=float, default=0.5, help='score above which a candidate is hard')
+    p.add_argument('--seed', type=int, default=SEED)
+    p.add_argument('--quantize', action='store_true', help='export an 8-bit TF.js model with an accuracy report')
+    p.add_argument('--check', action='store_true', help='run check_model on the trained model')
+    p.set_defaults(func=cmd_train)
+
+    p = commands.add_parser('evaluate', help='write the evaluation report for a trained model')
+    _add_dataset_args(p)
+    p.add_argument('--model', default='model.json', help='TF.js model.json or Keras .h5')
+    p.add_argument('--tokenizer', help="the model's tokenizer_*.txt (default: the app's for model.json, "
+                                       "else the dataset's)")
+    p.add_argument('--name')
+    p.add_argument('--out', help='report directory (default reports/<name>)')
+    p.add_argument('--seed', type=int, default=SEED)
+    p.add_argument('--no-pronounceable', action='store_true', help='skip the trigram-chain word set')
+    p.add_argument('--cache', help='SQLite score cache to read and fill')
+    p.set_defaults(func=cmd_evaluate)
+
+    p = commands.add_parser('score', help='print the CNN score of words given as arguments or on stdin')
+    p.add_argument('words', nargs='*')
+    p.add_argument('--model', default='model.json', help='TF.js model.json or Keras .h5')
+    p.add_argument('--tokenizer', help="tokenizer_*.txt written at training (default: the app's)")
+    p.add_argument('--markov', help='also print the Markov decision from this model.edn')
+    p.add_argument('--cache', help='SQLite score cache to read and fill')
+    p.set_defaults(func=cmd_score)
+
+    p = commands.add_parser('sweep', help='hyperparameter sweep over a cached dataset')
+    p.add_argument('--dataset', required=True, help='cached dataset directory (see generate --dataset)')
+    p.add_argument('--grid', nargs='+', default=[], metavar='PARAM=V1,V2', help='values to search per parameter')
+    p.add_argument('--random', type=int, help='sample this many configurations instead of the full grid')
+    p.add_argument('--folds', type=int, help='k-fold cross-validation on the training split')
+    p.add_argument('--workers', type=int)
+    p.add_argument('--epochs', type=int, default=250)
+    p.add_argument('--batch-size', type=int, default=512)
+    p.add_argument('--patience', type=int, default=15)
+    p.add_argument('--seed', type=int, default=SEED)
+    p.add_argument('--out', default='sweeps')
+    p.set_defaults(func=cmd_sweep)
+
+    p = commands.add_parser('distill', help='train a small student model on the predictions of a trained one')
+    _add_dataset_args(p)
+    p.add_argument('--teacher', default='model.json', help='TF.js model.json or Keras .h5')
+    p.add_argument('--tokenizer', help="the teacher's tokenizer_*.txt (default: the app's for model.json, "
+                                       "else the dataset's)")
+    p.add_argument('--out', default=os.path.join('export', 'student'))
+    p.add_argument('--blocks', type=int, default=1)
+    p.add_argument('--filters', type=int, default=16)
+    p.add_argument('--kernel-size', type=int, default=3)
+    p.add_argument('--embedding-dim', type=int, default=16)
+    p.add_argument('--dropout-rate', type=float, default=0.1)
+    p.add_argument('--learning-rate', type=float, default=3e-3)
+    p.add_argument('--candidates', type=int, default=2000000, help='generated words the teacher labels')
+    p.add_argument('--markov-fraction', type=float, default=0.5, help='share of candidates from the trigram chain')
+    p.add_argument('--markov', default='model.edn', help='model.edn for the trigram-chain candidates')
+    p.add_argument('--temperature', type=float, default=1.0, help='soften the teacher predictions')
+    p.add_argument('--hard-weight', type=float, default=0.0, help='weight of the true labels in the targets')
+    p.add_argument('--threshold', type=float, default=APP_CNN_THRESHOLD,
+                   help="decision cutoff for the report (default: the app's)")
+    p.add_argument('--epochs', type=int, default=30)
+    p.add_argument('--batch-size', type=int, default=1024)
+    p.add_argument('--patience', type=int, default=3)
+    p.add_argument('--seed', type=int, default=SEED)
+    p.set_defaults(func=cmd_distill)
+
+    p = commands.add_parser('calibrate', help='ROC curve and per-length CNN cutoffs on a dataset split')
+    _add_dataset_args(p)
+    p.add_argument('--model', default='model.json', help='TF.js model.json or Keras .h5')
+    p.add_argument('--tokenizer', help="the model's tokenizer_*.txt (default: the app's for model.json, "
+                                       "else the dataset's)")
+    p.add_argument('--split', choices=('train', 'valid', 'test'), default='test')
+    p.add_argument('--objective', choices=('accuracy', 'f1', 'youden'), default='accuracy')
+    p.add_argument('--max-fpr', type=float, help='only consider cutoffs accepting at most this share of fake words')
+    p.add_argument('--min-count', type=int, default=1000, help='words a length needs for its own cutoff')
+    p.add_argument('--cache', help='SQLite score cache to read and fill')
+    p.add_argument('--out', default=os.path.join('reports', 'calibration'))
+    p.set_defaults(func=cmd_calibrate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,111 @@
+"""
+Binary dataset cache.
+
+A generated dataset is stored as one directory per set of generation
+parameters: for every split a padded uint8 token matrix, a packed label
+bitmap and the packed words themselves, all as `.npy` files, plus a
+`manifest.json`. The directory name is a hash of the parameters (including
+the seed), so a repeat run with the same settings memory-maps the arrays
+directly instead of generating, writing, parsing and tokenizing text files.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+Split = namedtuple('Split', ['tokens', 'labels', 'words'])
+Split.__doc__ = """One dataset split.
+
+    tokens: `(n, 24)` uint8 token matrix, padded like `pad_sequences(padding='post')`.
+    labels: `(n,)` bool array, True for real words.
+    words: `(n, 24)` uint8 packed words (see `blabrecs.packed`).
+"""
+
+
+def dataset_key(params):
+    """Hash a JSON-serializable dict of generation parameters."""
+    blob = json.dumps({'format': FORMAT_VERSION, 'params': params}, sort_keys=True)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def save_dataset(path, splits, params, char_index):
+    """Write `splits` (a dict of name -> `Split`) to the directory `path`.
+
+    Everything is written to a temporary directory next to `path`, which
+    then replaces it, so an interrupted save never leaves old and new arrays
+    mixed under one manifest.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=parent)
+    try:
+        manifest = {'format': FORMAT_VERSION,
+                    'key': dataset_key(params),
+                    'params': params,
+                    'char_index': char_index,
+                    'splits': {}}
+        for name, split in splits.items():
+            labels = np.asarray(split.labels, dtype=bool)
+            np.save(os.path.join(tmp, f'{name}_tokens.npy'), np.asarray(split.tokens, dtype=np.uint8))
+            np.save(os.path.join(tmp, f'{name}_labels.npy'), np.packbits(labels))
+            np.save(os.path.join(tmp, f'{name}_words.npy'), np.asarray(split.words, dtype=np.uint8))
+            manifest['splits'][name] = {'count': len(labels), 'positives': int(labels.sum())}
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        if os.path.exists(path):
+            # A directory can't be renamed over a non-empty one; move the old
+            # copy aside first. In between, `path` is simply missing.
+            stale = tmp + '.old'
+            os.rename(path, stale)
+            os.rename(tmp, path)
+            shutil.rmtree(stale)
+        else:
+            os.rename(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def load_dataset(path):
+    """Memory-map a dataset written by `save_dataset`.
+
+    # Returns
+        A `(splits, manifest)` tuple; token and word matrices are read-only
+        memory maps, labels are unpacked into bool arrays.
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    splits = {}
+    for name, info in manifest['splits'].items():
+        packed_labels = np.load(os.path.join(path, f'{name}_labels.npy'))
+        splits[name] = Split(np.load(os.path.join(path, f'{name}_tokens.npy'), mmap_mode='r'),
+                             np.unpackbits(packed_labels, count=info['count']).astype(bool),
+                             np.load(os.path.join(path, f'{name}_words.npy'), mmap_mode='r'))
+    return splits, manifest
+
+
+def cached_dataset(params, build, root='datasets', rebuild=False):
+    """Load the dataset for `params`, calling `build()` to create it if needed.
+
+    # Arguments
+        params: dict, everything that influences the generated data.
+        build: callable returning `(splits, char_index)`.
+        root: str, directory holding one subdirectory per key.
+        rebuild: bool, ignore any existing cache entry.
+
+    # Returns
+        A `(splits, char_index)` tuple, memory-mapped from disk.
+    """
+    path = os.path.join(root, dataset_key(params))
+    if rebuild or not os.path.exists(os.path.join(path, 'manifest.json')):
+        splits, char_index = build()
+        save_dataset(path, splits, params, char_index)
+    splits, manifest = load_dataset(path)
+    return splits, manifest['char_index']
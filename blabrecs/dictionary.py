@@ -0,0 +1,183 @@
+"""
+Dictionary index with constant-time membership.
+
+The index keeps the dictionary as a sorted array of fixed-width `S24` words
+plus an open-addressing hash table of row numbers. Membership is a hash probe
+(vectorized over whole batches), prefix queries are a binary search over the
+sorted words, and both arrays are plain `.npy` files that load with
+`mmap_mode='r'`, so a saved index is usable immediately without rebuilding
+anything.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH, as_packed, pack_words
+
+DEFAULT_SOURCES = ('words.txt', 'enable.txt')
+
+_EMPTY = -1
+_MIX_1 = np.uint64(0xbf58476d1ce4e5b9)
+_MIX_2 = np.uint64(0x94d049bb133111eb)
+_LANE_KEYS = (np.uint64(0x9e3779b97f4a7c15), np.uint64(0xc2b2ae3d27d4eb4f), np.uint64(0x165667b19e3779f9))
+
+
+def hash_packed(packed):
+    """Hash every row of a packed `(n, 24)` uint8 word matrix to a uint64."""
+    lanes = np.ascontiguousarray(packed, dtype=np.uint8).view('<u8')
+    h = np.zeros(len(lanes), dtype=np.uint64)
+    for i, key in enumerate(_LANE_KEYS):
+        h ^= lanes[:, i] * key
+        # splitmix64 finalizer
+        h ^= h >> np.uint64(30)
+        h *= _MIX_1
+        h ^= h >> np.uint64(27)
+        h *= _MIX_2
+        h ^= h >> np.uint64(31)
+    return h
+
+
+def read_word_file(filename, max_length=MAX_WORD_LENGTH):
+    """Read a newline separated word list, lowercased, one word per entry.
+
+    Blank lines and words longer than `max_length` are dropped.
+    """
+    with open(filename, 'rb') as f:
+        lines = f.read().decode('utf-8', 'replace').lower().splitlines()
+    return [w for w in (line.strip() for line in lines) if 0 < len(w) <= max_length]
+
+
+def _source_stamp(filenames):
+    return [{'path': os.path.abspath(f),
+             'size': os.path.getsize(f),
+             'mtime': os.path.getmtime(f)} for f in filenames]
+
+
+class DictionaryIndex:
+    """A read-only set of dictionary words.
+
+    # Arguments
+        words: `(n,)` array of sorted, unique `S24` words.
+        table: int32 array whose length is a power of two, holding row
+            numbers into `words` (or -1 for empty slots).
+    """
+
+    def __init__(self, words, table):
+        self.words = words
+        self.table = table
+        self._mask = np.uint64(len(table) - 1)
+
+    @classmethod
+    def from_words(cls, words):
+        """Build an index from an iterable of strings."""
+        packed = pack_words(sorted(set(words)))
+        sorted_words = packed.view(f'S{MAX_WORD_LENGTH}').ravel()
+        n = len(sorted_words)
+        size = 1 << max(4, int(2 * n - 1).bit_length())
+        table = np.full(size, _EMPTY, dtype=np.int32)
+        mask = np.uint64(size - 1)
+
+        pending = np.arange(n, dtype=np.int32)
+        slots = hash_packed(packed) & mask
+        while len(pending):
+            free = table[slots] == _EMPTY
+            # Several pending words can hash to the same free slot in one
+            # round; the first one claims it and the rest keep probing.
+            claimed, first = np.unique(slots[free], return_index=True)
+            table[claimed] = pending[free][first]
+            placed = np.zeros(len(pending), dtype=bool)
+            placed[np.flatnonzero(free)[first]] = True
+            pending = pending[~placed]
+            slots = (slots[~placed] + np.uint64(1)) & mask
+        return cls(sorted_words, table)
+
+    @classmethod
+    def from_files(cls, filenames=DEFAULT_SOURCES):
+        """Build an index from one or more word list files."""
+        words = []
+        for filename in filenames:
+            words.extend(read_word_file(filename))
+        return cls.from_words(words)
+
+    def save(self, path, sources=()):
+        """Write the index to the directory `path`."""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'words.npy'), self.words)
+        np.save(os.path.join(path, 'table.npy'), self.table)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'count': len(self.words), 'sources': _source_stamp(sources)}, f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map an index previously written with `save`."""
+        return cls(np.load(os.path.join(path, 'words.npy'), mmap_mode='r'),
+                   np.load(os.path.join(path, 'table.npy'), mmap_mode='r'))
+
+    @classmethod
+    def cached(cls, filenames=DEFAULT_SOURCES, path='dictionary_index'):
+        """Load the index saved at `path`, rebuilding it if any source changed."""
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                if json.load(f)['sources'] == _source_stamp(filenames):
+                    return cls.load(path)
+        except (OSError, ValueError, KeyError):
+            pass
+        index = cls.from_files(filenames)
+        index.save(path, filenames)
+        return index
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return bool(self.contains([word])[0])
+
+    def contains(self, words):
+        """Batch membership test.
+
+        # Arguments
+            words: list of strings, or a packed `(n, 24)` uint8 matrix.
+
+        # Returns
+            A bool array, True where the word is in the dictionary.
+        """
+        packed = as_packed(words)
+        queries = np.ascontiguousarray(packed, dtype=np.uint8).view(f'S{MAX_WORD_LENGTH}').ravel()
+        found = np.zeros(len(queries), dtype=bool)
+        active = np.arange(len(queries))
+        if not isinstance(words, np.ndarray):
+            # Packing cuts words to MAX_WORD_LENGTH, so a longer word would
+            # match a dictionary word by its first letters. No stored word is
+            # that long, so such words are never found.
+            active = active[np.array([len(w) <= MAX_WORD_LENGTH for w in words], dtype=bool)]
+        slots = (hash_packed(packed) & self._mask)[active]
+        while len(active):
+            rows = self.table[slots]
+            occupied = rows != _EMPTY
+            hit = occupied.copy()
+            hit[occupied] = self.words[rows[occupied]] == queries[active[occupied]]
+            found[active[hit]] = True
+            probe = occupied & ~hit
+            active = active[probe]
+            slots = (slots[probe] + np.uint64(1)) & self._mask
+        return found
+
+    def _prefix_range(self, prefix):
+        prefix = prefix.lower().encode('ascii', 'replace')
+        lo = np.searchsorted(self.words, prefix, side='left')
+        hi = np.searchsorted(self.words, prefix + b'\xff' * (MAX_WORD_LENGTH - len(prefix)), side='right')
+        return lo, hi
+
+    def count_prefix(self, prefix):
+        """Return how many dictionary words start with `prefix`."""
+        lo, hi = self._prefix_range(prefix)
+        return int(hi - lo)
+
+    def with_prefix(self, prefix, limit=None):
+        """Return the dictionary words starting with `prefix`, in sorted order."""
+        lo, hi = self._prefix_range(prefix)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return [w.decode('ascii', 'replace') for w in self.words[lo:hi].tolist()]
@@ -0,0 +1,210 @@
+"""
+Knowledge distillation of the CNN into a small student model.
+
+The teacher (the full `non_sepcnn_model`, or the shipped model.json) scores
+the real training words plus a large set of generated candidates, half of
+them plain fake words and half trigram-chain words from the Markov model,
+which sit much closer to the decision boundary. A much smaller student (by
+default one block of two 32-filter convolutions over a 16-dim embedding) is
+trained on those soft predictions. `distillation_report` then puts words/sec
+and accuracy of both models side by side, at the app's 0.82 cutoff, and the student is exported in the
+same model.json + shard format the app and `blabrecs.inference.NumpyModel`
+load.
+
+    report = distill(teacher, splits, vectorizer, 'export/student')
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from blabrecs.cascade import APP_CNN_THRESHOLD
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.evaluate import predict_all
+from blabrecs.inference import NumpyModel
+from blabrecs.markov import generate_pronounceable_words
+from blabrecs.packed import MAX_WORD_LENGTH, unique_packed, unpack_words
+from blabrecs.trace import NullTracer
+from blabrecs.wordgen import generate_words
+
+STUDENT = {'blocks': 1,
+           'filters': 16,
+           'kernel_size': 3,
+           'embedding_dim': 16,
+           'dropout_rate': 0.1}
+
+
+def soften(probs, temperature=1.0):
+    """Divide the teacher's logits by `temperature` (1 leaves them as they are)."""
+    probs = np.clip(np.asarray(probs, dtype=np.float64), 1e-7, 1 - 1e-7)
+    logits = np.log(probs) - np.log1p(-probs)
+    return (1.0 / (1.0 + np.exp(-logits / temperature))).astype(np.float32)
+
+
+def distillation_data(teacher, vectorizer, real_words, candidates=2000000, markov_fraction=0.5,
+                      random_dist='english_table', letter_dist='english', markov='model.edn',
+                      dictionary=None, seed=None, batch_size=8192):
+    """Tokens and teacher scores for the real corpus plus generated candidates.
+
+    # Arguments
+        teacher: anything with a Keras-style `predict`.
+        vectorizer: `CharVectorizer` matching the teacher.
+        real_words: packed `(n, 24)` matrix of real words.
+        candidates: int, generated words to add (before de-duplication).
+        markov_fraction: float, share of candidates drawn from the Markov
+            model's trigram chain rather than `generate_words`.
+        markov: path to a model.edn, or a `MarkovModel`.
+        dictionary: `DictionaryIndex` of words never drawn as candidates;
+            None uses `real_words`.
+
+    # Returns
+        A `(tokens, scores, is_real)` tuple; `is_real` marks the rows that
+        came from `real_words`.
+    """
+    rng = np.random.default_rng(seed)
+    real_words = unique_packed(real_words)
+    if dictionary is None:
+        dictionary = DictionaryIndex.from_words(unpack_words(real_words))
+    parts = []
+    n_markov = int(round(candidates * markov_fraction))
+    if n_markov:
+        parts.append(generate_pronounceable_words(n_markov, markov, random_dist, seed=rng, dictionary=dictionary))
+    if candidates - n_markov:
+        fake = generate_words(candidates - n_markov, random_dist=random_dist, letter_dist=letter_dist, seed=rng)
+        parts.append(fake[~dictionary.contains(fake)])
+    fake = unique_packed(np.concatenate(parts)) if parts else np.zeros((0, MAX_WORD_LENGTH), dtype=np.uint8)
+    words = np.concatenate([real_words, fake])
+    is_real = np.zeros(len(words), dtype=bool)
+    is_real[:len(real_words)] = True
+    order = rng.permutation(len(words))
+    tokens = vectorizer.transform_packed(words[order])
+    return tokens, predict_all(teacher.predict, tokens, batch_size), is_real[order]
+
+
+def train_student(tokens, targets, num_features, validation_data=None, student=STUDENT,
+                  epochs=30, batch_size=1024, patience=3, learning_rate=3e-3, tracer=None):
+    """Fit a small `build_classifier` model on soft targets.
+
+    # Arguments
+        tokens: `(n, 24)` token matrix.
+        targets: `(n,)` float targets in [0, 1] (binary cross-entropy takes
+            soft labels as they are).
+        num_features: int, embedding input dimension (tokenizer size + 1).
+        validation_data: optional `(tokens, labels)` for early stopping.
+        student: dict of `build_classifier` arguments.
+
+    # Returns
+        The trained Keras model.
+    """
+    import tensorflow as tf
+    from blabrecs.models import build_classifier
+    from blabrecs.trace import trace_callback
+
+    tracer = tracer or NullTracer()
+    model = build_classifier(input_shape=tokens.shape[1:], num_features=num_features,
+                             learning_rate=learning_rate, **student)
+    monitor = 'val_loss' if validation_data is not None else 'loss'
+    callbacks = [tf.keras.callbacks.EarlyStopping(monitor=monitor, patience=patience, restore_best_weights=True),
+                 trace_callback(tracer)]
+    with tracer.stage("fit_student", items=len(tokens), epochs=epochs, **student) as stage:
+        history = model.fit(tokens, targets, epochs=epochs, batch_size=batch_size,
+                            validation_data=validation_data, callbacks=callbacks, verbose=2)
+        stage['epochs_run'] = len(history.history['loss'])
+    return model
+
+
+def words_per_second(model, tokens, repeat=3, batch_size=8192):
+    """Best-of-`repeat` scoring throughput of `model.predict` over `tokens`."""
+    seconds = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        predict_all(model.predict, tokens, batch_size)
+        seconds = min(seconds, time.perf_counter() - started)
+    return len(tokens) / seconds if seconds else float('inf')
+
+
+def _parameter_count(model):
+    return int(sum(np.asarray(w).size for w in model.weights.values()))
+
+
+def distillation_report(teacher, student, tokens, labels, threshold=APP_CNN_THRESHOLD, speed_tokens=None):
+    """Accuracy and words/sec of teacher and student side by side.
+
+    # Arguments
+        teacher, student: `NumpyModel`s (the serving path both run on).
+        tokens, labels: a labelled split, e.g. the held-out test split.
+        threshold: float, probability above which a word counts as real;
+            the app's cutoff by default.
+        speed_tokens: optional token matrix to time on (defaults to `tokens`).
+
+    # Returns
+        A dict with one entry per model (accuracy, words/sec, parameter
+        count) plus how often the student agrees with the teacher.
+    """
+    labels = np.asarray(labels).astype(bool).reshape(-1)
+    speed_tokens = tokens if speed_tokens is None else speed_tokens
+    report = {'count': int(len(labels)), 'threshold': threshold}
+    decisions = {}
+    for name, model in (('teacher', teacher), ('student', student)):
+        scores = predict_all(model.predict, tokens)
+        decisions[name] = scores > threshold
+        report[name] = {'accuracy': float(np.mean(decisions[name] == labels)) if len(labels) else 0.0,
+                        'words_per_second': words_per_second(model, speed_tokens),
+                        'parameters': _parameter_count(model)}
+    report['agreement'] = float(np.mean(decisions['teacher'] == decisions['student'])) if len(labels) else 0.0
+    report['speedup'] = report['student']['words_per_second'] / report['teacher']['words_per_second']
+    report['accuracy_delta'] = report['student']['accuracy'] - report['teacher']['accuracy']
+    return report
+
+
+def distill(teacher, splits, vectorizer, out_dir, student=STUDENT, candidates=2000000,
+            markov_fraction=0.5, temperature=1.0, hard_weight=0.0, dictionary=None,
+            threshold=APP_CNN_THRESHOLD, seed=None,
+            epochs=30, batch_size=1024, patience=3, learning_rate=3e-3, tracer=None, **data_kwargs):
+    """Distill `teacher` into a small student and export it to `out_dir`.
+
+    # Arguments
+        teacher: a Keras model or a `NumpyModel`.
+        splits: dict of 'train'/'valid'/'test' `Split`s; the real words of
+            the training split are the corpus, the validation split drives
+            early stopping and the test split is used for the report.
+        vectorizer: `CharVectorizer` matching the teacher; the student uses
+            the same one, and the splits are re-tokenized with it.
+        temperature: float, softens the teacher's predictions.
+        hard_weight: float, weight of the true label (1 for real words, 0
+            for generated ones) mixed into the targets.
+        dictionary: `DictionaryIndex` of words never used as generated
+            candidates; None uses the training split's real words.
+        threshold: float, decision cutoff for the report.
+        data_kwargs: passed on to `distillation_data`.
+
+    # Returns
+        The report dict, also written to out_dir/distillation_report.json;
+        the student itself is written as out_dir/model.json + shard.
+    """
+    tracer = tracer or NullTracer()
+    train, valid, test = splits['train'], splits['valid'], splits['test']
+    with tracer.stage("distillation_data", candidates=candidates) as stage:
+        tokens, scores, is_real = distillation_data(teacher, vectorizer, train.words[train.labels],
+                                                    candidates, markov_fraction, dictionary=dictionary,
+                                                    seed=seed, **data_kwargs)
+        stage['items'] = len(tokens)
+    targets = (1 - hard_weight) * soften(scores, temperature) + hard_weight * is_real
+    student_model = train_student(tokens, targets.astype(np.float32), max(vectorizer.char_index.values()) + 1,
+                                  validation_data=(vectorizer.transform_packed(valid.words), np.asarray(valid.labels)),
+                                  student=student, epochs=epochs, batch_size=batch_size,
+                                  patience=patience, learning_rate=learning_rate, tracer=tracer)
+    teacher = teacher if isinstance(teacher, NumpyModel) else NumpyModel.from_keras(teacher)
+    student_model = NumpyModel.from_keras(student_model)
+    os.makedirs(out_dir, exist_ok=True)
+    student_model.save(out_dir)
+    with tracer.stage("distillation_report", items=len(test.labels)):
+        report = distillation_report(teacher, student_model, vectorizer.transform_packed(test.words), test.labels,
+                                     threshold)
+    report.update(student=dict(report['student'], config=student), temperature=temperature,
+                  hard_weight=hard_weight, training_words=int(len(tokens)))
+    with open(os.path.join(out_dir, 'distillation_report.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    return report
@@ -0,0 +1,142 @@
+"""
+Headless evaluation reports.
+
+Scores whole word sets into preallocated arrays, computes length and
+character histograms with `np.bincount` over packed words, sorts each set's
+predictions exactly once, and writes a JSON report, an HTML summary and PNG
+plots (with matplotlib's non-interactive Agg backend) instead of blocking
+on `plt.show()`.
+"""
+
+import html
+import json
+import os
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH, unpack_words, word_lengths
+
+DEFAULT_THRESHOLDS = (0.5, 0.8, 0.82, 0.9)
+
+
+def predict_all(predict, tokens, batch_size=8192):
+    """Run `predict` over `tokens` in batches, writing into one float32 array."""
+    scores = np.empty(len(tokens), dtype=np.float32)
+    for start in range(0, len(tokens), batch_size):
+        batch = tokens[start:start + batch_size]
+        scores[start:start + len(batch)] = np.asarray(predict(batch)).reshape(-1)
+    return scores
+
+
+def length_histogram(packed, max_length=MAX_WORD_LENGTH):
+    """Number of words of each length 0..max_length."""
+    return np.bincount(word_lengths(packed), minlength=max_length + 1)
+
+
+def char_histogram(packed):
+    """`{character: count}` over every character of every word."""
+    counts = np.bincount(np.asarray(packed, dtype=np.uint8).ravel(), minlength=256)
+    counts[0] = 0
+    return {chr(c): int(counts[c]) for c in np.argsort(-counts, kind='stable') if counts[c]}
+
+
+def summarize(packed, scores, thresholds=DEFAULT_THRESHOLDS, extremes=20, order=None):
+    """Statistics for one scored word set.
+
+    `order` is `np.argsort(scores, kind='stable')` if the caller already has
+    it; otherwise the scores are sorted here, once. Thresholds are cast to
+    the scores' dtype, as `scores > t` does for a Python float `t`.
+    """
+    if order is None:
+        order = np.argsort(scores, kind='stable')
+    ranked = scores[order]
+    n = len(ranked)
+    lowest = order[:extremes]
+    highest = order[::-1][:extremes]
+    accepted = n - np.searchsorted(ranked, np.asarray(thresholds, dtype=ranked.dtype), side='right')
+    return {'count': n,
+            'mean': float(ranked.mean()) if n else None,
+            'median': float(np.median(ranked)) if n else None,
+            'quantiles': {str(q): float(ranked[min(int(q * n), n - 1)]) for q in (0.01, 0.1, 0.25, 0.75, 0.9, 0.99)} if n else {},
+            'accept_rate': {str(t): float(a / n) if n else 0.0 for t, a in zip(thresholds, accepted.tolist())},
+            'length_histogram': length_histogram(packed).tolist(),
+            'char_histogram': char_histogram(packed),
+            'lowest': list(zip(unpack_words(packed[lowest]), scores[lowest].tolist())),
+            'highest': list(zip(unpack_words(packed[highest]), scores[highest].tolist()))}
+
+
+def _slug(name):
+    return ''.join(c if c.isalnum() else '_' for c in name.lower()).strip('_')
+
+
+def plot_sorted_predictions(ranked, title, filename):
+    """Save the curve of already sorted predictions as a PNG (skipped without matplotlib)."""
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return None
+    fig = plt.figure(figsize=(16, 7))
+    plt.plot(np.arange(len(ranked)), ranked, label=title)
+    plt.ylabel("prediction")
+    plt.title(title)
+    plt.legend()
+    fig.savefig(filename)
+    plt.close(fig)
+    return filename
+
+
+def _write_html(report, filename):
+    rows = []
+    for name, s in report['sets'].items():
+        if not s['count']:
+            rows.append(f'<h2>{html.escape(name)}</h2><p>no words</p>')
+            continue
+        rates = ', '.join(f'{t}: {r:.3f}' for t, r in s['accept_rate'].items())
+        image = f'<br><img src="{html.escape(s["plot"])}" width="800">' if s.get('plot') else ''
+        rows.append(f'<h2>{html.escape(name)}</h2><p>{s["count"]} words, mean {s["mean"]:.4f}, '
+                    f'median {s["median"]:.4f}<br>accept rate {html.escape(rates)}</p>{image}')
+    with open(filename, 'w') as f:
+        f.write(f'<!doctype html><title>{html.escape(report["model"])}</title>'
+                f'<h1>{html.escape(report["model"])}</h1>' + '\n'.join(rows))
+
+
+def evaluate_sets(predict, vectorizer, word_sets, out_dir, model_name, thresholds=DEFAULT_THRESHOLDS,
+                  extremes=20, batch_size=8192, plots=True, scorer=None):
+    """Score several packed word sets and write a report to `out_dir`.
+
+    # Arguments
+        predict: callable mapping a token batch to probabilities
+            (e.g. `model.predict`).
+        vectorizer: `CharVectorizer` matching the model.
+        word_sets: dict of set name -> packed `(n, 24)` word matrix.
+        out_dir: str, directory for report.json, report.html, the PNG plots
+            and one `<set>.npy` array of scores per set.
+        model_name: str, used in titles.
+        scorer: optional `blabrecs.scorecache.CachedScorer`; when given,
+            words are scored through its cache instead of `predict`.
+
+    # Returns
+        The report dict (also written to report.json).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    report = {'model': model_name, 'sets': {}}
+    for name, packed in word_sets.items():
+        packed = np.asarray(packed, dtype=np.uint8)
+        if scorer is not None:
+            scores = scorer.score_packed(packed)
+        else:
+            scores = predict_all(predict, vectorizer.transform_packed(packed), batch_size)
+        np.save(os.path.join(out_dir, _slug(name) + '.npy'), scores)
+        order = np.argsort(scores, kind='stable')
+        summary = summarize(packed, scores, thresholds, extremes, order)
+        if plots and len(scores):
+            plot = plot_sorted_predictions(scores[order], f"{model_name} Prediction of {name}",
+                                           os.path.join(out_dir, _slug(name) + '.png'))
+            summary['plot'] = os.path.basename(plot) if plot else None
+        report['sets'][name] = summary
+    with open(os.path.join(out_dir, 'report.json'), 'w') as f:
+        json.dump(report, f, indent=1)
+    _write_html(report, os.path.join(out_dir, 'report.html'))
+    return report
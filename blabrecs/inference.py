@@ -0,0 +1,268 @@
+"""
+NumPy-only inference for the TensorFlow.js CNN (model.json + weight shards).
+
+Reads the Keras topology stored in a TF.js `model.json` and the binary
+weight shards it points at, and runs the forward pass of the layers that
+`non_sepcnn_model` builds: Embedding, Dropout (a no-op at inference),
+Conv1D, MaxPooling1D, GlobalAveragePooling1D and Dense. Loading takes
+milliseconds and needs no TensorFlow.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from blabrecs.vectorize import CharVectorizer
+
+_DTYPES = {'float32': np.float32, 'int32': np.int32, 'uint8': np.uint8,
+           'uint16': np.uint16, 'float16': np.float16, 'bool': np.bool_}
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return e / e.sum(axis=-1, keepdims=True)
+
+
+ACTIVATIONS = {'linear': lambda x: x,
+               'relu': _relu,
+               'sigmoid': _sigmoid,
+               'tanh': np.tanh,
+               'softmax': _softmax}
+
+
+def _shard_path(model_dir, path):
+    full = os.path.join(model_dir, path)
+    if os.path.exists(full):
+        return full
+    # The shipped model.json refers to "blabrecs/group1-shard1of1.bin" but
+    # the shard sits next to it.
+    return os.path.join(model_dir, os.path.basename(path))
+
+
+def dequantize(values, quantization):
+    """Undo TF.js weight quantization (`{'dtype', 'scale', 'min'}`)."""
+    if quantization['dtype'] == 'float16':
+        return values.astype(np.float32)
+    return values.astype(np.float32) * np.float32(quantization['scale']) + np.float32(quantization['min'])
+
+
+def load_weights(model_json_path):
+    """Read every weight listed in a TF.js `model.json` manifest.
+
+    # Returns
+        A dict of weight name (e.g. 'conv1d/kernel') -> float32 array.
+    """
+    with open(model_json_path) as f:
+        spec = json.load(f)
+    model_dir = os.path.dirname(os.path.abspath(model_json_path))
+    weights = {}
+    for group in spec['weightsManifest']:
+        buffer = b''.join(open(_shard_path(model_dir, p), 'rb').read() for p in group['paths'])
+        offset = 0
+        for entry in group['weights']:
+            quantization = entry.get('quantization')
+            dtype = np.dtype(_DTYPES[quantization['dtype'] if quantization else entry['dtype']])
+            count = int(np.prod(entry['shape'], dtype=np.int64))
+            values = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset).reshape(entry['shape'])
+            offset += count * dtype.itemsize
+            weights[entry['name']] = dequantize(values, quantization) if quantization else values
+    return weights
+
+
+def save_tfjs(out_dir, model_topology, entries, shard_name='group1-shard1of1.bin'):
+    """Write a TF.js layers-model (model.json + one weight shard).
+
+    # Arguments
+        out_dir: str, directory to write into.
+        model_topology: dict, the `modelTopology` section (Keras config).
+        entries: list of dicts with 'name', 'shape', 'dtype' (the logical
+            dtype, e.g. 'float32'), 'data' (the array to store) and
+            optionally 'quantization' (`{'dtype', 'scale', 'min'}`).
+
+    # Returns
+        The path of the written model.json.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = []
+    with open(os.path.join(out_dir, shard_name), 'wb') as f:
+        for entry in entries:
+            f.write(np.ascontiguousarray(entry['data']).tobytes())
+            spec = {'name': entry['name'], 'shape': list(entry['shape']), 'dtype': entry['dtype']}
+            if entry.get('quantization'):
+                spec['quantization'] = entry['quantization']
+            manifest.append(spec)
+    model_json = {'format': 'layers-model',
+                  'generatedBy': model_topology.get('keras_version', 'blabrecs'),
+                  'convertedBy': 'blabrecs',
+                  'modelTopology': model_topology,
+                  'weightsManifest': [{'paths': [shard_name], 'weights': manifest}]}
+    path = os.path.join(out_dir, 'model.json')
+    with open(path, 'w') as f:
+        json.dump(model_json, f)
+    return path
+
+
+def float_entries(weights):
+    """`save_tfjs` entries storing every weight as plain float32."""
+    return [{'name': name, 'shape': w.shape, 'dtype': 'float32', 'data': np.asarray(w, dtype=np.float32)}
+            for name, w in weights.items()]
+
+
+def _conv1d_same(x, kernel, bias):
+    """Stride-1 'same' Conv1D as one matmul per kernel tap."""
+    k = kernel.shape[0]
+    left = (k - 1) // 2
+    length = x.shape[1]
+    padded = np.pad(x, ((0, 0), (left, k - 1 - left), (0, 0)))
+    out = padded[:, 0:length] @ kernel[0]
+    for j in range(1, k):
+        out += padded[:, j:j + length] @ kernel[j]
+    out += bias
+    return out
+
+
+class NumpyModel:
+    """A Sequential Keras CNN evaluated with NumPy.
+
+    # Arguments
+        layers: list of Keras layer configs (`{'class_name', 'config'}`).
+        weights: dict of weight name -> array, as from `load_weights`.
+    """
+
+    def __init__(self, layers, weights, model_topology=None):
+        self.model_topology = model_topology
+        self.layers = [l for l in layers if l['class_name'] not in ('InputLayer', 'Dropout')]
+        self.weights = {name: np.asarray(w, dtype=np.float32) for name, w in weights.items()}
+        for layer in self.layers:
+            config = layer['config']
+            if layer['class_name'] == 'Conv1D':
+                if (tuple(config['strides']) != (1,) or tuple(config['dilation_rate']) != (1,)
+                        or config['padding'] not in ('same', 'valid')
+                        or config.get('data_format', 'channels_last') != 'channels_last'):
+                    raise NotImplementedError(f"unsupported Conv1D config in layer {config['name']}")
+            elif layer['class_name'] == 'MaxPooling1D':
+                if (config.get('padding', 'valid') != 'valid'
+                        or config.get('data_format', 'channels_last') != 'channels_last'):
+                    raise NotImplementedError(f"unsupported MaxPooling1D config in layer {config['name']}")
+            elif layer['class_name'] not in ('Embedding', 'GlobalAveragePooling1D', 'Dense', 'Flatten'):
+                raise NotImplementedError(f"unsupported layer type {layer['class_name']}")
+        self._fuse_embedding()
+
+    @classmethod
+    def load(cls, model_json_path='model.json'):
+        with open(model_json_path) as f:
+            spec = json.load(f)
+        layers = spec['modelTopology']['model_config']['config']['layers']
+        return cls(layers, load_weights(model_json_path), spec['modelTopology'])
+
+    @classmethod
+    def from_keras(cls, keras_model):
+        """Copy the layers and weights of a trained Keras Sequential model."""
+        config = json.loads(keras_model.to_json())
+        topology = {'keras_version': config.pop('keras_version', None),
+                    'backend': config.pop('backend', 'tensorflow'),
+                    'model_config': config}
+        weights = {w.name.split(':')[0]: w.numpy() for w in keras_model.weights}
+        return cls(config['config']['layers'], weights, topology)
+
+    def save(self, out_dir, entries=None):
+        """Export as a TF.js model.json + shard (float32 unless `entries` is given)."""
+        return save_tfjs(out_dir, self.model_topology, entries or float_entries(self.weights))
+
+    def _fuse_embedding(self):
+        # Embedding followed by a 'same' Conv1D only ever sees vocab_size
+        # distinct vectors, so project every embedding row through every
+        # kernel tap once and turn the first convolution into table lookups.
+        self._tap_tables = None
+        if (len(self.layers) >= 2 and self.layers[0]['class_name'] == 'Embedding'
+                and self.layers[1]['class_name'] == 'Conv1D'
+                and self.layers[1]['config']['padding'] == 'same'):
+            embeddings = self.weights[self.layers[0]['config']['name'] + '/embeddings']
+            kernel = self.weights[self.layers[1]['config']['name'] + '/kernel']
+            # Row `vocab_size` stays zero: it stands for the padding outside the word.
+            tables = np.zeros((kernel.shape[0], embeddings.shape[0] + 1, kernel.shape[2]), dtype=np.float32)
+            tables[:, :-1] = np.einsum('ve,keo->kvo', embeddings, kernel)
+            self._tap_tables = tables
+
+    def _fused_first_conv(self, tokens):
+        layer = self.layers[1]['config']
+        k, pad_index = self._tap_tables.shape[0], self._tap_tables.shape[1] - 1
+        left = (k - 1) // 2
+        length = tokens.shape[1]
+        padded = np.pad(tokens, ((0, 0), (left, k - 1 - left)), constant_values=pad_index)
+        out = self._tap_tables[0][padded[:, 0:length]]
+        for j in range(1, k):
+            out += self._tap_tables[j][padded[:, j:j + length]]
+        out += self.weights[layer['name'] + '/bias']
+        return ACTIVATIONS[layer['activation']](out)
+
+    def _run(self, tokens):
+        tokens = np.asarray(tokens).astype(np.intp)
+        layers = self.layers
+        if self._tap_tables is not None:
+            x = self._fused_first_conv(tokens)
+            layers = layers[2:]
+        else:
+            x = tokens
+        for layer in layers:
+            kind, config = layer['class_name'], layer['config']
+            name = config['name']
+            if kind == 'Embedding':
+                x = self.weights[name + '/embeddings'][x]
+            elif kind == 'Conv1D':
+                kernel = self.weights[name + '/kernel']
+                if config['padding'] == 'same':
+                    x = _conv1d_same(x, kernel, self.weights[name + '/bias'])
+                else:
+                    length = x.shape[1] - kernel.shape[0] + 1
+                    out = x[:, 0:length] @ kernel[0]
+                    for j in range(1, kernel.shape[0]):
+                        out += x[:, j:j + length] @ kernel[j]
+                    x = out + self.weights[name + '/bias']
+                x = ACTIVATIONS[config['activation']](x)
+            elif kind == 'MaxPooling1D':
+                # Keras stores strides=None when they equal the pool size.
+                pool, stride = config['pool_size'][0], (config.get('strides') or config['pool_size'])[0]
+                steps = (x.shape[1] - pool) // stride + 1
+                if pool == stride:
+                    x = x[:, :steps * pool].reshape(x.shape[0], steps, pool, x.shape[2]).max(axis=2)
+                else:
+                    x = np.stack([x[:, i * stride:i * stride + pool].max(axis=1) for i in range(steps)], axis=1)
+            elif kind == 'GlobalAveragePooling1D':
+                x = x.mean(axis=1)
+            elif kind == 'Flatten':
+                x = x.reshape(x.shape[0], -1)
+            elif kind == 'Dense':
+                x = x @ self.weights[name + '/kernel']
+                if config.get('use_bias', True):
+                    x = x + self.weights[name + '/bias']
+                x = ACTIVATIONS[config['activation']](x)
+        return x
+
+    def predict(self, tokens, batch_size=4096):
+        """Score a `(n, 24)` token matrix; returns `(n, 1)` like `model.predict`."""
+        tokens = np.asarray(tokens)
+        if len(tokens) <= batch_size:
+            return self._run(tokens).astype(np.float32)
+        return np.concatenate([self._run(tokens[i:i + batch_size])
+                               for i in range(0, len(tokens), batch_size)]).astype(np.float32)
+
+    def predict_words(self, words, vectorizer=None, batch_size=4096):
+        """Score a list of strings; returns a `(n,)` array of probabilities."""
+        vectorizer = vectorizer or CharVectorizer()
+        return self.predict(vectorizer.transform(words), batch_size)[:, 0]
+
+
+def compare_with_keras(numpy_model, keras_model, tokens):
+    """Return the largest absolute difference between the two models' predictions."""
+    expected = keras_model.predict(tokens)
+    return float(np.max(np.abs(numpy_model.predict(tokens) - expected)))
@@ -0,0 +1,439 @@
+"""
+Trigram Markov word scorer and trainer, compatible with src/blabrecs/markov.cljc.
+
+The app's model (model.edn) maps a two-character prefix to the probability
+of each following character, with words wrapped as "^word$". Here the same
+model is a dense `(28, 28, 28)` array of log-probabilities indexed by
+`^`, a-z, `$`, so whole arrays of packed words are scored with a single
+gather and sum instead of nested map lookups, and long words cannot
+underflow.
+
+The same table also runs the other way: `MarkovSampler` walks the trigram
+chain for whole batches of words at once to make pronounceable-looking fake
+words.
+"""
+
+import re
+from decimal import Decimal
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH, as_packed, pack_words
+from blabrecs.wordgen import english_letters, generate_lengths
+
+ALPHABET = '^abcdefghijklmnopqrstuvwxyz$'
+START, END = 0, len(ALPHABET) - 1
+N = len(ALPHABET)
+MAX_BASELINE_LENGTH = 24
+# Shortest word `MarkovSampler` returns; every `generate_lengths` distribution starts here.
+MIN_WORD_LENGTH = 3
+
+# byte -> symbol index, with N meaning "not a letter"
+_CODES = np.full(256, N, dtype=np.int32)
+for _i, _c in enumerate(ALPHABET):
+    _CODES[ord(_c)] = _i
+_CODES[np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype=np.uint8)] = np.arange(1, 27)
+_CODES[ord('^')] = N
+_CODES[ord('$')] = N
+
+_ENTRY = re.compile(r'"((?:[^"\\]|\\.)*)"\s*\{([^}]*)\}')
+_INNER = re.compile(r'"((?:[^"\\]|\\.)*)"\s*([-+]?[0-9.]+(?:[eE][-+]?[0-9]+)?)')
+
+
+def read_edn_model(filename):
+    """Parse a model.edn file into `{prefix: {char: probability}}`."""
+    with open(filename) as f:
+        text = f.read()
+    return {prefix: {char: float(p) for char, p in _INNER.findall(body)}
+            for prefix, body in _ENTRY.findall(text)}
+
+
+def encode_words(words):
+    """Turn words into symbol sequences `^ c1 .. cL $` padded with `$`.
+
+    # Returns
+        A `(codes, lengths)` tuple: `codes` is an `(n, width + 2)` int array
+        of symbol indices (N for characters outside a-z), `lengths` the
+        number of characters in each word.
+    """
+    packed = as_packed(words)
+    n, width = packed.shape
+    lengths = np.count_nonzero(packed, axis=1)
+    codes = np.full((n, width + 2), END, dtype=np.int32)
+    codes[:, 0] = START
+    body = _CODES[packed]
+    body[packed == 0] = END
+    codes[:, 1:width + 1] = body
+    return codes, lengths
+
+
+def trigram_indices(codes, base=N):
+    """Flat `(a * base + b) * base + c` index of every trigram in `codes`."""
+    return (codes[:, :-2] * base + codes[:, 1:-1]) * base + codes[:, 2:]
+
+
+class MarkovModel:
+    """A dense trigram model.
+
+    # Arguments
+        probs: `(28, 28, 28)` array, `probs[a, b, c]` = P(c | a b).
+        present: `(28, 28, 28)` bool array of the transitions the model
+            actually contains (the ones `avg-transition-prob` averages).
+        baselines: optional `(25,)` log baselines to use instead of
+            `gen_baseline_probs` (e.g. the ones stored in a binary export).
+    """
+
+    def __init__(self, probs, present=None, baselines=None):
+        self.probs = np.asarray(probs, dtype=np.float64)
+        self.present = self.probs > 0 if present is None else np.asarray(present, dtype=bool)
+        with np.errstate(divide='ignore'):
+            self.log_probs = np.where(self.present, np.log(self.probs), -np.inf)
+        # One extra symbol (index N) for anything that is not a letter.
+        table = np.full((N + 1, N + 1, N + 1), -np.inf)
+        table[:N, :N, :N] = self.log_probs
+        # Trigrams with `$` in the middle only occur in the padding after
+        # the end of a word, so they contribute nothing.
+        table[:, END, :] = 0.0
+        self._table = table.ravel()
+        self.avg_prob = float(self.probs[self.present].mean()) if self.present.any() else 0.0
+        self.baselines = self.gen_baseline_probs() if baselines is None else np.asarray(baselines, dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, model):
+        """Build from the nested `{prefix: {char: probability}}` form."""
+        probs = np.zeros((N, N, N))
+        present = np.zeros((N, N, N), dtype=bool)
+        for prefix, following in model.items():
+            if len(prefix) != 2 or not all(c in ALPHABET for c in prefix):
+                continue
+            a, b = ALPHABET.index(prefix[0]), ALPHABET.index(prefix[1])
+            for char, p in following.items():
+                if char in ALPHABET:
+                    probs[a, b, ALPHABET.index(char)] = p
+                    present[a, b, ALPHABET.index(char)] = True
+        return cls(probs, present)
+
+    @classmethod
+    def load(cls, filename='model.edn'):
+        return cls.from_dict(read_edn_model(filename))
+
+    def gen_baseline_probs(self):
+        """Log of `gen-baseline-probs`: the average transition probability
+        raised to the word length, for lengths 0 to 24."""
+        with np.errstate(divide='ignore'):
+            return np.arange(MAX_BASELINE_LENGTH + 1) * np.log(self.avg_prob)
+
+    def _log_probability(self, words):
+        codes, lengths = encode_words(words)
+        return self._table[trigram_indices(codes, N + 1)].sum(axis=1), lengths
+
+    def log_probability(self, words):
+        """Natural log of the model's probability for each word.
+
+        # Arguments
+            words: list of strings, or a packed `(n, 24)` uint8 matrix.
+
+        # Returns
+            A float64 array; -inf for words containing an unseen trigram or
+            a character outside a-z.
+        """
+        return self._log_probability(words)[0]
+
+    def probability(self, words):
+        """The model's probability for each word (may underflow to 0)."""
+        return np.exp(self.log_probability(words))
+
+    def sufficiently_probable(self, words):
+        """Same decision as `sufficiently-probable?` in the app's :markov mode."""
+        log_probs, lengths = self._log_probability(words)
+        return log_probs > self.baselines[np.minimum(lengths, MAX_BASELINE_LENGTH)]
+
+    def sampler(self, first=None, **kwargs):
+        """A `MarkovSampler` over this model.
+
+        model.edn has no first-letter distribution, so unless `first` is
+        given the first letter follows the `english_letters` frequencies.
+        """
+        if first is None:
+            first = np.array([english_letters.get(c, 0) for c in ALPHABET], dtype=np.float64)
+        return MarkovSampler(self.probs, first, **kwargs)
+
+
+def _edn_double(x):
+    """Format a float the way Clojure's `pr-str` (Java `Double.toString`) does."""
+    if x == 0 or 1e-3 <= abs(x) < 1e7:
+        return repr(float(x))
+    sign, digits, exponent = Decimal(repr(float(x))).as_tuple()
+    mantissa = ''.join(map(str, digits))
+    return f"{'-' if sign else ''}{mantissa[0]}.{mantissa[1:] or '0'}E{len(digits) - 1 + exponent}"
+
+
+class TrigramCounts:
+    """Raw trigram counts, the mergeable state behind a `MarkovModel`.
+
+    Counts from different corpora (or shards of one corpus) simply add up,
+    so a model can be retrained incrementally and in parallel.
+
+    # Arguments
+        counts: optional `(28, 28, 28)` integer array to start from.
+    """
+
+    def __init__(self, counts=None):
+        self.counts = np.zeros((N, N, N), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+
+    def add(self, words):
+        """Count the trigrams of `words` (a list of strings or a packed matrix).
+
+        Words containing anything other than letters are skipped, since the
+        dense model has no symbol for them.
+        """
+        if not isinstance(words, np.ndarray):
+            words = pack_words(words, max((len(w) for w in words), default=1))
+        codes, lengths = encode_words(words)
+        valid = (codes < N).all(axis=1)
+        codes, lengths = codes[valid], lengths[valid]
+        indices = trigram_indices(codes)
+        in_word = np.arange(indices.shape[1]) < lengths[:, None]
+        self.counts += np.bincount(indices[in_word], minlength=N ** 3).reshape(N, N, N)
+        return self
+
+    def add_file(self, filename, chunk_lines=1 << 20):
+        """Count a newline separated word list, reading it in chunks."""
+        with open(filename, 'rb') as f:
+            while True:
+                lines = f.readlines(chunk_lines * 16)
+                if not lines:
+                    break
+                words = [w for w in (l.decode('utf-8', 'replace').strip().lower() for l in lines) if w]
+                self.add(words)
+        return self
+
+    def merge(self, other):
+        """Add another `TrigramCounts` into this one."""
+        self.counts += other.counts
+        return self
+
+    def __add__(self, other):
+        return TrigramCounts(self.counts + other.counts)
+
+    def save(self, filename):
+        np.save(filename, self.counts)
+
+    @classmethod
+    def load(cls, filename):
+        return cls(np.load(filename))
+
+    def probabilities(self):
+        """`counts->probs`: normalize every prefix's counts to probabilities."""
+        totals = self.counts.sum(axis=2, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(totals > 0, self.counts / np.maximum(totals, 1), 0.0)
+
+    def to_model(self):
+        return MarkovModel(self.probabilities(), self.counts > 0)
+
+    def sampler(self, **kwargs):
+        """A `MarkovSampler` with the first letters of the counted words."""
+        return MarkovSampler(self.probabilities(), self.counts[START].sum(axis=1), **kwargs)
+
+    def to_edn(self):
+        """Serialize to the `{"ab" {"c" p ...} ...}` map that app.cljs reads."""
+        probs = self.probabilities()
+        entries = []
+        for a, b in zip(*np.nonzero(self.counts.sum(axis=2))):
+            inner = ', '.join(f'"{ALPHABET[c]}" {_edn_double(probs[a, b, c])}'
+                              for c in np.flatnonzero(self.counts[a, b]))
+            entries.append(f'"{ALPHABET[a]}{ALPHABET[b]}" {{{inner}}}')
+        return '{' + ', '.join(entries) + '}'
+
+    def write_edn(self, filename='model.edn'):
+        with open(filename, 'w') as f:
+            f.write(self.to_edn())
+
+
+def train_markov(filenames=('enable.txt',), edn_out='model.edn', counts_out=None, counts_in=None):
+    """Retrain the Markov model, optionally on top of previously saved counts.
+
+    # Arguments
+        filenames: word list files to count.
+        edn_out: str, where to write the model for the app (or None).
+        counts_out: str, where to save the raw counts as `.npy` (or None).
+        counts_in: str, `.npy` counts to merge with (or None).
+
+    # Returns
+        The resulting `TrigramCounts`.
+    """
+    counts = TrigramCounts.load(counts_in) if counts_in else TrigramCounts()
+    for filename in filenames:
+        counts.add_file(filename)
+    if counts_out:
+        counts.save(counts_out)
+    if edn_out:
+        counts.write_edn(edn_out)
+    return counts
+
+
+# symbol index -> byte of a packed word (`^` and `$` are padding)
+_SYMBOL_BYTES = np.frombuffer(b'\0' + ALPHABET[1:-1].encode('ascii') + b'\0', dtype=np.uint8)
+
+
+def _row_cdfs(weights):
+    """Per-row CDFs of a `(rows, N)` weight table, flattened for `_draw`.
+
+    Row `r` is stored as `r + cdf`, which makes the whole table one sorted
+    array, so a single `searchsorted` draws from a different row per word.
+
+    # Returns
+        A `(cdfs, valid)` tuple; `valid` marks the rows with any weight.
+    """
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, N)
+    totals = weights.sum(axis=1)
+    valid = totals > 0
+    cdf = np.cumsum(weights, axis=1) / np.where(valid, totals, 1.0)[:, None]
+    cdf[~valid] = 1.0
+    cdf[:, -1] = 1.0
+    return (np.arange(len(weights))[:, None] + cdf).ravel(), valid
+
+
+def _draw(rng, table, rows):
+    """One symbol per entry of `rows` from the given rows of a `_row_cdfs` table.
+
+    # Returns
+        A `(symbols, valid)` tuple; `valid` is False where the row was empty.
+    """
+    cdfs, valid = table
+    picks = np.searchsorted(cdfs, rows + rng.random(len(rows)), side='right') - rows * N
+    return np.minimum(picks, N - 1), valid[rows]
+
+
+class MarkovSampler:
+    """Bulk trigram-chain word generator.
+
+    Every step of the walk draws the next character for the whole batch
+    with one `searchsorted` over the flattened per-prefix CDFs. Word lengths
+    are drawn up front (see `blabrecs.wordgen.generate_lengths`). Until the
+    last character, `$` is excluded. The last character `c` after prefix
+    `ab` is weighted by `P(c | a b) * P($ | b c)`, so every word ends on a
+    transition the model has seen. Walks that reach a prefix with no usable
+    continuation are redrawn, as are words found in `dictionary`.
+
+    Without a length distribution the chain runs free until it emits `$`.
+    Walks that end before `MIN_WORD_LENGTH` letters, or that have not ended
+    after `max_length` letters, are redrawn rather than kept or cut off.
+
+    This replaces the `pronounceable` package: the words look like English
+    by construction, and a million take about a second.
+
+    # Arguments
+        probs: `(28, 28, 28)` array, `probs[a, b, c]` = P(c | a b).
+        first: `(28,)` weights of the first letter.
+        random_dist: default length distribution (see
+            `blabrecs.wordgen.RANDOM_DISTS`), or None to let every word end
+            wherever the chain emits `$`.
+        dictionary: optional `DictionaryIndex`; its words are never returned.
+        max_length: int, width of the packed output.
+    """
+
+    def __init__(self, probs, first, random_dist='english_table', dictionary=None, max_length=MAX_WORD_LENGTH):
+        probs = np.asarray(probs, dtype=np.float64)
+        self.random_dist = random_dist
+        self.dictionary = dictionary
+        self.max_length = max_length
+        letters = np.zeros(N, dtype=bool)
+        letters[START + 1:END] = True
+        first = np.where(letters, np.asarray(first, dtype=np.float64), 0.0)
+        ends = probs[:, :, END]
+        cont = np.where(letters, probs, 0.0)
+        free = probs.copy()
+        free[:, :, START] = 0.0
+        # (first-letter table, prefix table) pairs
+        self._cont = (_row_cdfs(first * (cont[START].sum(axis=1) > 0)), _row_cdfs(cont))
+        self._final = (_row_cdfs(first * ends[START]), _row_cdfs(cont * ends[None, :, :]))
+        self._free = (_row_cdfs(first * (free[START].sum(axis=1) > 0)), _row_cdfs(free))
+
+    def _walk(self, rng, m, lengths):
+        """One attempt at `m` words of the given lengths, longest first
+        (free-running if `lengths` is None).
+
+        # Returns
+            A `(symbols, good)` tuple: an `(m, max_length)` symbol matrix
+            padded with `$`, and which rows are complete words.
+        """
+        width = self.max_length
+        # A free-running walk takes one more step, to see whether it ends.
+        steps_total = width if lengths is not None else width + 1
+        symbols = np.full((m, steps_total), END, dtype=np.uint8)
+        good = np.ones(m, dtype=bool)
+        running = np.ones(m, dtype=bool)
+        # `a * N + b` for the prefix `ab` of every word; 0 for the first step.
+        rows = np.zeros(m, dtype=np.int64)
+        for t in range(steps_total):
+            if lengths is not None:
+                # Longest first, so the words still running are a prefix of the batch.
+                active = np.count_nonzero(lengths > t)
+                cont = np.count_nonzero(lengths > t + 1)
+                steps = ((slice(0, cont), self._cont), (slice(cont, active), self._final))
+            else:
+                active = m
+                steps = ((np.flatnonzero(running), self._free),)
+            if not active:
+                break
+            for sel, (first_table, table) in steps:
+                picks, valid = _draw(rng, first_table if t == 0 else table, rows[sel])
+                symbols[sel, t] = picks
+                good[sel] &= valid
+            rows[:active] = rows[:active] % N * N + symbols[:active, t]
+            if lengths is None:
+                running &= symbols[:, t] != END
+                if not running.any():
+                    break
+        if lengths is None:
+            good &= ~running & (np.argmax(symbols == END, axis=1) >= MIN_WORD_LENGTH)
+        return symbols[:, :width], good
+
+    def generate(self, n, random_dist=None, lengths=None, seed=None, max_attempts=100):
+        """Generate `n` words.
+
+        # Arguments
+            n: int, number of words.
+            random_dist: length distribution, overriding the sampler's.
+            lengths: optional `(n,)` int array of exact word lengths.
+            seed: int, `np.random.SeedSequence` or `np.random.Generator`.
+            max_attempts: int, redraw rounds before giving up on lengths
+                the model cannot produce.
+
+        # Returns
+            A packed `(n, max_length)` uint8 word matrix.
+        """
+        rng = np.random.default_rng(seed)
+        random_dist = random_dist or self.random_dist
+        if lengths is None and random_dist is not None:
+            lengths = generate_lengths(n, random_dist, rng, self.max_length)
+        if lengths is not None:
+            lengths = np.minimum(np.asarray(lengths, dtype=np.int64), self.max_length)
+        words = np.zeros((n, self.max_length), dtype=np.uint8)
+        pending = np.arange(n)
+        if lengths is not None:
+            pending = pending[np.argsort(-lengths, kind='stable')]
+        for _ in range(max_attempts):
+            if not len(pending):
+                return words
+            symbols, good = self._walk(rng, len(pending), lengths[pending] if lengths is not None else None)
+            words[pending[good]] = _SYMBOL_BYTES[symbols[good]]
+            retry = ~good
+            if self.dictionary is not None:
+                retry[good] = self.dictionary.contains(words[pending[good]])
+            pending = pending[retry]
+        raise ValueError(f"could not generate {len(pending)} of {n} words from this model; "
+                         f"unreachable lengths: {sorted(set(lengths[pending].tolist())) if lengths is not None else None}")
+
+    def sample(self, rng, count):
+        """`generate` as a negative source (see `blabrecs.pipeline`)."""
+        return self.generate(count, seed=rng)
+
+
+def generate_pronounceable_words(n, model='model.edn', random_dist='english_table', seed=None, dictionary=None):
+    """`n` packed trigram-chain words from a model.edn file or a `MarkovModel`."""
+    if isinstance(model, str):
+        model = MarkovModel.load(model)
+    return model.sampler(random_dist=random_dist, dictionary=dictionary).generate(n, seed=seed)
@@ -0,0 +1,182 @@
+"""
+Compact binary export of the Markov model.
+
+`app.cljs` fetches model.edn (~190 KB of text), parses it into nested maps
+with `edn/read-string` and computes `gen-baseline-probs` before the Markov
+checker can answer anything. The binary form is ready to use as soon as it
+arrives: the front-end wraps the buffer in typed arrays without parsing
+anything (see src/blabrecs/markov_bin.cljs). The default float32 encoding
+(88 KB) gives the same decision as model.edn for every word in enable.txt.
+The 16-bit encoding (44 KB) changes one of them.
+
+Layout (little-endian):
+
+    offset  size  field
+         0     4  magic b'BLMK'
+         4     2  format version (1)
+         6     2  alphabet size N (28: `^`, a-z, `$`)
+         8     2  number of baselines B (25, word lengths 0..24)
+        10     2  table encoding: 0 = uint16 quantized, 1 = float32
+        12     4  float32 log_min: log-probability of quantized value 0
+        16     4  float32 log_step: log-probability per quantization step
+                  (both 0 for the float32 encoding)
+        20     4  uint32 offset of the baselines
+        24     4  uint32 offset of the table
+        28     4  uint32 total file size
+        32   4*B  float32 log baselines, `B * log(avg-transition-prob)`
+         .  N^3   table, entry `(a * N + b) * N + c` for P(c | a b):
+                   uint16: round((log P - log_min) / log_step), or 65535
+                           for a transition the model does not contain
+                   float32: log P, or -Infinity
+
+A word is "sufficiently probable" when the sum of its trigram
+log-probabilities (dequantized as `log_min + q * log_step`) exceeds the
+baseline for its length, which is the app's
+`(> (probability model word) (baselines n))` in log space. Quantization
+moves a word's log-probability by at most `length * log_step / 2` (about
+1e-3), so the 16-bit encoding can flip the decision for the rare word that
+close to its baseline; `verify` counts them.
+"""
+
+import struct
+
+import numpy as np
+
+from blabrecs.markov import MAX_BASELINE_LENGTH, N, MarkovModel
+
+MAGIC = b'BLMK'
+FORMAT_VERSION = 1
+ENCODINGS = ('uint16', 'float32')
+ABSENT = 0xFFFF
+_HEADER = struct.Struct('<4sHHHHffIII')
+_LEVELS = ABSENT - 1
+
+
+def encode_model(model, encoding='float32'):
+    """Serialize a `MarkovModel` to the binary format.
+
+    # Arguments
+        encoding: 'float32' or 'uint16' (quantized), see `ENCODINGS`.
+
+    # Returns
+        The file contents as bytes.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"unknown encoding {encoding!r}, expected one of {ENCODINGS}")
+    present = model.present.ravel()
+    if encoding == 'float32':
+        log_min = log_step = np.float32(0.0)
+        table = np.where(present, model.log_probs.ravel(), -np.inf).astype('<f4')
+    else:
+        log_probs = model.log_probs[model.present]
+        log_min = np.float32(log_probs.min() if len(log_probs) else 0.0)
+        log_step = np.float32((0.0 - log_min) / _LEVELS) or np.float32(1.0)
+        table = np.full(N ** 3, ABSENT, dtype='<u2')
+        q = np.rint((model.log_probs.ravel()[present] - np.float64(log_min)) / np.float64(log_step))
+        table[present] = np.clip(q, 0, _LEVELS)
+    baselines = np.asarray(model.baselines[:MAX_BASELINE_LENGTH + 1], dtype='<f4')
+    baselines_offset = _HEADER.size
+    table_offset = baselines_offset + baselines.nbytes
+    size = table_offset + table.nbytes
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, N, len(baselines), ENCODINGS.index(encoding), log_min, log_step,
+                          baselines_offset, table_offset, size)
+    return header + baselines.tobytes() + table.tobytes()
+
+
+def read_header(data):
+    """The header fields of a binary model as a dict."""
+    magic, version, n, num_baselines, encoding, log_min, log_step, baselines_offset, table_offset, size = \
+        _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"not a binary Markov model (magic {magic!r})")
+    if version != FORMAT_VERSION or n != N or encoding >= len(ENCODINGS):
+        raise ValueError(f"unsupported binary Markov model (version {version}, alphabet {n}, encoding {encoding})")
+    if size != len(data):
+        raise ValueError(f"truncated binary Markov model ({len(data)} of {size} bytes)")
+    return {'version': version, 'alphabet': n, 'baselines': num_baselines, 'encoding': ENCODINGS[encoding],
+            'log_min': log_min, 'log_step': log_step,
+            'baselines_offset': baselines_offset, 'table_offset': table_offset, 'size': size}
+
+
+def decode_model(data):
+    """Load a binary model as a `MarkovModel` (with the stored baselines).
+
+    The log-probabilities are dequantized exactly the way the front-end
+    does it, in float64 from the float32 header values.
+    """
+    header = read_header(data)
+    baselines = np.frombuffer(data, dtype='<f4', count=header['baselines'], offset=header['baselines_offset'])
+    if header['encoding'] == 'float32':
+        log_probs = np.frombuffer(data, dtype='<f4', count=N ** 3, offset=header['table_offset']).astype(np.float64)
+        present = np.isfinite(log_probs)
+    else:
+        table = np.frombuffer(data, dtype='<u2', count=N ** 3, offset=header['table_offset'])
+        present = table != ABSENT
+        log_probs = np.float64(header['log_min']) + table * np.float64(header['log_step'])
+    present = present.reshape(N, N, N)
+    log_probs = log_probs.reshape(N, N, N)
+    with np.errstate(over='ignore'):
+        probs = np.where(present, np.exp(log_probs), 0.0)
+    return MarkovModel(probs, present, baselines=baselines.astype(np.float64))
+
+
+def export_model(edn_path='model.edn', out_path='model.bin', encoding='float32'):
+    """Write the binary form of a model.edn file; returns the bytes written."""
+    data = encode_model(MarkovModel.load(edn_path), encoding)
+    with open(out_path, 'wb') as f:
+        f.write(data)
+    return data
+
+
+def load_model(path='model.bin'):
+    with open(path, 'rb') as f:
+        return decode_model(f.read())
+
+
+def verify(edn_path='model.edn', bin_path='model.bin', words=None):
+    """Check a binary export against the model.edn it came from.
+
+    # Arguments
+        words: optional list of strings (or a packed matrix); the
+            `sufficiently_probable` decisions of both models are compared.
+
+    # Returns
+        A report dict; `report['ok']` is True when both the model.edn and
+        the decoded binary encode to exactly the bytes on disk, the binary
+        contains exactly the same transitions, every log-probability is
+        within half a quantization step (float32 rounding for the float32
+        encoding) and the baselines match to float32 precision.
+        `report['decisions_differing']` counts the `words` whose decision
+        changed (see the module docstring).
+    """
+    with open(bin_path, 'rb') as f:
+        data = f.read()
+    header = read_header(data)
+    original = MarkovModel.load(edn_path)
+    decoded = decode_model(data)
+    encoding = header['encoding']
+    same_bytes = encode_model(decoded, encoding) == data and encode_model(original, encoding) == data
+    same_transitions = bool((original.present == decoded.present).all())
+    present = original.present & decoded.present
+    log_error = float(np.abs(original.log_probs[present] - decoded.log_probs[present]).max()) if present.any() else 0.0
+    baseline_error = float(np.abs(original.baselines - decoded.baselines).max())
+    report = {'bytes': len(data),
+              'edn_bytes': len(open(edn_path, 'rb').read()),
+              'transitions': int(original.present.sum()),
+              'round_trip_identical': same_bytes,
+              'same_transitions': same_transitions,
+              'max_log_prob_error': log_error,
+              'encoding': encoding,
+              'log_step': header['log_step'],
+              'max_baseline_error': baseline_error}
+    if encoding == 'float32':
+        log_tolerance = float(np.abs(original.log_probs[present]).max(initial=0.0)) * 2.0 ** -24
+    else:
+        log_tolerance = header['log_step'] / 2 * (1 + 1e-6)
+    report['ok'] = bool(same_bytes and same_transitions and log_error <= log_tolerance
+                        and baseline_error <= np.abs(original.baselines).max() * 2.0 ** -23)
+    if words is not None:
+        disagree = original.sufficiently_probable(words) != decoded.sufficiently_probable(words)
+        report['words_checked'] = len(disagree)
+        report['decisions_differing'] = int(disagree.sum())
+    return report
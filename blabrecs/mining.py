@@ -0,0 +1,121 @@
+"""
+Hard-negative mining.
+
+Most generated fake words are rejected by the model within a few epochs, and
+after that they contribute almost nothing to the loss. Every few epochs,
+`mining_callback` scores a large pool of fresh candidates with the current
+model and keeps the non-dictionary words it scores above a threshold. A
+`HardNegativePool` then mixes those words into the streamed batches (see
+`blabrecs.pipeline.negative_batches`) alongside ordinary negatives, so
+training steps go to the strings the model still gets wrong.
+
+    pool = HardNegativePool(GeneratedNegatives(dictionary=dictionary), fraction=0.3)
+    dataset, steps = make_dataset(positives, vectorize, negatives=pool, ...)
+    model.fit(dataset, callbacks=[mining_callback(pool, vectorizer, dictionary=dictionary)], ...)
+"""
+
+import threading
+
+import numpy as np
+
+from blabrecs.evaluate import predict_all
+from blabrecs.packed import MAX_WORD_LENGTH, unique_packed
+from blabrecs.trace import NullTracer
+
+
+def mine_hard_negatives(predict, vectorizer, candidates, threshold=0.5, dictionary=None, batch_size=8192):
+    """The distinct non-dictionary `candidates` that `predict` scores above `threshold`.
+
+    # Arguments
+        predict: callable mapping a token batch to probabilities.
+        vectorizer: `CharVectorizer` matching the model.
+        candidates: packed `(n, 24)` uint8 word matrix.
+        dictionary: optional `DictionaryIndex`; real words are never kept.
+
+    # Returns
+        A `(words, scores)` tuple: a packed word matrix and float32 scores.
+    """
+    candidates = unique_packed(candidates)
+    if dictionary is not None:
+        candidates = candidates[~dictionary.contains(candidates)]
+    scores = predict_all(predict, vectorizer.transform_packed(candidates), batch_size)
+    hard = scores > threshold
+    return candidates[hard], scores[hard]
+
+
+class HardNegativePool:
+    """A negative source mixing mined hard negatives into a base source.
+
+    Each `sample` call takes a `fraction` of its words from the mined pool
+    (with replacement) and the rest from `base`; until something has been
+    mined, everything comes from `base`. `update` swaps in a new pool, so it
+    can run from a Keras callback while the input pipeline is sampling.
+
+    # Arguments
+        base: negative source with a `sample(rng, count)` method, e.g.
+            `blabrecs.pipeline.GeneratedNegatives` or `NegativeShards`.
+        fraction: float, share of every negative batch drawn from the pool.
+        capacity: int, most hard negatives kept; the newest are kept.
+    """
+
+    def __init__(self, base, fraction=0.25, capacity=1 << 20):
+        self.base = base
+        self.fraction = fraction
+        self.capacity = capacity
+        self.words = np.zeros((0, MAX_WORD_LENGTH), dtype=np.uint8)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.words)
+
+    def update(self, words):
+        """Add newly mined words, dropping the oldest beyond `capacity`."""
+        with self._lock:
+            self.words = np.concatenate([self.words, np.asarray(words, dtype=np.uint8)])[-self.capacity:]
+
+    def sample(self, rng, count):
+        rng = np.random.default_rng(rng)
+        words = self.words
+        hard = int(round(count * self.fraction)) if len(words) else 0
+        parts = [words[rng.integers(0, len(words), hard)]] if hard else []
+        parts.append(self.base.sample(rng, count - hard))
+        return np.concatenate(parts)
+
+
+def mining_callback(pool, vectorizer, source=None, every=5, candidates=200000, threshold=0.5,
+                    dictionary=None, seed=0, batch_size=8192, tracer=None):
+    """A Keras callback that refills `pool` with hard negatives every `every` epochs.
+
+    # Arguments
+        pool: the `HardNegativePool` feeding the training batches.
+        vectorizer: `CharVectorizer` matching the model.
+        source: negative source the candidates are drawn from; defaults to
+            `pool.base`.
+        every: int, mine after every `every` epochs.
+        candidates: int, words scored per mining round.
+        threshold: float, minimum score for a candidate to count as hard.
+        dictionary: optional `DictionaryIndex`; real words are never mined.
+        seed: int, seed for the candidate stream.
+        tracer: optional `blabrecs.trace.Tracer`; one 'mine' stage per round.
+    """
+    import tensorflow as tf
+
+    source = source if source is not None else pool.base
+    tracer = tracer or NullTracer()
+    rng = np.random.default_rng([seed, 0x6d696e65])
+
+    class MiningCallback(tf.keras.callbacks.Callback):
+        def on_epoch_end(self, epoch, logs=None):
+            if (epoch + 1) % every:
+                return
+            with tracer.stage("mine", items=candidates, epoch=epoch, threshold=threshold) as stage:
+                words, scores = mine_hard_negatives(lambda x: self.model.predict(x, verbose=0),
+                                                    vectorizer, source.sample(rng, candidates),
+                                                    threshold, dictionary, batch_size)
+                pool.update(words)
+                stage['mined'] = len(words)
+                stage['hard_rate'] = len(words) / candidates
+                stage['mean_score'] = float(scores.mean()) if len(scores) else None
+                stage['pool'] = len(pool)
+
+    return MiningCallback()
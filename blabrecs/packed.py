@@ -0,0 +1,49 @@
+"""
+Packed word arrays.
+
+Words are stored as a `(n, MAX_WORD_LENGTH)` uint8 matrix of ASCII bytes,
+zero-padded on the right. This is the same width the CNN tokenizer pads to,
+and a row can be viewed as a fixed-width `S24` byte string for free.
+"""
+
+import numpy as np
+
+MAX_WORD_LENGTH = 24
+
+
+def pack_words(words, width=MAX_WORD_LENGTH):
+    """Pack a list of (ASCII) strings into a zero-padded uint8 matrix.
+
+    Words longer than `width` are truncated.
+    """
+    if len(words) == 0:
+        return np.zeros((0, width), dtype=np.uint8)
+    encoded = np.array([w.encode('ascii', 'replace') for w in words], dtype=f'S{width}')
+    return encoded.view(np.uint8).reshape(len(words), width)
+
+
+def as_packed(words, width=MAX_WORD_LENGTH):
+    """Return `words` as a packed matrix, packing it first if it is a list."""
+    if isinstance(words, np.ndarray):
+        return words
+    return pack_words(words, width)
+
+
+def unpack_words(packed):
+    """Convert a packed uint8 matrix back into a list of strings."""
+    packed = np.ascontiguousarray(packed, dtype=np.uint8)
+    width = packed.shape[1]
+    return [w.decode('ascii') for w in packed.view(f'S{width}').ravel().tolist()]
+
+
+def unique_packed(packed):
+    """Sorted unique rows of a packed word matrix."""
+    packed = np.ascontiguousarray(packed, dtype=np.uint8)
+    width = packed.shape[1]
+    # Raw void views sort with memcmp, which is much faster than comparing S24 strings.
+    return np.unique(packed.view(f'V{width}').ravel()).view(np.uint8).reshape(-1, width)
+
+
+def word_lengths(packed):
+    """Return the length of every word in a packed matrix."""
+    return np.count_nonzero(packed, axis=1)
@@ -0,0 +1,135 @@
+"""
+Streaming training input with on-the-fly negative sampling.
+
+Instead of materializing `fake_words_multiplier` times as many negatives as
+positives, every batch is built from a slice of the (already tokenized)
+positive words plus freshly generated fake words. Each epoch and each shard
+gets its own seed, so the model sees new negatives every epoch while memory
+stays proportional to the positives alone. Negatives can also come from any
+other source with a `sample(rng, count)` method: a prebuilt
+`blabrecs.shards.NegativeShards` set, or a `blabrecs.mining.HardNegativePool`
+that mixes in words the model currently gets wrong.
+"""
+
+import itertools
+import math
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH
+from blabrecs.wordgen import generate_words
+
+
+def split_batch(batch_size, negative_multiplier):
+    """Return how many (positives, negatives) go into one batch."""
+    positives = max(1, int(round(batch_size / (1 + negative_multiplier))))
+    return positives, batch_size - positives
+
+
+def steps_per_epoch(num_positives, batch_size, negative_multiplier, num_shards=1):
+    """Number of batches one epoch of `negative_batches` yields over all shards."""
+    per_batch, _ = split_batch(batch_size, negative_multiplier)
+    shard_sizes = [len(s) for s in np.array_split(np.arange(num_positives), num_shards)]
+    return sum(math.ceil(n / per_batch) for n in shard_sizes)
+
+
+def sample_negatives(rng, count, random_dist, letter_dist, dictionary=None):
+    """Generate exactly `count` packed fake words, skipping dictionary words."""
+    negatives = generate_words(count, random_dist=random_dist, letter_dist=letter_dist, seed=rng)
+    if dictionary is None:
+        return negatives
+    negatives = negatives[~dictionary.contains(negatives)]
+    while len(negatives) < count:
+        extra = generate_words(count - len(negatives), random_dist=random_dist, letter_dist=letter_dist, seed=rng)
+        negatives = np.concatenate([negatives, extra[~dictionary.contains(extra)]])
+    return negatives
+
+
+class GeneratedNegatives:
+    """`sample_negatives` as a negative source for `negative_batches`."""
+
+    def __init__(self, random_dist='english_table', letter_dist='english', dictionary=None):
+        self.random_dist = random_dist
+        self.letter_dist = letter_dist
+        self.dictionary = dictionary
+
+    def sample(self, rng, count):
+        return sample_negatives(rng, count, self.random_dist, self.letter_dist, self.dictionary)
+
+
+def negative_batches(positives, vectorize, batch_size=512, negative_multiplier=6,
+                     random_dist='english_table', letter_dist='english',
+                     dictionary=None, seed=0, epoch=0, shard=0, num_shards=1, negatives=None):
+    """Yield the `(x, y)` batches of one epoch for one shard.
+
+    # Arguments
+        positives: `(n, 24)` array of tokenized real words.
+        vectorize: callable turning a packed `(m, 24)` uint8 word matrix
+            into a tokenized `(m, 24)` array, the same way `positives` was.
+        batch_size: int, total examples per batch.
+        negative_multiplier: number of negatives per positive.
+        random_dist, letter_dist: fake word distributions, as for
+            `generate_words`.
+        dictionary: optional `DictionaryIndex`; generated words found in it
+            are replaced so no real word is labelled as fake.
+        seed, epoch, shard: together they select the random stream, so the
+            same arguments always give the same batches.
+        num_shards: int, positives are split into this many disjoint parts.
+        negatives: optional negative source with a `sample(rng, count)`
+            method returning packed, dictionary-free words (such as
+            `NegativeShards`); used instead of generating them.
+    """
+    rng = np.random.default_rng([seed, epoch, shard])
+    rows = np.array_split(np.arange(len(positives)), num_shards)[shard]
+    rows = rows[rng.permutation(len(rows))]
+    pos_per_batch, _ = split_batch(batch_size, negative_multiplier)
+    for start in range(0, len(rows), pos_per_batch):
+        pos = positives[rows[start:start + pos_per_batch]]
+        neg_count = int(round(len(pos) * negative_multiplier))
+        if negatives is not None:
+            neg = vectorize(negatives.sample(rng, neg_count))
+        else:
+            neg = vectorize(sample_negatives(rng, neg_count, random_dist, letter_dist, dictionary))
+        x = np.concatenate([pos, neg]).astype(np.int32)
+        y = np.concatenate([np.ones(len(pos), dtype=np.float32), np.zeros(len(neg), dtype=np.float32)])
+        order = rng.permutation(len(x))
+        yield x[order], y[order]
+
+
+def make_dataset(positives, vectorize, batch_size=512, negative_multiplier=6,
+                 random_dist='english_table', letter_dist='english',
+                 dictionary=None, seed=0, num_shards=4, prefetch=None, negatives=None):
+    """Build a `tf.data.Dataset` that streams `negative_batches`.
+
+    The positives are split into `num_shards` generators that are
+    interleaved in parallel. The dataset repeats indefinitely: every pass
+    re-runs the generators, which advances each shard to a new epoch seed.
+    One pass is exactly `steps` batches, so `model.fit(dataset,
+    steps_per_epoch=steps)` sees fresh negatives every epoch.
+
+    # Returns
+        A `(dataset, steps)` tuple, where `steps` is the number of batches
+        in one epoch.
+    """
+    import tensorflow as tf
+
+    epoch_counters = [itertools.count() for _ in range(num_shards)]
+
+    def shard_batches(shard):
+        shard = int(shard)
+        return negative_batches(positives, vectorize, batch_size, negative_multiplier,
+                                random_dist, letter_dist, dictionary, seed,
+                                next(epoch_counters[shard]), shard, num_shards, negatives)
+
+    signature = (tf.TensorSpec(shape=(None, MAX_WORD_LENGTH), dtype=tf.int32),
+                 tf.TensorSpec(shape=(None,), dtype=tf.float32))
+    dataset = tf.data.Dataset.range(num_shards).interleave(
+        lambda shard: tf.data.Dataset.from_generator(shard_batches, output_signature=signature, args=(shard,)),
+        cycle_length=num_shards,
+        num_parallel_calls=num_shards,
+        deterministic=True)
+    # Without the repeat, Keras runs out of data after the first epoch: it
+    # cannot tell the length of a generator dataset, so with steps_per_epoch
+    # it never restarts the iterator.
+    dataset = dataset.repeat().prefetch(tf.data.AUTOTUNE if prefetch is None else prefetch)
+    return dataset, steps_per_epoch(len(positives), batch_size, negative_multiplier, num_shards)
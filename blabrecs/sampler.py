@@ -0,0 +1,95 @@
+"""
+Batched rejection sampling of plausible fake words.
+
+Generates candidates in batches whose size adapts to the observed
+acceptance rate, drops dictionary words with a `DictionaryIndex`, scores
+the rest in a single forward pass per batch and streams out accepted words
+until exactly `k` have been found. A run that keeps finding nothing new
+raises instead of looping forever.
+"""
+
+import numpy as np
+
+from blabrecs.calibrate import cutoffs_for
+from blabrecs.packed import unpack_words
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+
+def next_batch_size(remaining, generated, accepted, min_batch, max_batch):
+    """Enough candidates to find `remaining` more words at the rate seen so far.
+
+    Uses a smoothed acceptance estimate and 25% headroom, clipped to
+    `[min_batch, max_batch]`.
+    """
+    rate = (accepted + 1) / (generated + 2)
+    return int(np.clip(np.ceil(1.25 * remaining / rate), min_batch, max_batch))
+
+
+def sample_plausible_words(k, cutoff=0.9, predict=None, vectorizer=None, dictionary=None,
+                           random_dist='english_table', letter_dist='english', seed=None,
+                           min_batch=1024, max_batch=1 << 18, max_candidates=None, prefilter=None,
+                           max_idle_batches=20):
+    """Yield `k` distinct non-dictionary words the model scores above `cutoff`.
+
+    # Arguments
+        k: int, number of words to produce.
+        cutoff: float, minimum model probability, or per-length cutoffs
+            (see `blabrecs.calibrate.load_cutoffs`).
+        predict: callable mapping a token batch to probabilities (e.g. a
+            Keras `model.predict`); defaults to the shipped model.json via
+            `blabrecs.inference.NumpyModel`.
+        vectorizer: `CharVectorizer` matching the model.
+        dictionary: optional `DictionaryIndex`; its words are never yielded.
+        random_dist, letter_dist: candidate distributions, as for
+            `generate_words`.
+        seed: seed for the candidate stream.
+        min_batch, max_batch: bounds on the candidates generated per batch.
+        max_candidates: int, give up (and stop early) after generating this
+            many candidates; None means keep going until `k` are found.
+        prefilter: optional cheap check run before the model, mapping a
+            packed word matrix to a bool mask of candidates worth scoring
+            (e.g. `MarkovModel.sufficiently_probable`).
+        max_idle_batches: int, raise after this many batches in a row
+            without a new word (batches grow to `max_batch` while nothing is
+            accepted); None means never.
+
+    # Yields
+        `(word, score)` tuples, in the order they were found.
+
+    # Raises
+        ValueError: if `max_idle_batches` batches in a row found no new word.
+    """
+    if predict is None:
+        from blabrecs.inference import NumpyModel
+        predict = NumpyModel.load().predict
+    vectorizer = vectorizer or CharVectorizer()
+    rng = np.random.default_rng(seed)
+    seen = set()
+    generated = accepted = idle = 0
+    while len(seen) < k and (max_candidates is None or generated < max_candidates):
+        size = next_batch_size(k - len(seen), generated, accepted, min_batch, max_batch)
+        if max_candidates is not None:
+            size = min(size, max_candidates - generated)
+        candidates = generate_words(size, random_dist=random_dist, letter_dist=letter_dist, seed=rng)
+        generated += size
+        if dictionary is not None:
+            candidates = candidates[~dictionary.contains(candidates)]
+        if prefilter is not None:
+            candidates = candidates[prefilter(candidates)]
+        found = len(seen)
+        if len(candidates):
+            scores = np.asarray(predict(vectorizer.transform_packed(candidates))).reshape(-1)
+            hits = np.flatnonzero(scores > cutoffs_for(cutoff, candidates, scores.dtype))
+            accepted += len(hits)
+            for word, score in zip(unpack_words(candidates[hits]), scores[hits].tolist()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                yield word, score
+                if len(seen) == k:
+                    return
+        idle = idle + 1 if len(seen) == found else 0
+        if max_idle_batches is not None and idle >= max_idle_batches:
+            raise ValueError(f"found {len(seen)} of {k} words, then nothing new in {idle} batches "
+                             f"({generated} candidates); is the cutoff reachable?")
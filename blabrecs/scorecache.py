@@ -0,0 +1,183 @@
+"""
+Persistent cache of CNN scores.
+
+Scores are keyed by `(model digest, word)`, where the digest is a SHA-256
+of the model's weights and its tokenizer table, so retraining a model (or
+changing its tokenizer) never serves stale scores. Lookups go through an
+in-memory LRU tier first and an SQLite file second; only the words found in
+neither are tokenized and sent to the model, and their scores are written
+back to both tiers.
+
+    cache = ScoreCache('scores.sqlite')
+    scorer = CachedScorer.for_model(NumpyModel.load(), CharVectorizer(), cache)
+    scores = scorer.score_packed(pack_words(wordlist))
+"""
+
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+
+from blabrecs.evaluate import predict_all
+from blabrecs.packed import as_packed
+from blabrecs.vectorize import CharVectorizer
+
+# SQLite's default limit on host parameters per statement is 999.
+_SQL_CHUNK = 900
+
+
+def model_weights(model):
+    """A `{name: array}` dict of a `NumpyModel`'s or a Keras model's weights."""
+    if isinstance(getattr(model, 'weights', None), dict):
+        return model.weights
+    return {w.name: w.numpy() for w in model.weights}
+
+
+def model_digest(weights, vectorizer=None):
+    """SHA-256 hex digest of a weight dict (names, shapes, dtypes and values)
+    and, if given, the vectorizer's token table."""
+    h = hashlib.sha256()
+    for name in sorted(weights):
+        w = np.ascontiguousarray(weights[name])
+        h.update(f'{name}:{w.dtype.str}:{w.shape}'.encode())
+        h.update(w.tobytes())
+    if vectorizer is not None:
+        h.update(b'tokenizer:' + np.ascontiguousarray(vectorizer.table).tobytes())
+    return h.hexdigest()
+
+
+class ScoreCache:
+    """Two-tier `(digest, word) -> score` store.
+
+    # Arguments
+        path: str, SQLite file for the persistent tier; None keeps only the
+            in-memory tier.
+        capacity: int, number of entries the LRU tier holds.
+    """
+
+    def __init__(self, path=None, capacity=1 << 20):
+        self.capacity = capacity
+        self._lru = OrderedDict()
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path)
+            self.db.execute('CREATE TABLE IF NOT EXISTS scores '
+                            '(digest TEXT NOT NULL, word BLOB NOT NULL, score REAL NOT NULL, '
+                            'PRIMARY KEY (digest, word)) WITHOUT ROWID')
+            self.db.commit()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'lookups': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def report(self):
+        """The hit/miss counters plus the overall hit rate."""
+        s = self.stats
+        hits = s['memory_hits'] + s['disk_hits']
+        return dict(s, hit_rate=hits / s['lookups'] if s['lookups'] else 0.0, memory_entries=len(self._lru))
+
+    def _remember(self, digest, keys, scores):
+        lru = self._lru
+        for key, score in zip(keys, scores):
+            lru[digest, key] = score
+            lru.move_to_end((digest, key))
+        while len(lru) > self.capacity:
+            lru.popitem(last=False)
+
+    def lookup(self, digest, keys):
+        """Cached scores for `keys` (a list of word bytes), NaN where missing."""
+        scores = np.full(len(keys), np.nan, dtype=np.float32)
+        lru = self._lru
+        missing = []
+        for i, key in enumerate(keys):
+            score = lru.get((digest, key))
+            if score is None:
+                missing.append(i)
+            else:
+                lru.move_to_end((digest, key))
+                scores[i] = score
+        self.stats['lookups'] += len(keys)
+        self.stats['memory_hits'] += len(keys) - len(missing)
+        if self.db is not None and missing:
+            wanted = {}
+            for i in missing:
+                wanted.setdefault(keys[i], []).append(i)
+            unique = list(wanted)
+            found_keys, found_scores = [], []
+            for start in range(0, len(unique), _SQL_CHUNK):
+                chunk = unique[start:start + _SQL_CHUNK]
+                rows = self.db.execute(f'SELECT word, score FROM scores WHERE digest = ? AND word IN '
+                                       f'({",".join("?" * len(chunk))})', [digest, *chunk]).fetchall()
+                for key, score in rows:
+                    for i in wanted[key]:
+                        scores[i] = score
+                    found_keys.append(key)
+                    found_scores.append(score)
+            self._remember(digest, found_keys, found_scores)
+            self.stats['disk_hits'] += sum(len(wanted[k]) for k in found_keys)
+        self.stats['misses'] += int(np.isnan(scores).sum())
+        return scores
+
+    def store(self, digest, keys, scores):
+        """Add freshly computed scores to both tiers."""
+        scores = [float(s) for s in scores]
+        self._remember(digest, keys, scores)
+        if self.db is not None:
+            self.db.executemany('INSERT OR REPLACE INTO scores VALUES (?, ?, ?)',
+                                ((digest, key, score) for key, score in zip(keys, scores)))
+            self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+
+class CachedScorer:
+    """Score words through a `ScoreCache`, running the model on misses only.
+
+    # Arguments
+        predict: callable mapping a token batch to probabilities.
+        vectorizer: `CharVectorizer` matching the model.
+        cache: a `ScoreCache`.
+        digest: str, identifies the model; see `model_digest`.
+        batch_size: int, words per `predict` call.
+    """
+
+    def __init__(self, predict, vectorizer, cache, digest, batch_size=8192):
+        self.predict = predict
+        self.vectorizer = vectorizer or CharVectorizer()
+        self.cache = cache
+        self.digest = digest
+        self.batch_size = batch_size
+
+    @classmethod
+    def for_model(cls, model, vectorizer=None, cache=None, batch_size=8192):
+        """Wrap a `NumpyModel` or Keras model, digesting its weights and tokenizer."""
+        vectorizer = vectorizer or CharVectorizer()
+        return cls(model.predict, vectorizer, cache or ScoreCache(),
+                   model_digest(model_weights(model), vectorizer), batch_size)
+
+    def score_packed(self, packed):
+        """Scores for every row of a packed `(n, 24)` word matrix."""
+        packed = np.ascontiguousarray(packed, dtype=np.uint8)
+        # As Python bytes, `S24` rows lose their zero padding.
+        keys = packed.view(f'S{packed.shape[1]}').ravel().tolist()
+        scores = self.cache.lookup(self.digest, keys)
+        misses = np.flatnonzero(np.isnan(scores))
+        if len(misses):
+            # Score each distinct missing word once.
+            first = {}
+            for i in misses:
+                first.setdefault(keys[i], i)
+            rows = np.fromiter(first.values(), dtype=np.intp, count=len(first))
+            fresh = predict_all(self.predict, self.vectorizer.transform_packed(packed[rows]), self.batch_size)
+            self.cache.store(self.digest, list(first), fresh)
+            lookup = dict(zip(first, fresh.tolist()))
+            scores[misses] = [lookup[keys[i]] for i in misses]
+        return scores
+
+    def score_words(self, words):
+        """Scores for a list of strings (or a packed matrix)."""
+        return self.score_packed(as_packed(words))
@@ -0,0 +1,303 @@
+"""
+Asyncio micro-batching word checker.
+
+Concurrent "is this a plausible word?" requests are queued and scored
+together: the batcher waits at most `max_delay` seconds after the first
+queued word (or until `max_batch` words are waiting), scores the whole
+batch in one call on a worker thread and resolves every caller's future.
+The checks and messages are those of `test-word` in the app.
+
+The server speaks a line protocol over TCP: send one word per line and get
+one JSON object per line back, in request order. The line `STATS` returns
+latency percentiles and the batch-size histogram instead.
+
+    python -m blabrecs.server --mode neural --port 8765 --max-delay-ms 2 --max-batch 256
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import re
+import time
+
+import numpy as np
+
+from blabrecs.calibrate import cutoffs_for
+from blabrecs.cascade import APP_CNN_THRESHOLD
+from blabrecs.vectorize import CharVectorizer
+
+MODES = ('markov', 'neural')
+MAX_PLAYABLE_LENGTH = 15
+_NOT_LETTERS = re.compile('[^a-z]')
+
+
+def _result(status, msg, score=None):
+    return {'status': status, 'msg': msg, 'score': score}
+
+
+class LatencyStats:
+    """Request latencies and batch sizes, keeping the most recent `window` requests."""
+
+    def __init__(self, window=100_000):
+        self.latencies = collections.deque(maxlen=window)
+        self.batch_sizes = collections.Counter()
+        self.requests = 0
+
+    def add_batch(self, size):
+        self.batch_sizes[size] += 1
+
+    def add_latency(self, seconds):
+        self.latencies.append(seconds)
+        self.requests += 1
+
+    def report(self):
+        """p50/p90/p99/max latency in milliseconds and a power-of-two batch histogram."""
+        latencies = np.fromiter(self.latencies, dtype=np.float64, count=len(self.latencies)) * 1000
+        percentiles = {f'p{q}_ms': float(np.percentile(latencies, q)) if len(latencies) else None
+                       for q in (50, 90, 99)}
+        histogram = collections.Counter()
+        for size, count in self.batch_sizes.items():
+            histogram[1 << (size - 1).bit_length()] += count
+        batches = sum(self.batch_sizes.values())
+        return {'requests': self.requests,
+                'batches': batches,
+                'mean_batch_size': sum(s * c for s, c in self.batch_sizes.items()) / batches if batches else 0.0,
+                **percentiles,
+                'max_ms': float(latencies.max()) if len(latencies) else None,
+                # Bucket `b` counts the batches of size b/2+1 .. b.
+                'batch_size_histogram': {str(b): histogram[b] for b in sorted(histogram)}}
+
+
+class MicroBatcher:
+    """Collect concurrent `score(word)` calls into batches for `score_batch`.
+
+    # Arguments
+        score_batch: callable taking a list of words and returning one score
+            per word; runs on a worker thread so the event loop keeps
+            accepting requests meanwhile.
+        max_batch: int, largest batch to score at once.
+        max_delay: float, seconds to wait for more words after the first one.
+        stats: optional `LatencyStats` to record into.
+    """
+
+    def __init__(self, score_batch, max_batch=256, max_delay=0.002, stats=None):
+        self.score_batch = score_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.stats = stats or LatencyStats()
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def score(self, word):
+        """Score one word as part of the next batch."""
+        if self._task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        await self._queue.put((word, future))
+        try:
+            return await future
+        finally:
+            self.stats.add_latency(time.perf_counter() - started)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch = [(w, f) for w, f in batch if not f.cancelled()]
+            if not batch:
+                continue
+            self.stats.add_batch(len(batch))
+            try:
+                scores = await loop.run_in_executor(None, self.score_batch, [w for w, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), score in zip(batch, scores):
+                if not future.done():
+                    future.set_result(float(score))
+
+
+class WordChecker:
+    """The app's `test-word`, with the model check micro-batched.
+
+    # Arguments
+        words: container of dictionary words (e.g. a set of enable.txt).
+        mode: 'markov' or 'neural', like the app's `:mode`.
+        markov: `blabrecs.markov.MarkovModel`, required in 'markov' mode.
+        predict: callable mapping a token batch to probabilities (e.g.
+            `NumpyModel.predict`), required in 'neural' mode.
+        vectorizer: `CharVectorizer` matching `predict`.
+        badwords: iterable of substrings that reject a word.
+        threshold: float, CNN probability a word must exceed, or per-length
+            cutoffs (see `blabrecs.calibrate.load_cutoffs`).
+        max_batch, max_delay: passed to `MicroBatcher`.
+    """
+
+    def __init__(self, words, mode='neural', markov=None, predict=None, vectorizer=None, badwords=(),
+                 threshold=APP_CNN_THRESHOLD, max_batch=256, max_delay=0.002):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}, expected one of {MODES}")
+        if mode == 'markov' and markov is None or mode == 'neural' and predict is None:
+            raise ValueError(f"{mode} mode needs a model")
+        self.words = words
+        self.mode = mode
+        self.markov = markov
+        self.predict = predict
+        self.vectorizer = vectorizer or CharVectorizer()
+        self.badwords = tuple(badwords)
+        self.threshold = threshold
+        self.batcher = MicroBatcher(self._score_batch, max_batch, max_delay)
+
+    def _score_batch(self, words):
+        if self.mode == 'markov':
+            # The margin over the length baseline: positive means probable.
+            log_probs, lengths = self.markov._log_probability(words)
+            return log_probs - self.markov.baselines[np.minimum(lengths, len(self.markov.baselines) - 1)]
+        return np.asarray(self.predict(self.vectorizer.transform(words))).reshape(-1)
+
+    def precheck(self, word):
+        """The checks that need no model; a result dict, or None if the model decides."""
+        if word == '':
+            return _result('empty', 'type in a word!')
+        if _NOT_LETTERS.search(word):
+            return _result('err', 'hey! letters only!')
+        if len(word) < 3:
+            return _result('err', "that's too short to be a word!")
+        if len(word) > MAX_PLAYABLE_LENGTH:
+            return _result('err', "that's too long, it won't fit on the board!")
+        if word in self.words:
+            return _result('err', "can't play that, it's in the dictionary!")
+        return None
+
+    async def check(self, word):
+        """`test-word` for one word: `{'status', 'msg', 'score'}`."""
+        word = word.lower().strip()
+        result = self.precheck(word)
+        if result is not None:
+            return result
+        score = await self.batcher.score(word)
+        if self.mode == 'markov':
+            probable = score > 0
+        else:
+            # The batcher hands back a Python float; the CNN scored in float32.
+            probable = np.float32(score) > cutoffs_for(self.threshold, len(word))
+        # Unseen trigrams give -inf in markov mode, which JSON cannot carry.
+        score = score if np.isfinite(score) else None
+        if not probable or any(bad in word for bad in self.badwords):
+            return _result('err', "no way that's a word!", score)
+        return _result('ok', 'looks good to me!', score)
+
+    def report(self):
+        return self.batcher.stats.report()
+
+
+async def _handle(checker, reader, writer):
+    # Lines are checked concurrently (so one client can fill a batch) but
+    # answered in the order they arrived.
+    pending = asyncio.Queue()
+
+    async def respond():
+        while True:
+            word, task = await pending.get()
+            if task is None:
+                break
+            # STATS is answered once everything before it has been.
+            reply = dict(await task, word=word) if word is not None else task()
+            writer.write((json.dumps(reply) + '\n').encode())
+            await writer.drain()
+
+    responder = asyncio.get_running_loop().create_task(respond())
+    try:
+        async for line in reader:
+            text = line.decode('utf-8', 'replace').strip()
+            if text == 'STATS':
+                await pending.put((None, checker.report))
+            else:
+                await pending.put((text, asyncio.ensure_future(checker.check(text))))
+    finally:
+        await pending.put((None, None))
+        await responder
+        writer.close()
+
+
+async def serve(checker, host='127.0.0.1', port=8765):
+    """Run the line-protocol server until cancelled."""
+    checker.batcher.start()
+    server = await asyncio.start_server(lambda r, w: _handle(checker, r, w), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m blabrecs.server', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=MODES, default='neural')
+    parser.add_argument('--model', default='model.json', help='TF.js model.json for neural mode')
+    parser.add_argument('--markov', default='model.edn', help='Markov model for markov mode')
+    parser.add_argument('--words', default='enable.txt', help='dictionary word list')
+    parser.add_argument('--badwords', help='JSON list of forbidden substrings')
+    parser.add_argument('--threshold', type=float, default=APP_CNN_THRESHOLD)
+    parser.add_argument('--thresholds', help='per-length cutoffs written by `python -m blabrecs calibrate`')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-delay-ms', type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    from blabrecs.dictionary import read_word_file
+    badwords = ()
+    if args.badwords:
+        with open(args.badwords) as f:
+            badwords = json.load(f)
+    markov = predict = None
+    if args.mode == 'markov':
+        from blabrecs.markov import MarkovModel
+        markov = MarkovModel.load(args.markov)
+    else:
+        from blabrecs.inference import NumpyModel
+        predict = NumpyModel.load(args.model).predict
+    threshold = args.threshold
+    if args.thresholds:
+        from blabrecs.calibrate import load_cutoffs
+        threshold = load_cutoffs(args.thresholds)
+    checker = WordChecker(set(read_word_file(args.words)), args.mode, markov, predict, badwords=badwords,
+                          threshold=threshold, max_batch=args.max_batch,
+                          max_delay=args.max_delay_ms / 1000)
+    try:
+        asyncio.run(serve(checker, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Out-of-core negative sets.
+
+`makeUpSomeWords` keeps every generated word in memory at once, so peak
+memory grows with `data_size * fake_words_multiplier`. `build_shards`
+produces a negative set of any size with bounded memory instead:
+
+1. Words are generated one chunk at a time. Dictionary words are dropped
+   inline by a `BloomDictionary`: a Bloom filter rejects most candidates
+   from a few bit lookups, and only its positives go to the exact
+   `DictionaryIndex` check.
+2. The survivors are hash-partitioned into bucket files on disk, so every
+   copy of a word lands in the same bucket.
+3. Each bucket is deduplicated and shuffled on its own, then written out as
+   fixed-size packed `.npy` shards, followed by a `manifest.json`.
+
+Peak memory is one chunk or one bucket, whichever is larger, independent of
+the total count.
+
+    build_shards('negatives/english', 500_000_000, dictionary=DictionaryIndex.cached())
+    negatives = NegativeShards('negatives/english')
+    batch = negatives.sample(rng, 4096)
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+from blabrecs.dictionary import _MIX_1, _MIX_2, hash_packed
+from blabrecs.packed import MAX_WORD_LENGTH, as_packed, unique_packed
+from blabrecs.trace import NullTracer
+from blabrecs.wordgen import generate_words
+
+FORMAT_VERSION = 1
+
+
+class BloomFilter:
+    """A Bloom filter over packed words.
+
+    The `num_hashes` bit positions of a word come from two 64-bit hashes by
+    double hashing (`h1 + i * h2`).
+
+    # Arguments
+        bits: uint8 array holding the filter, a power of two bytes long.
+        num_hashes: int, bits set per word.
+    """
+
+    def __init__(self, bits, num_hashes):
+        self.bits = bits
+        self.num_hashes = num_hashes
+        self._mask = np.uint64(len(bits) * 8 - 1)
+
+    @classmethod
+    def for_capacity(cls, n, error_rate=0.01):
+        """An empty filter sized for `n` words at the given false positive rate."""
+        n = max(n, 1)
+        num_bits = -n * math.log(error_rate) / math.log(2) ** 2
+        num_bytes = 1 << max(3, math.ceil(math.log2(num_bits / 8)))
+        num_hashes = max(1, round(num_bytes * 8 / n * math.log(2)))
+        return cls(np.zeros(num_bytes, dtype=np.uint8), num_hashes)
+
+    def _positions(self, packed):
+        h1 = hash_packed(packed)
+        h2 = h1 * _MIX_1
+        h2 ^= h2 >> np.uint64(29)
+        h2 *= _MIX_2
+        h2 |= np.uint64(1)
+        for i in range(self.num_hashes):
+            yield (h1 + np.uint64(i) * h2) & self._mask
+
+    def add(self, words):
+        """Add a list of strings or a packed `(n, 24)` matrix."""
+        for pos in self._positions(as_packed(words)):
+            np.bitwise_or.at(self.bits, pos >> np.uint64(3), np.left_shift(1, pos & np.uint64(7)).astype(np.uint8))
+
+    def might_contain(self, words):
+        """Bool array, False where a word is certainly not in the filter."""
+        packed = as_packed(words)
+        hit = np.ones(len(packed), dtype=bool)
+        for pos in self._positions(packed):
+            hit &= (self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return hit
+
+
+class BloomDictionary:
+    """A `DictionaryIndex` behind a Bloom filter.
+
+    `contains` gives exactly the same answers as the index; the filter only
+    spares the hash-table probes and row comparisons for words that are
+    clearly not in the dictionary, which is almost every generated word.
+    Anything that takes a `dictionary=` argument accepts one.
+
+    # Arguments
+        index: a `blabrecs.dictionary.DictionaryIndex`.
+        error_rate: float, target false positive rate of the filter.
+    """
+
+    def __init__(self, index, error_rate=0.01):
+        self.index = index
+        self.bloom = BloomFilter.for_capacity(len(index), error_rate)
+        self.bloom.add(np.ascontiguousarray(index.words).view(np.uint8).reshape(-1, MAX_WORD_LENGTH))
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {'queries': 0, 'bloom_positives': 0, 'found': 0}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, word):
+        return bool(self.contains([word])[0])
+
+    def contains(self, words):
+        """Batch membership test, as `DictionaryIndex.contains`."""
+        packed = as_packed(words)
+        found = self.bloom.might_contain(packed)
+        if not isinstance(words, np.ndarray):
+            # Words longer than MAX_WORD_LENGTH were cut by packing and are
+            # never in the dictionary.
+            found &= np.array([len(w) <= MAX_WORD_LENGTH for w in words], dtype=bool)
+        candidates = np.flatnonzero(found)
+        found[candidates] = self.index.contains(packed[candidates])
+        self.stats['queries'] += len(packed)
+        self.stats['bloom_positives'] += len(candidates)
+        self.stats['found'] += int(found.sum())
+        return found
+
+
+def _bucket_path(path, bucket):
+    return os.path.join(path, f'bucket_{bucket:05d}.bin')
+
+
+def build_shards(path, count, random_dist='english_table', letter_dist='english', seed=None,
+                 dictionary=None, shard_size=1 << 22, bucket_size=1 << 23, chunk_size=1 << 20,
+                 tracer=None):
+    """Generate `count` fake words into deduplicated shards under `path`.
+
+    # Arguments
+        path: str, output directory.
+        count: int, number of words to generate; dictionary words and
+            duplicates are removed, so the shards hold somewhat fewer.
+        random_dist, letter_dist: fake word distributions, as for
+            `generate_words`.
+        seed: int or `np.random.SeedSequence`; the shards only depend on
+            the seed and the sizes below.
+        dictionary: optional `DictionaryIndex` (or `BloomDictionary`) of
+            words to exclude; an index is wrapped in a `BloomDictionary`.
+        shard_size: int, words per output shard.
+        bucket_size: int, expected words per dedup bucket; bounds the
+            memory of the dedup pass.
+        chunk_size: int, words generated per step; bounds the memory of
+            the generation pass.
+        tracer: optional `blabrecs.trace.Tracer`.
+
+    # Returns
+        The manifest dict, also written to `path/manifest.json`.
+    """
+    tracer = tracer or NullTracer()
+    if dictionary is not None and not isinstance(dictionary, BloomDictionary):
+        dictionary = BloomDictionary(dictionary)
+    os.makedirs(path, exist_ok=True)
+    num_chunks = math.ceil(count / chunk_size)
+    num_buckets = max(1, math.ceil(count / bucket_size))
+    chunk_seeds = np.random.SeedSequence(seed).spawn(num_chunks + num_buckets)
+    stats = {'generated': 0, 'dictionary_rejected': 0, 'duplicates': 0}
+
+    # Pass 1: generate, filter and scatter into buckets by hash.
+    with tracer.stage("shards_generate", items=count, buckets=num_buckets) as stage:
+        files = [open(_bucket_path(path, b), 'wb') for b in range(num_buckets)]
+        try:
+            for i in range(num_chunks):
+                n = min(chunk_size, count - i * chunk_size)
+                words = generate_words(n, random_dist, letter_dist, chunk_seeds[i])
+                stats['generated'] += n
+                if dictionary is not None:
+                    words = words[~dictionary.contains(words)]
+                    stats['dictionary_rejected'] += n - len(words)
+                # High hash bits pick the bucket; the low ones are the Bloom filter's.
+                buckets = (hash_packed(words) >> np.uint64(40)) % np.uint64(num_buckets)
+                order = np.argsort(buckets, kind='stable')
+                bounds = np.searchsorted(buckets[order], np.arange(num_buckets + 1))
+                for b in range(num_buckets):
+                    if bounds[b] < bounds[b + 1]:
+                        words[order[bounds[b]:bounds[b + 1]]].tofile(files[b])
+        finally:
+            for f in files:
+                f.close()
+        if dictionary is not None:
+            stage['bloom'] = dict(dictionary.stats)
+
+    # Pass 2: dedupe and shuffle each bucket, then cut fixed-size shards.
+    shards = []
+    buffer = np.empty((shard_size, MAX_WORD_LENGTH), dtype=np.uint8)
+    filled = 0
+
+    def flush(rows):
+        name = f'shard_{len(shards):05d}.npy'
+        np.save(os.path.join(path, name), buffer[:rows])
+        shards.append({'file': name, 'count': int(rows)})
+
+    with tracer.stage("shards_dedupe", buckets=num_buckets) as stage:
+        for b in range(num_buckets):
+            bucket_file = _bucket_path(path, b)
+            words = np.fromfile(bucket_file, dtype=np.uint8).reshape(-1, MAX_WORD_LENGTH)
+            unique = unique_packed(words)
+            stats['duplicates'] += len(words) - len(unique)
+            del words
+            unique = unique[np.random.default_rng(chunk_seeds[num_chunks + b]).permutation(len(unique))]
+            start = 0
+            while start < len(unique):
+                take = min(shard_size - filled, len(unique) - start)
+                buffer[filled:filled + take] = unique[start:start + take]
+                filled += take
+                start += take
+                if filled == shard_size:
+                    flush(filled)
+                    filled = 0
+            os.remove(bucket_file)
+        if filled:
+            flush(filled)
+        stage['items'] = sum(s['count'] for s in shards)
+
+    manifest = {'format': FORMAT_VERSION,
+                'count': sum(s['count'] for s in shards),
+                'params': {'count': count, 'random_dist': random_dist, 'letter_dist': letter_dist,
+                           'seed': seed if seed is None or isinstance(seed, int) else str(seed),
+                           'dictionary_words': len(dictionary) if dictionary is not None else 0,
+                           'shard_size': shard_size, 'bucket_size': bucket_size, 'chunk_size': chunk_size},
+                'stats': stats,
+                'shards': shards}
+    # The manifest goes last: a directory without one is an interrupted build.
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+class NegativeShards:
+    """Read-only view of the shards written by `build_shards`.
+
+    Shards are memory-mapped on first use, so opening even a very large set
+    costs nothing up front.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        counts = [s['count'] for s in self.manifest['shards']]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._maps = {}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    @property
+    def num_shards(self):
+        return len(self.manifest['shards'])
+
+    def shard(self, i):
+        """The packed words of shard `i`, memory-mapped."""
+        if i not in self._maps:
+            self._maps[i] = np.load(os.path.join(self.path, self.manifest['shards'][i]['file']), mmap_mode='r')
+        return self._maps[i]
+
+    def __iter__(self):
+        for i in range(self.num_shards):
+            yield self.shard(i)
+
+    def take(self, rows):
+        """The packed words at global row numbers `rows`."""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((len(rows), MAX_WORD_LENGTH), dtype=np.uint8)
+        which = np.searchsorted(self.offsets, rows, side='right') - 1
+        for i in np.unique(which):
+            sel = np.flatnonzero(which == i)
+            local = rows[sel] - self.offsets[i]
+            # Sorted reads touch each page of the memory map once.
+            order = np.argsort(local)
+            out[sel[order]] = self.shard(int(i))[local[order]]
+        return out
+
+    def sample(self, rng, count):
+        """`count` words drawn uniformly (with replacement) from all shards."""
+        return self.take(np.random.default_rng(rng).integers(0, len(self), count))
@@ -0,0 +1,221 @@
+"""
+Hyperparameter sweeps and k-fold cross-validation for the CNN.
+
+Trials (one per configuration, or one per configuration and fold) run in a
+process pool. Every worker memory-maps the same cached dataset directory
+(see `blabrecs.dataset`) and gathers its batches straight from the shared
+pages, so the tokenized data exists once in memory however many trials run.
+Results are collected into a leaderboard ranked by validation accuracy.
+
+    configs = grid({'filters': [32, 64], 'learning_rate': [1e-3, 3e-4]})
+    board = run_sweep('datasets/<key>', configs, folds=5, out_dir='sweeps/filters')
+"""
+
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from blabrecs.dataset import load_dataset
+
+SWEEP_PARAMS = ('blocks', 'filters', 'kernel_size', 'embedding_dim', 'dropout_rate', 'learning_rate')
+
+
+def grid(space):
+    """Every combination of a `{param: [values]}` dict, as a list of dicts."""
+    _check_params(space)
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+
+
+def log_uniform(low, high):
+    """A random-search distribution, uniform in log space between `low` and `high`."""
+    return lambda rng: float(math.exp(rng.uniform(math.log(low), math.log(high))))
+
+
+def random_search(space, n, seed=None):
+    """`n` configurations sampled from `space`.
+
+    # Arguments
+        space: dict of param -> list of choices, or a callable taking a
+            `np.random.Generator` (e.g. `log_uniform(1e-4, 1e-2)`).
+        n: int, number of configurations.
+        seed: seed for reproducible draws.
+    """
+    _check_params(space)
+    rng = np.random.default_rng(seed)
+    names = sorted(space)
+    configs = []
+    for _ in range(n):
+        config = {}
+        for name in names:
+            values = space[name]
+            config[name] = values(rng) if callable(values) else values[rng.integers(len(values))]
+        configs.append({k: v.item() if isinstance(v, np.generic) else v for k, v in config.items()})
+    return configs
+
+
+def _check_params(space):
+    unknown = set(space) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"cannot sweep {sorted(unknown)}, expected some of {SWEEP_PARAMS}")
+
+
+def kfold_indices(n, k, seed=None):
+    """Split `range(n)` into `k` shuffled folds.
+
+    # Returns
+        A list of `k` `(train_indices, valid_indices)` tuples; every index is
+        in exactly one validation fold.
+    """
+    order = np.random.default_rng(seed).permutation(n)
+    folds = np.array_split(order, k)
+    return [(np.sort(np.concatenate(folds[:i] + folds[i + 1:])), np.sort(folds[i])) for i in range(k)]
+
+
+def _batches(tokens, labels, indices, batch_size, seed, epoch_counter):
+    # Rows are gathered from the memory map one batch at a time (sorted, so
+    # the reads stay mostly sequential); nothing else is copied.
+    def generate():
+        epoch = next(epoch_counter)
+        order = indices if seed is None else np.random.default_rng([seed, epoch]).permutation(indices)
+        for start in range(0, len(order), batch_size):
+            batch = np.sort(order[start:start + batch_size])
+            yield np.asarray(tokens[batch]), labels[batch]
+    return generate
+
+
+def _memmap_dataset(tokens, labels, indices, batch_size, seed=None):
+    import tensorflow as tf
+
+    signature = (tf.TensorSpec((None, tokens.shape[1]), tf.uint8), tf.TensorSpec((None,), tf.bool))
+    generator = _batches(tokens, labels, indices, batch_size, seed, itertools.count())
+    return tf.data.Dataset.from_generator(generator, output_signature=signature).prefetch(2)
+
+
+def run_trial(dataset_path, config, fold=None, folds=None, epochs=250, batch_size=512, patience=15,
+              seed=6890, threads=1):
+    """Train one configuration (on one fold) and return its validation metrics.
+
+    Runs in a worker process. Without `folds` the model trains on the
+    'train' split and validates on 'valid'; with `folds` the 'train' split
+    is cut into that many folds and fold number `fold` is held out.
+    """
+    import tensorflow as tf
+    from blabrecs.models import build_classifier
+
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(threads)
+    tf.random.set_seed(seed)
+    started = time.perf_counter()
+
+    splits, manifest = load_dataset(dataset_path)
+    train = splits['train']
+    if folds:
+        train_indices, valid_indices = kfold_indices(len(train.labels), folds, seed)[fold]
+        valid = train
+    else:
+        train_indices, valid_indices = np.arange(len(train.labels)), np.arange(len(splits['valid'].labels))
+        valid = splits['valid']
+
+    model = build_classifier(input_shape=train.tokens.shape[1:],
+                             num_features=len(manifest['char_index']) + 1,
+                             **config)
+    history = model.fit(_memmap_dataset(train.tokens, train.labels, train_indices, batch_size, seed),
+                        validation_data=_memmap_dataset(valid.tokens, valid.labels, valid_indices, batch_size),
+                        epochs=epochs,
+                        callbacks=[tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience,
+                                                                    restore_best_weights=True)],
+                        verbose=0).history
+    best = int(np.argmin(history['val_loss']))
+    return {'config': config, 'fold': fold,
+            'val_acc': float(history['val_acc'][best]),
+            'val_loss': float(history['val_loss'][best]),
+            'epochs': len(history['val_loss']),
+            'best_epoch': best + 1,
+            'wall_seconds': time.perf_counter() - started}
+
+
+def leaderboard(results, metric='val_acc', higher_is_better=True):
+    """Average trial results per configuration and rank them by `metric`.
+
+    # Returns
+        A list of dicts (best first) with the configuration, the mean and
+        standard deviation of `metric` across folds, the mean validation
+        loss, the number of folds and the total wall time.
+    """
+    by_config = {}
+    for r in results:
+        by_config.setdefault(json.dumps(r['config'], sort_keys=True), []).append(r)
+    rows = []
+    for key, trials in by_config.items():
+        values = np.array([t[metric] for t in trials])
+        rows.append({'config': json.loads(key),
+                     metric: float(values.mean()),
+                     f'{metric}_std': float(values.std()),
+                     'val_loss': float(np.mean([t['val_loss'] for t in trials])),
+                     'folds': len(trials),
+                     'wall_seconds': float(sum(t['wall_seconds'] for t in trials))})
+    rows.sort(key=lambda row: row[metric], reverse=higher_is_better)
+    for rank, row in enumerate(rows, 1):
+        row['rank'] = rank
+    return rows
+
+
+def write_leaderboard(rows, out_dir):
+    """Write leaderboard.json and a flat leaderboard.csv to `out_dir`."""
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, 'leaderboard.json'), 'w') as f:
+        json.dump(rows, f, indent=1)
+    params = sorted({p for row in rows for p in row['config']})
+    stats = [k for k in (rows[0] if rows else {}) if k not in ('config', 'rank')]
+    with open(os.path.join(out_dir, 'leaderboard.csv'), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['rank'] + params + stats)
+        for row in rows:
+            writer.writerow([row['rank']] + [row['config'].get(p) for p in params] + [row[k] for k in stats])
+
+
+def run_sweep(dataset_path, configs, folds=None, out_dir='sweeps', workers=None, trial=run_trial, **trial_kwargs):
+    """Run every configuration (times every fold) in a process pool.
+
+    # Arguments
+        dataset_path: str, a cached dataset directory (`datasets/<key>`).
+        configs: list of `train_model`-style keyword dicts, e.g. from `grid`
+            or `random_search`.
+        folds: int, k for k-fold cross-validation on the 'train' split, or
+            None to train on 'train' and validate on 'valid'.
+        out_dir: str, where trials.jsonl and the leaderboard are written.
+        workers: int, processes to run (default: one per CPU core); each
+            gets an equal share of the cores for TensorFlow's thread pools.
+        trial: the function run per trial (default `run_trial`).
+        trial_kwargs: passed on to `trial` (epochs, batch_size, ...).
+
+    # Returns
+        The ranked leaderboard (see `leaderboard`).
+    """
+    cores = os.cpu_count() or 1
+    workers = workers or cores
+    jobs = [(config, fold) for config in configs for fold in (range(folds) if folds else [None])]
+    trial_kwargs.setdefault('threads', max(1, cores // min(workers, len(jobs) or 1)))
+    os.makedirs(out_dir, exist_ok=True)
+    results = []
+    # 'spawn' so that workers never inherit a parent's TensorFlow runtime.
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool, \
+            open(os.path.join(out_dir, 'trials.jsonl'), 'w') as log:
+        futures = [pool.submit(trial, dataset_path, config, fold, folds, **trial_kwargs)
+                   for config, fold in jobs]
+        for future in futures:
+            result = future.result()
+            results.append(result)
+            log.write(json.dumps(result) + '\n')
+            log.flush()
+    rows = leaderboard(results)
+    write_leaderboard(rows, out_dir)
+    return rows
@@ -0,0 +1,171 @@
+"""
+Stage-level instrumentation for dataset builds and training runs.
+
+A `Tracer` appends one JSON object per line to a trace file. Wrap each
+stage in `tracer.stage(name)` to record its wall time, CPU time, item count
+and peak RSS; stages can be nested, and the record names its parent. During
+training, `trace_callback(tracer)` adds one record per epoch with the time
+spent in training steps and the time spent waiting for the next batch.
+
+    tracer = Tracer()
+    with tracer.stage('generate') as stage:
+        words = generate_words(n)
+        stage['items'] = len(words)
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss(who):
+    """Peak resident set size in bytes (None where `resource` is missing)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+def _current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def default_trace_path(log_dir='logs'):
+    return os.path.join(log_dir, f"trace_{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl")
+
+
+class Tracer:
+    """Append structured timing records to a JSON-lines file.
+
+    # Arguments
+        path: str, trace file; defaults to logs/trace_<timestamp>.jsonl.
+        echo: bool, also print a one-line summary of every stage.
+    """
+
+    def __init__(self, path=None, echo=True):
+        self.path = path or default_trace_path()
+        self.echo = echo
+        self._stack = []
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, record):
+        record = dict(record, time=datetime.datetime.now().isoformat(timespec='milliseconds'))
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def event(self, name, **fields):
+        """Record a single point-in-time event."""
+        self.write({'type': 'event', 'name': name, 'parent': '/'.join(self._stack) or None, **fields})
+
+    @contextlib.contextmanager
+    def stage(self, name, items=None, **fields):
+        """Time the enclosed block as one stage.
+
+        Yields a dict; set its 'items' key (or any other key) inside the
+        block to attach counts and details to the record. The record is
+        written even if the block raises, with an 'error' field.
+        """
+        record = {'type': 'stage', 'name': name, 'parent': '/'.join(self._stack) or None,
+                  'items': items, **fields}
+        self._stack.append(name)
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException as e:
+            record['error'] = repr(e)
+            raise
+        finally:
+            self._stack.pop()
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            record['rss_bytes'] = _current_rss()
+            if resource is not None:
+                record['peak_rss_bytes'] = _peak_rss(resource.RUSAGE_SELF)
+                record['peak_rss_children_bytes'] = _peak_rss(resource.RUSAGE_CHILDREN)
+            if record['items'] and record['wall_seconds']:
+                record['items_per_second'] = record['items'] / record['wall_seconds']
+            self.write(record)
+            if self.echo:
+                items = f", {record['items']:,} items" if record['items'] is not None else ''
+                print(f"[trace] {'/'.join(self._stack + [name])}: {record['wall_seconds']:.2f}s wall, "
+                      f"{record['cpu_seconds']:.2f}s cpu{items}")
+
+
+class NullTracer(Tracer):
+    """A `Tracer` that times nothing and writes nothing, for library callers."""
+
+    def __init__(self):
+        self.path = None
+        self.echo = False
+        self._stack = []
+
+    def write(self, record):
+        pass
+
+
+def read_trace(path):
+    """Load a trace file as a list of records."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def trace_callback(tracer):
+    """A Keras callback writing one 'epoch' record per training epoch.
+
+    Step time is measured from batch begin to batch end; input wait is the
+    gap between one batch ending and the next beginning, which is where
+    `model.fit` sits waiting on the input pipeline (plus callback overhead).
+    """
+    import tensorflow as tf
+
+    class TraceCallback(tf.keras.callbacks.Callback):
+        def on_epoch_begin(self, epoch, logs=None):
+            self._epoch_started = time.perf_counter()
+            self._epoch_cpu = time.process_time()
+            self._last_end = self._epoch_started
+            self._steps = []
+            self._waits = []
+
+        def on_train_batch_begin(self, batch, logs=None):
+            now = time.perf_counter()
+            self._waits.append(now - self._last_end)
+            self._batch_started = now
+
+        def on_train_batch_end(self, batch, logs=None):
+            self._last_end = time.perf_counter()
+            self._steps.append(self._last_end - self._batch_started)
+
+        def on_epoch_end(self, epoch, logs=None):
+            wall = time.perf_counter() - self._epoch_started
+            steps = sorted(self._steps)
+            record = {'type': 'epoch', 'name': 'epoch', 'parent': '/'.join(tracer._stack) or None,
+                      'epoch': epoch, 'wall_seconds': wall,
+                      'cpu_seconds': time.process_time() - self._epoch_cpu,
+                      'steps': len(steps),
+                      'step_seconds_total': sum(steps),
+                      'step_seconds_median': steps[len(steps) // 2] if steps else None,
+                      'step_seconds_max': steps[-1] if steps else None,
+                      'input_wait_seconds': sum(self._waits),
+                      'input_wait_fraction': sum(self._waits) / wall if wall else 0.0,
+                      # Whatever is left is validation and end-of-epoch callbacks.
+                      'other_seconds': wall - sum(steps) - sum(self._waits),
+                      'rss_bytes': _current_rss(),
+                      'peak_rss_bytes': _peak_rss(resource.RUSAGE_SELF) if resource else None,
+                      'logs': {k: float(v) for k, v in (logs or {}).items()}}
+            tracer.write(record)
+
+    return TraceCallback()
@@ -0,0 +1,154 @@
+"""
+Training the CNN on a built dataset.
+
+TensorFlow is imported inside `train_model`, so importing this module (or
+anything else in the package) stays cheap.
+"""
+
+import datetime
+import os
+
+from blabrecs.packed import MAX_WORD_LENGTH
+from blabrecs.trace import NullTracer, trace_callback
+from blabrecs.vectorize import CharVectorizer
+
+
+def train_model(splits, character_index,
+                model_name = "spell_words",
+                blocks = 3,
+                filters = 64,
+                dropout_rate = 0.3,
+                embedding_dim = 200,
+                kernel_size = 3,
+                pool_size = 3,
+                epochs = 250,
+                batch_size = 512,
+                patience=15,
+                loss = 'binary_crossentropy',
+                learning_rate = 1e-3,
+                streaming = False,
+                negative_multiplier = 6,
+                random_dist = 'english_table',
+                letter_dist = 'english',
+                dictionary = None,
+                seed = 6890,
+                negative_shards = None,
+                hard_negatives = 0.0,
+                mine_every = 5,
+                mine_candidates = 200000,
+                mine_threshold = 0.5,
+                tracer = None):
+    """Train, checkpoint, save and test one model.
+
+    # Arguments
+        splits: dict of 'train'/'valid'/'test' `Split`s, as from
+            `blabrecs.build.load_or_build`.
+        character_index: the tokenizer's character -> token dict.
+        streaming: bool, draw fresh negatives every epoch (see
+            `blabrecs.pipeline.make_dataset`) instead of using the
+            negatives stored in the training split.
+        random_dist, letter_dist, dictionary, seed: negative sampling
+            settings for `streaming`.
+        negative_shards: optional `blabrecs.shards.NegativeShards` to draw
+            the streamed negatives from (implies `streaming`).
+        hard_negatives: float, share of every streamed negative batch taken
+            from mined hard negatives (see `blabrecs.mining`); 0 disables
+            mining, anything else implies `streaming`.
+        mine_every, mine_candidates, mine_threshold: mine this many
+            candidates every `mine_every` epochs, keeping those scored
+            above `mine_threshold`.
+        tracer: optional `blabrecs.trace.Tracer`.
+
+    # Returns
+        The trained Keras model.
+    """
+    import tensorflow as tf
+    from blabrecs.models import build_classifier
+
+    tracer = tracer or NullTracer()
+    streaming = streaming or negative_shards is not None or hard_negatives > 0
+    train, valid, test = splits['train'].tokens, splits['valid'].tokens, splits['test'].tokens
+    train_labels, valid_labels, test_labels = splits['train'].labels, splits['valid'].labels, splits['test'].labels
+    num_features = len(character_index) + 1 # maximum number of letters
+    batch_size = batch_size# * (64)
+
+    model = build_classifier(input_shape=train.shape[1:],
+                             num_features=num_features,
+                             blocks=blocks,
+                             filters=filters,
+                             kernel_size=kernel_size,
+                             embedding_dim=embedding_dim,
+                             dropout_rate=dropout_rate,
+                             pool_size=pool_size,
+                             learning_rate=learning_rate,
+                             loss=loss)
+
+    logdir = os.path.join("logs", datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+    os.makedirs(logdir, exist_ok=True)
+    os.makedirs("training", exist_ok=True)
+    checkpoint_path = "training/model." + model_name + "-{epoch:02d}-{val_loss:.4f}.h5"
+
+    callbacks = [tf.keras.callbacks.EarlyStopping(monitor='val_loss', patience=patience),
+                 #tf.keras.callbacks.TensorBoard(logdir, histogram_freq=1),
+                 tf.keras.callbacks.ModelCheckpoint(checkpoint_path, monitor='val_acc', mode='max', verbose=1, save_best_only=True),
+                 trace_callback(tracer)]
+
+    # Train and validate model.
+    with tracer.stage("fit", model=model_name, epochs=epochs, batch_size=batch_size, streaming=streaming) as stage:
+        if streaming:
+            from blabrecs.pipeline import GeneratedNegatives, make_dataset
+
+            # Real words from the training split, with fresh negatives drawn every epoch.
+            vectorizer = CharVectorizer(character_index, oov_token='@', max_length=MAX_WORD_LENGTH)
+            negatives = negative_shards if negative_shards is not None else GeneratedNegatives(random_dist, letter_dist, dictionary)
+            if hard_negatives > 0:
+                from blabrecs.mining import HardNegativePool, mining_callback
+
+                negatives = HardNegativePool(negatives, fraction=hard_negatives)
+                callbacks.append(mining_callback(negatives, vectorizer,
+                                                 every=mine_every,
+                                                 candidates=mine_candidates,
+                                                 threshold=mine_threshold,
+                                                 dictionary=dictionary,
+                                                 seed=seed,
+                                                 tracer=tracer))
+            streamed_data, steps = make_dataset(train[train_labels],
+                                                vectorizer.transform_packed,
+                                                batch_size=batch_size,
+                                                negative_multiplier=negative_multiplier,
+                                                random_dist=random_dist,
+                                                letter_dist=letter_dist,
+                                                dictionary=dictionary,
+                                                seed=seed,
+                                                negatives=negatives)
+            history = model.fit(
+                        streamed_data,
+                        epochs=epochs,
+                        steps_per_epoch=steps,
+                        callbacks=callbacks,
+                        validation_data=(valid, valid_labels),
+                        verbose=2)
+        else:
+            history = model.fit(
+                        train,
+                        train_labels,
+                        epochs=epochs,
+                        callbacks=callbacks,
+                        validation_data=(valid, valid_labels),
+                        verbose=2,  # Logs once per epoch.
+                        batch_size=batch_size)
+        stage['epochs_run'] = len(history.history['loss'])
+
+    # Print results.
+    history = history.history
+    print('Validation accuracy: {acc}, loss: {loss}'.format(
+                acc=history['val_acc'][-1], loss=history['val_loss'][-1]))
+
+    # Save model.
+    model.save(f'{model_name}_{datetime.datetime.now().strftime("%Y%m%d-%H%M%S")}_nonsepcnn_model.h5')
+    print(history['val_acc'][-1], history['val_loss'][-1])
+
+    test_loss, test_acc = model.evaluate(test, test_labels, verbose=2)
+    print(f"test loss: {test_loss}, test accuracy: {test_acc} ")
+
+    return model
@@ -0,0 +1,127 @@
+"""
+Lookup-table character vectorizer.
+
+Drop-in replacement for the Keras `Tokenizer(char_level=True, lower=True,
+oov_token='@')` + `pad_sequences(maxlen=24, padding='post')` combination
+used by train_cnn.py. Characters are mapped through a fixed 256-entry table
+straight into a preallocated `(n, 24)` array, so it needs neither
+TensorFlow nor per-word Python lists.
+"""
+
+import ast
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH
+
+# The tokenizer mapping the shipped model was trained with (also hard-coded
+# in src/blabrecs/neural.cljs).
+NEURAL_CHAR_INDEX = {'@': 1, 'e': 2, 'i': 3, 's': 4, 'a': 5, 'n': 6, 'o': 7, 'r': 8, 't': 9,
+                     'l': 10, 'c': 11, 'u': 12, 'p': 13, 'd': 14, 'm': 15, 'h': 16, 'g': 17,
+                     'y': 18, 'b': 19, 'f': 20, 'v': 21, 'k': 22, 'w': 23, 'z': 24, 'x': 25,
+                     'q': 26, 'j': 27, "'": 28, '/': 29, '"': 30, '1': 31, '0': 32,
+                     '8': 33, '5': 34, '7': 35, '6': 36, '9': 37, '2': 38, '3': 39, '4': 40}
+
+_NEWLINE = ord('\n')
+
+
+def fit_char_index(words, oov_token='@'):
+    """Build a character index the way `Tokenizer.fit_on_texts` does.
+
+    Characters are numbered from 2 (1 is the OOV token) by descending
+    frequency, ties broken by first occurrence.
+    """
+    data = np.frombuffer('\n'.join(words).lower().encode('ascii', 'replace'), dtype=np.uint8)
+    data = data[data != _NEWLINE]
+    counts = np.bincount(data, minlength=256)
+    chars, first_seen = np.unique(data, return_index=True)
+    chars = chars[np.lexsort((first_seen, -counts[chars]))]
+    char_index = {oov_token: 1}
+    for i, c in enumerate(chars.tolist()):
+        char_index.setdefault(chr(c), i + 2)
+    return char_index
+
+
+def load_char_index(filename):
+    """Read a `tokenizer_*.txt` file written by train_cnn.py (a printed dict)."""
+    with open(filename) as f:
+        return ast.literal_eval(f.read())
+
+
+class CharVectorizer:
+    """Map words to padded token matrices through a 256-entry lookup table.
+
+    # Arguments
+        char_index: dict of character -> token id (e.g. `Tokenizer.word_index`).
+        oov_token: str, key in `char_index` used for unknown characters.
+        max_length: int, width of the output; longer words keep their last
+            `max_length` characters, like `pad_sequences(truncating='pre')`.
+    """
+
+    def __init__(self, char_index=NEURAL_CHAR_INDEX, oov_token='@', max_length=MAX_WORD_LENGTH):
+        self.char_index = dict(char_index)
+        self.max_length = max_length
+        oov = self.char_index.get(oov_token, 0)
+        dtype = np.uint8 if max(self.char_index.values(), default=0) < 256 else np.int32
+        table = np.full(256, oov, dtype=dtype)
+        for char, index in self.char_index.items():
+            if len(char) == 1 and char.isascii():
+                table[ord(char)] = index
+                if char.islower():
+                    table[ord(char.upper())] = index
+        table[0] = 0
+        self.table = table
+
+    @classmethod
+    def from_file(cls, filename, **kwargs):
+        return cls(load_char_index(filename), **kwargs)
+
+    def transform_packed(self, packed):
+        """Tokenize a packed `(n, width)` uint8 word matrix (see `blabrecs.packed`)."""
+        tokens = self.table[packed]
+        if tokens.shape[1] == self.max_length:
+            return tokens
+        out = np.zeros((len(tokens), self.max_length), dtype=self.table.dtype)
+        width = min(tokens.shape[1], self.max_length)
+        out[:, :width] = tokens[:, :width]
+        return out
+
+    def transform_buffer(self, buffer):
+        """Tokenize a newline separated bytes buffer, one word per line.
+
+        A single trailing newline is ignored, as are carriage returns.
+        """
+        if b'\r' in buffer:
+            buffer = buffer.replace(b'\r', b'')
+        if buffer.endswith(b'\n'):
+            buffer = buffer[:-1]
+        n = buffer.count(b'\n') + 1 if buffer else 0
+        return self._tokenize(np.frombuffer(buffer, dtype=np.uint8), n)
+
+    def transform(self, words):
+        """Tokenize a list of strings into a `(n, max_length)` array."""
+        if len(words) and max(map(len, words)) <= self.max_length:
+            try:
+                packed = np.array(words, dtype=f'S{self.max_length}')
+                return self.table[packed.view(np.uint8).reshape(len(words), self.max_length)]
+            except UnicodeEncodeError:
+                pass
+        data = np.frombuffer('\n'.join(words).encode('ascii', 'replace'), dtype=np.uint8)
+        return self._tokenize(data, len(words))
+
+    def _tokenize(self, data, n):
+        out = np.zeros((n, self.max_length), dtype=self.table.dtype)
+        if len(data) == 0:
+            return out
+        is_newline = data == _NEWLINE
+        rows = np.cumsum(is_newline)
+        newlines = np.flatnonzero(is_newline)
+        starts = np.concatenate([[0], newlines + 1])
+        ends = np.concatenate([newlines, [len(data)]])
+        # Words that are too long keep their tail, so shift them left.
+        starts += np.maximum(ends - starts - self.max_length, 0)
+        # Newlines end up in column -1 of the following row and are dropped.
+        columns = np.arange(len(data)) - starts[rows]
+        keep = columns >= 0
+        out.ravel()[rows[keep] * self.max_length + columns[keep]] = self.table[data[keep]]
+        return out
@@ -0,0 +1,152 @@
+"""
+Batch fake-word generation.
+
+`generate_words` is the vectorized counterpart of `generateWord` in
+`blabrecs.words`: it draws every word length and every character for a whole
+batch with NumPy instead of calling `random` once per character.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH
+
+english_length_frequency = {9: 61602, 8: 59066, 10: 57133, 7: 47814, 11: 47480, 12: 36960, 6: 33362, 13: 26716, 14: 18445, 5: 17785, 15: 11902, 4: 7724, 16: 6954, 17: 3996, 3: 2244, 18: 2120, 19: 1109, 20: 532, 21: 236, 22: 104, 23: 46, 24: 25}
+elf_probability = [english_length_frequency[n] for n in sorted(english_length_frequency)]
+
+english_letters = {'e': 467768, 'i': 383297, 's': 357658, 'a': 340401, 'n': 303655, 'o': 303480, 'r': 298272, 't': 282172, 'l': 229025, 'c': 179481, 'u': 153098, 'p': 136546, 'd': 135605, 'm': 126065, 'h': 110164, 'g': 105274, 'y': 78283, 'b': 77576, 'f': 48176, 'v': 39965, 'k': 34437, 'w': 28496, 'z': 18893, 'x': 12318, 'q': 7062, 'j': 6461, "'": 3866, '/': 21, '"': 6, '1': 3, '0': 3, '8': 2, '3': 1, '7': 1, '4': 1, '5': 1, '6': 1, '2': 1, '9': 1}
+
+elet_chars = list(english_letters.keys())
+elet_frequency = [english_letters[n] for n in english_letters.keys()]
+
+RANDOM_DISTS = ('english_table', 'uniform', 'triangle', 'gauss', 'beta', 'biased')
+LETTER_DISTS = ('random', 'english')
+
+# Characters are drawn in blocks of this many words so that the temporary
+# float arrays stay small. Keep it fixed: it is part of what makes a seed
+# reproduce the same words.
+_CHUNK_SIZE = 1 << 16
+
+_elf_lengths = np.array(sorted(english_length_frequency), dtype=np.int64)
+_elf_cdf = np.cumsum(elf_probability, dtype=np.float64)
+_elf_cdf /= _elf_cdf[-1]
+
+_elet_bytes = np.frombuffer(''.join(elet_chars).encode('ascii'), dtype=np.uint8)
+_elet_cdf = np.cumsum(elet_frequency, dtype=np.float64)
+_elet_cdf /= _elet_cdf[-1]
+
+
+def _sample_cdf(rng, cdf, size):
+    """Draw indices from a categorical distribution given as a CDF."""
+    return np.searchsorted(cdf, rng.random(size), side='right')
+
+
+def generate_lengths(n, random_dist='english_table', seed=None, max_length=MAX_WORD_LENGTH):
+    """Draw `n` word lengths using one of the `generateWord` length distributions.
+
+    Lengths are clipped to `max_length`; only the 'biased' and (very rarely)
+    'gauss' distributions go past 24, and the tokenizer keeps at most
+    24 characters of a word anyway.
+    """
+    rng = np.random.default_rng(seed)
+    if random_dist == 'biased':
+        lengths = 3 + np.floor(np.abs(rng.normal(0, 21, n)))
+    elif random_dist == 'triangle':
+        lengths = 3 + np.floor(21.0 * rng.triangular(0, 0, 1, n))
+    elif random_dist == 'uniform':
+        lengths = rng.integers(3, 25, n)
+    elif random_dist == 'gauss':
+        lengths = 3 + np.floor(21.0 * np.abs(rng.normal(0, 0.2, n)))
+    elif random_dist == 'beta':
+        lengths = 3 + np.floor(21.0 * rng.beta(1, 3, n))
+    elif random_dist == 'english_table':
+        lengths = _elf_lengths[_sample_cdf(rng, _elf_cdf, n)]
+    else:
+        raise ValueError(f"unknown random_dist {random_dist!r}, expected one of {RANDOM_DISTS}")
+    return np.minimum(lengths, max_length).astype(np.int64)
+
+
+def generate_words(n, random_dist='english_table', letter_dist='random', seed=None, max_length=MAX_WORD_LENGTH):
+    """Generate `n` fake words in one call.
+
+    # Arguments
+        n: int, number of words to generate.
+        random_dist: str, word length distribution (see `RANDOM_DISTS`).
+        letter_dist: str, 'random' for uniform a-z, 'english' to draw
+            characters from the `english_letters` frequency table.
+        seed: int, `np.random.SeedSequence` or `np.random.Generator`; the
+            same seed always produces the same words.
+        max_length: int, width of the packed array.
+
+    # Returns
+        A `(n, max_length)` uint8 array of ASCII codes, zero-padded on the
+        right (see `blabrecs.packed.unpack_words`).
+    """
+    if letter_dist not in LETTER_DISTS:
+        raise ValueError(f"unknown letter_dist {letter_dist!r}, expected one of {LETTER_DISTS}")
+    rng = np.random.default_rng(seed)
+    lengths = generate_lengths(n, random_dist, rng, max_length)
+    words = np.empty((n, max_length), dtype=np.uint8)
+    columns = np.arange(max_length)
+    for start in range(0, n, _CHUNK_SIZE):
+        stop = min(start + _CHUNK_SIZE, n)
+        shape = (stop - start, max_length)
+        if letter_dist == 'random':
+            chunk = rng.integers(ord('a'), ord('z') + 1, shape, dtype=np.uint8)
+        else:
+            chunk = _elet_bytes[_sample_cdf(rng, _elet_cdf, shape)]
+        chunk[columns >= lengths[start:stop, None]] = 0
+        words[start:stop] = chunk
+    return words
+
+
+def _generate_into(shm_name, shape, start, count, random_dist, letter_dist, seed, max_length):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        out[start:start + count] = generate_words(count, random_dist, letter_dist, seed, max_length)
+    finally:
+        shm.close()
+
+
+def generate_words_parallel(n, random_dist='english_table', letter_dist='random', seed=None,
+                            workers=4, max_length=MAX_WORD_LENGTH, executor=None):
+    """`generate_words` split across a process pool.
+
+    The words are divided into `workers` contiguous blocks, each generated
+    from its own child of `np.random.SeedSequence(seed)` and written straight
+    into shared memory. The result only depends on `seed` and `workers`
+    (not on scheduling), so it is bit-identical between runs; `workers=1`
+    runs in-process.
+
+    # Arguments
+        executor: optional `concurrent.futures.Executor` to reuse; by default
+            a `ProcessPoolExecutor` with `workers` processes is created.
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(workers)
+    counts = [n // workers + (i < n % workers) for i in range(workers)]
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).tolist()
+    if workers == 1:
+        return generate_words(n, random_dist, letter_dist, seeds[0], max_length)
+
+    shape = (n, max_length)
+    shm = shared_memory.SharedMemory(create=True, size=max(n * max_length, 1))
+    try:
+        pool = executor or ProcessPoolExecutor(workers)
+        try:
+            futures = [pool.submit(_generate_into, shm.name, shape, start, count,
+                                   random_dist, letter_dist, child, max_length)
+                       for start, count, child in zip(starts, counts, seeds)]
+            for future in futures:
+                future.result()
+        finally:
+            if executor is None:
+                pool.shutdown()
+        return np.ndarray(shape, dtype=np.uint8, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,120 @@
+"""
+Word list loading and the original one-word-at-a-time generators from
+train_cnn.py.
+
+`generateWord` and `generatePronounceableWord` are kept for callers that
+want a single word; bulk work should use `blabrecs.wordgen.generate_words`
+and `blabrecs.markov.generate_pronounceable_words`.
+"""
+
+import functools
+import math
+import random
+import string
+from pathlib import Path
+
+from blabrecs.evaluate import char_histogram, length_histogram
+from blabrecs.packed import pack_words, unpack_words
+from blabrecs.wordgen import elet_chars, elet_frequency, elf_probability, english_length_frequency
+
+# The word lists the training data is built from.
+# YAWL Word list: https://github.com/elasticdog/yawl/blob/master/yawl-0.3.2.03/word.list
+# Letterpress wordlist: https://github.com/lorenbrichter/Words/blob/master/Words/en.txt
+# Moby Word list: https://www.gutenberg.org/files/3201/files/SINGLE.TXT
+WORD_LISTS = ("word.list", "letterpress_en.txt", "SINGLE.TXT")
+
+
+def loadData(filename):
+  data = ""
+  with open(filename, 'r') as f:
+    data = f.read()
+  data = data.split("\n")
+  return [d.lower() for d in data if ((len(d) >= 3) and (len(d) <= 24))]
+
+
+def loadPrelimData(filename):
+  data = ""
+  Path(filename).touch()
+  with open(filename, 'r') as f:
+    data = f.read()
+    data = data.split("\n")
+  data_list = list(filter(None, data))
+  assert(len(data_list) > 0)
+  return data_list
+
+
+def loadWordLists(filenames=WORD_LISTS):
+  """Every word of every list, lowercased, without de-duplication."""
+  words = []
+  for filename in filenames:
+    words.extend(loadData(filename))
+  return words
+
+
+"""Generate a random string of lowercase letters that is between 3 and 24 characters long. There's a slight chance this will still generate an actual dictionary word, so include an optional way to filter those out. (Which is slow, so the actual function call below uses sets instead.)"""
+
+def generateWord(forbid_list, depth=0, random_dist='english_table', letter_dist='random'):
+  #letters = "abcdefghijklmnopqrstuvwxyz"
+  word_length = 12
+  word_length_max = 24
+  if random_dist == 'biased':
+      word_length = 3 + math.floor(abs(random.normalvariate(0, 21)))
+  if random_dist == 'triangle':
+      word_length = 3 + math.floor(21.0 * abs(random.triangular(0,1,0)))
+  if random_dist == 'uniform':
+      word_length = random.randint(3,24)
+  if random_dist == 'gauss':
+      word_length = 3 + math.floor(21.0 * abs(random.gauss(0,0.2)))
+  if random_dist == 'beta':
+      word_length = 3 + math.floor(21.0 * abs(random.betavariate(1,3)))
+  if random_dist == 'english_table':
+      word_length = random.choices(list(sorted(english_length_frequency)), weights=elf_probability)[0]
+
+  gen_word = ''
+  if letter_dist == 'random':
+      gen_word = ''.join(random.choice(string.ascii_lowercase) for _ in range(word_length))
+  if letter_dist == 'english':
+      gen_word = ''.join(random.choices(elet_chars, elet_frequency)[0] for _ in range(word_length))
+  if None != forbid_list:
+    if gen_word in forbid_list:
+      if depth > 4:
+        print(depth)
+      gen_word = generateWord(forbid_list, depth+1, random_dist=random_dist, letter_dist=letter_dist)
+  return gen_word
+
+"""You'd think that generating random pronouncable words would be useful, but this is actually a late addition, so the only thing it's being used for right now is testing the final model. They come from walking the trigram chain in model.edn (this used to need the `pronounceable` package)."""
+
+@functools.lru_cache(maxsize=None)
+def _pronounceable_sampler(random_dist, model='model.edn'):
+  from blabrecs.markov import MarkovModel
+  return MarkovModel.load(model).sampler(random_dist=random_dist)
+
+def generatePronounceableWord(forbid_list, depth=0, just_gen = False):
+  # just_gen lets the chain decide where the word ends instead of drawing a length of 3 to 24.
+  sampler = _pronounceable_sampler(None if just_gen else 'uniform')
+  gen_word = unpack_words(sampler.generate(1, seed=random.getrandbits(64)))[0]
+  if None != forbid_list:
+    if gen_word in forbid_list:
+      if depth > 4:
+        print(depth)
+      gen_word = generatePronounceableWord(forbid_list, depth+1)
+  return gen_word
+
+
+def saveTextData(tdata, fname):
+  with open(fname, "w") as txt_file:
+    for line in tdata:
+      txt_file.write(line + "\n")
+      #txt_file.write(" ".join(line) + "\n")
+
+def wordStats(wlist):
+    packed = pack_words(wlist)
+    print("Word Lengths:")
+    print({n: int(c) for n, c in enumerate(length_histogram(packed)) if c})
+    print("Character Frequency:")
+    print(char_histogram(packed))
+
+def chunks(lst, n):
+    """Yield successive n-sized chunks from lst."""
+    for i in range(0, len(lst), n):
+        yield lst[i:i + n]
@@ -0,0 +1,90 @@
+"""
+Regenerate the Keras reference predictions used by tests/test_inference.py.
+
+Needs TensorFlow with Keras 2 (`pip install tensorflow tf_keras`, run with
+TF_USE_LEGACY_KERAS=1). From the repository root:
+
+    TF_USE_LEGACY_KERAS=1 python tests/data/make_keras_reference.py
+
+Writes:
+    tests/data/tiny_cnn/: a small CNN with random weights, saved as a TF.js
+        model.json + weight shard, and `reference.npz` with its Keras
+        predictions. It covers the layer variants the shipped model does
+        not use ('valid' Conv1D, overlapping MaxPooling1D, Flatten).
+    tests/data/model_keras_reference.npz: Keras predictions of the shipped
+        model.json for a fixed set of words.
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+
+from tensorflow import keras
+
+sys.path.insert(0, os.getcwd())
+from blabrecs.inference import load_weights  # noqa: E402
+from blabrecs.packed import MAX_WORD_LENGTH, unpack_words  # noqa: E402
+from blabrecs.vectorize import CharVectorizer  # noqa: E402
+from blabrecs.wordgen import generate_words  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WORDS = unpack_words(generate_words(300, seed=0)) + ['glorp', 'hello', 'zzzz', 'a', 'electroencephalographies']
+
+
+def tiny_cnn():
+    model = keras.Sequential([
+        keras.layers.Embedding(41, 8, input_length=MAX_WORD_LENGTH),
+        keras.layers.Dropout(0.2),
+        keras.layers.Conv1D(6, 3, padding='same', activation='relu'),
+        keras.layers.Conv1D(6, 5, padding='valid', activation='relu'),
+        keras.layers.MaxPooling1D(pool_size=3, strides=2),
+        keras.layers.Conv1D(4, 3, padding='same', activation='tanh'),
+        keras.layers.MaxPooling1D(pool_size=2),
+        keras.layers.Flatten(),
+        keras.layers.Dense(5, activation='tanh'),
+        keras.layers.Dense(1, activation='sigmoid'),
+    ])
+    model.build((None, MAX_WORD_LENGTH))
+    rng = np.random.default_rng(0)
+    model.set_weights([rng.normal(0, 0.7, w.shape).astype(np.float32) for w in model.get_weights()])
+    return model
+
+
+def save_tfjs(model, out_dir):
+    # The layers-model format `tensorflowjs_converter` writes, with one float32 shard.
+    os.makedirs(out_dir, exist_ok=True)
+    config = json.loads(model.to_json())
+    topology = {'keras_version': config.pop('keras_version'), 'backend': config.pop('backend'),
+                'model_config': config}
+    manifest = []
+    with open(os.path.join(out_dir, 'group1-shard1of1.bin'), 'wb') as f:
+        for w in model.weights:
+            f.write(w.numpy().astype(np.float32).tobytes())
+            manifest.append({'name': w.name.split(':')[0], 'shape': list(w.shape), 'dtype': 'float32'})
+    with open(os.path.join(out_dir, 'model.json'), 'w') as f:
+        json.dump({'format': 'layers-model', 'modelTopology': topology,
+                   'weightsManifest': [{'paths': ['group1-shard1of1.bin'], 'weights': manifest}]}, f)
+
+
+def main():
+    tokens = CharVectorizer().transform(WORDS).astype(np.uint8)
+
+    model = tiny_cnn()
+    out_dir = os.path.join(HERE, 'tiny_cnn')
+    save_tfjs(model, out_dir)
+    np.savez(os.path.join(out_dir, 'reference.npz'), tokens=tokens,
+             predictions=model.predict(tokens.astype(np.int32), verbose=0))
+
+    with open('model.json') as f:
+        topology = json.load(f)['modelTopology']
+    shipped = keras.models.model_from_json(json.dumps(topology['model_config']))
+    weights = load_weights('model.json')
+    shipped.set_weights([weights[w.name.split(':')[0]] for w in shipped.weights])
+    np.savez(os.path.join(HERE, 'model_keras_reference.npz'), tokens=tokens,
+             predictions=shipped.predict(tokens.astype(np.int32), verbose=0))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import json
+
+from blabrecs import bench
+
+
+def _results(*rows):
+    return {'meta': {}, 'results': [{'stage': stage, 'size': size, 'words_per_second': speed, 'peak_bytes': peak}
+                                    for stage, size, speed, peak in rows]}
+
+
+def test_compare_flags_slowdowns_and_memory_growth():
+    baseline = _results(('tokenize', 1000, 100.0, 1000), ('markov', 1000, 100.0, 1000),
+                        ('lookup', 1000, 100.0, 0))
+    current = _results(('tokenize', 1000, 85.0, 1000),   # 15% slower
+                       ('markov', 1000, 95.0, 1300),     # 5% slower, 30% more memory
+                       ('lookup', 1000, 100.0, 5000),    # no baseline memory to compare with
+                       ('predict', 1000, 1.0, 1000))     # not in the baseline
+    regressions = bench.compare(current, baseline, max_slowdown=0.1, max_memory_growth=0.25)
+    assert [(r['stage'], r['metric']) for r in regressions] == [('tokenize', 'words_per_second'),
+                                                                ('markov', 'peak_bytes')]
+    assert abs(regressions[0]['change'] + 0.15) < 1e-12 and regressions[0]['baseline'] == 100.0
+    assert bench.compare(current, baseline, max_slowdown=0.2, max_memory_growth=0.5) == []
+
+
+def test_main_fails_on_a_regression(tmp_path, capsys):
+    out = tmp_path / 'bench.json'
+    assert bench.main(['--sizes', '500', '--stages', 'tokenize', '--repeat', '1', '--out', str(out)]) == 0
+    results = json.loads(out.read_text())
+    assert [(r['stage'], r['size']) for r in results['results']] == [('tokenize', 500)]
+
+    faster = tmp_path / 'faster.json'
+    faster.write_text(json.dumps(_results(('tokenize', 500, 1e15, 1 << 40))))
+    assert bench.main(['--sizes', '500', '--stages', 'tokenize', '--repeat', '1', '--baseline', str(faster)]) == 1
+    assert 'REGRESSION tokenize @ 500: words_per_second' in capsys.readouterr().out
+
+    slower = tmp_path / 'slower.json'
+    slower.write_text(json.dumps(_results(('tokenize', 500, 1.0, 1 << 40))))
+    assert bench.main(['--sizes', '500', '--stages', 'tokenize', '--repeat', '1', '--baseline', str(slower)]) == 0
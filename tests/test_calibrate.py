@@ -0,0 +1,145 @@
+import numpy as np
+import pytest
+
+from blabrecs.calibrate import (_accept_rates, auc, best_threshold, calibrate, cutoffs_for, load_cutoffs,
+                                roc_curve, save_cutoffs)
+from blabrecs.cascade import CascadeScorer
+from blabrecs.packed import MAX_WORD_LENGTH, pack_words, word_lengths
+from blabrecs.sampler import sample_plausible_words
+
+
+def _data(n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = rng.random(n) < 0.3
+    lengths = rng.integers(1, 20, n)
+    scores = np.clip(rng.normal(0.4 + 0.3 * labels + 0.01 * lengths, 0.15), 0, 1)
+    # Coarse scores give many ties, and some sit exactly on float32(0.8).
+    scores = np.round(scores, 3).astype(np.float32)
+    scores[rng.random(n) < 0.02] = np.float32(0.8)
+    return scores, labels, lengths
+
+
+def _brute(scores, labels, t):
+    accepted = scores > t
+    return (accepted & labels).sum() / labels.sum(), (accepted & ~labels).sum() / (~labels).sum()
+
+
+def test_curve_points_match_brute_force():
+    scores, labels, _ = _data()
+    curve = roc_curve(scores, labels)
+    thresholds = curve['thresholds']
+    assert thresholds.dtype == np.float32
+    assert (np.diff(thresholds) < 0).all()
+    distinct = np.unique(scores)[::-1]
+    assert len(thresholds) == len(distinct) + 1
+    for i, t in enumerate(thresholds):
+        accepted = scores > t
+        # Point i accepts exactly the i highest distinct scores.
+        assert accepted.sum() == ((scores >= distinct[i - 1]).sum() if i else 0)
+        assert (accepted & labels).sum() == curve['tp'][i]
+        assert (accepted & ~labels).sum() == curve['fp'][i]
+
+
+def test_adjacent_float32_scores_are_separated():
+    a = np.float32(0.7)
+    scores = np.array([a, np.nextafter(a, np.float32(0)), np.nextafter(a, np.float32(0))], dtype=np.float32)
+    curve = roc_curve(scores, [True, False, True])
+    assert [(scores > t).sum() for t in curve['thresholds']] == [0, 1, 3]
+
+
+@pytest.mark.parametrize('t', [0.8, 0.82, 0.5, 0.9, -1.0, 0.0, 1.0, 2.0, 0.4005, 0.123456789])
+def test_accept_rates_match_brute_force(t):
+    scores, labels, _ = _data()
+    tpr, fpr = _accept_rates(roc_curve(scores, labels), [t])
+    assert (tpr[0], fpr[0]) == _brute(scores, labels, t)
+
+
+def test_accept_rates_at_every_score_value():
+    scores, labels, _ = _data(3000, seed=1)
+    values = np.unique(scores)
+    tpr, fpr = _accept_rates(roc_curve(scores, labels), values.astype(np.float64))
+    for t, r, f in zip(values, tpr, fpr):
+        assert (r, f) == _brute(scores, labels, t)
+
+
+def test_auc_matches_pairwise_count():
+    scores, labels, _ = _data(2000, seed=2)
+    pos, neg = scores[labels], scores[~labels]
+    pairwise = (pos[:, None] > neg).mean() + 0.5 * (pos[:, None] == neg).mean()
+    assert auc(roc_curve(scores, labels))[0] == pytest.approx(pairwise, abs=1e-12)
+
+
+def test_best_threshold_is_the_brute_force_optimum():
+    scores, labels, _ = _data(5000, seed=3)
+    best = best_threshold(roc_curve(scores, labels), 'accuracy')
+    accuracies = [((scores > t) == labels).mean() for t in np.unique(scores)]
+    assert best['accuracy'] == pytest.approx(max(max(accuracies), (~labels).mean()))
+    assert ((scores > best['threshold']) == labels).mean() == pytest.approx(best['accuracy'])
+    capped = best_threshold(roc_curve(scores, labels), 'f1', max_fpr=0.01)
+    assert _brute(scores, labels, capped['threshold'])[1] <= 0.01
+
+
+def test_per_length_report_matches_brute_force():
+    scores, labels, lengths = _data()
+    report = calibrate(scores, labels, lengths, min_count=800)
+    cutoff = np.float32(report['cutoff'])
+    for length in range(MAX_WORD_LENGTH + 1):
+        group = lengths == length
+        entry = report['by_length'].get(str(length))
+        if not group.any():
+            assert entry is None and report['cutoffs'][length] == report['cutoff']
+            continue
+        assert entry['count'] == group.sum() and entry['positives'] == labels[group].sum()
+        if group.sum() >= 800:
+            expected = best_threshold(roc_curve(scores[group], labels[group]))['threshold']
+            assert entry['calibrated'] and entry['cutoff'] == expected
+        else:
+            assert not entry['calibrated'] and entry['cutoff'] == report['cutoff']
+        rates = entry['accept_rate']
+        assert tuple(rates['overall_cutoff'].values()) == _brute(scores[group], labels[group], cutoff)
+        assert tuple(rates['length_cutoff'].values()) == _brute(scores[group], labels[group],
+                                                                 np.float32(entry['cutoff']))
+    assert report['accept_rate']['0.8'] == dict(zip(('real', 'fake'), _brute(scores, labels, 0.8)))
+    per_word = np.asarray(report['cutoffs'], dtype=np.float32)[lengths]
+    assert report['length_cutoff_accuracy'] == ((scores > per_word) == labels).mean()
+
+
+def test_cutoffs_round_trip_and_lookup(tmp_path):
+    scores, labels, lengths = _data(seed=4)
+    report = calibrate(scores, labels, lengths, min_count=500)
+    save_cutoffs(str(tmp_path / 'thresholds.json'), report)
+    cutoffs = load_cutoffs(str(tmp_path / 'thresholds.json'))
+    assert cutoffs.shape == (MAX_WORD_LENGTH + 1,)
+    np.testing.assert_array_equal(cutoffs.astype(np.float32), np.float32(report['cutoffs']))
+    assert load_cutoffs(str(tmp_path / 'thresholds.json'), per_length=False) == report['cutoff']
+
+    words = pack_words(['ab', 'glorp', 'z' * MAX_WORD_LENGTH])
+    np.testing.assert_array_equal(cutoffs_for(cutoffs, words), cutoffs[word_lengths(words)].astype(np.float32))
+    np.testing.assert_array_equal(cutoffs_for(cutoffs, [2, 5, 30]), cutoffs[[2, 5, 24]].astype(np.float32))
+    scalar = cutoffs_for(0.8, words)
+    assert scalar.ndim == 0 and scalar.dtype == np.float32
+    # A score of exactly float32(0.8) does not exceed a 0.8 cutoff, as in `scores > 0.8`.
+    assert not np.float32(0.8) > scalar
+    assert cutoffs_for(0.8, words, np.float64) == 0.8
+
+
+class _AcceptAll:
+    def sufficiently_probable(self, words):
+        return np.ones(len(words), dtype=bool)
+
+
+class _ScoreByLength:
+    # Scores every word 0.1 * its length; the tokens' non-zero count is the length.
+    def predict(self, tokens):
+        return (np.count_nonzero(tokens, axis=1) / np.float32(10)).astype(np.float32)[:, None]
+
+
+def test_scorers_apply_per_length_cutoffs():
+    cutoffs = np.full(MAX_WORD_LENGTH + 1, 0.35)
+    cutoffs[5] = 0.55
+    words = ['abc', 'abcd', 'abcde', 'abcdef']
+    accepted, _ = CascadeScorer(_AcceptAll(), _ScoreByLength(), threshold=cutoffs).score(words)
+    assert accepted.tolist() == [False, True, False, True]
+    found = list(sample_plausible_words(50, cutoffs, predict=_ScoreByLength().predict, random_dist='uniform',
+                                        seed=5, max_candidates=20000))
+    assert {len(word) for word, _ in found} >= {4, 6} and all(len(word) != 5 for word, _ in found)
@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+
+from blabrecs.cascade import CascadeScorer
+from blabrecs.inference import NumpyModel
+from blabrecs.markov import MarkovModel
+from blabrecs.packed import pack_words, unpack_words
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+class _Counting:
+    def __init__(self, model):
+        self.model = model
+        self.scored = 0
+
+    def predict(self, tokens):
+        self.scored += len(tokens)
+        return self.model.predict(tokens)
+
+
+def test_cascade_matches_the_full_model():
+    markov = MarkovModel.load(os.path.join(ROOT, 'model.edn'))
+    cnn = NumpyModel.load(os.path.join(ROOT, 'model.json'))
+    # Random fake words mostly fail the Markov check, real words mostly pass it.
+    with open(os.path.join(ROOT, 'enable.txt')) as f:
+        real_words = f.read().split()[::100]
+    words = unpack_words(generate_words(2000, letter_dist='english', seed=0)) + real_words + ['glorp', 'sneeble']
+    counting = _Counting(cnn)
+    cascade = CascadeScorer(markov, counting, batch_size=256)
+    accepted, scores = cascade.score(words)
+
+    passes_markov = markov.sufficiently_probable(pack_words(words))
+    full_scores = cnn.predict(CharVectorizer().transform(words))[:, 0]
+    np.testing.assert_array_equal(accepted, passes_markov & (full_scores > 0.82))
+    np.testing.assert_allclose(scores[passes_markov], full_scores[passes_markov], rtol=1e-6)
+    assert np.isnan(scores[~passes_markov]).all()
+    assert 0 < accepted.sum() < passes_markov.sum() < len(words)
+
+    assert counting.scored == passes_markov.sum()
+    report = cascade.report()
+    assert report['words'] == len(words)
+    assert report['markov_pass_rate'] == passes_markov.mean()
+    assert report['accept_rate'] == accepted.mean()
@@ -0,0 +1,37 @@
+import pytest
+
+from blabrecs import checks, cli, dictionary, words
+from blabrecs.vectorize import NEURAL_CHAR_INDEX
+
+DATASET_INDEX = {'@': 1, 'e': 2, 'a': 3}
+
+
+@pytest.fixture
+def evaluate(monkeypatch):
+    seen = {}
+
+    def fake_dataset(args):
+        seen['dataset_loaded'] = True
+        return None, DATASET_INDEX, None
+
+    monkeypatch.setattr(cli, '_load_model', lambda path: object())
+    monkeypatch.setattr(cli, '_dataset', fake_dataset)
+    monkeypatch.setattr(checks, 'check_model', lambda model, name, wordlist, **kwargs: seen.update(kwargs))
+    monkeypatch.setattr(words, 'loadWordLists', lambda filenames: ['glorp'])
+    monkeypatch.setattr(dictionary.DictionaryIndex, 'cached', classmethod(lambda cls, *args: None))
+
+    def run(*argv):
+        seen.clear()
+        assert cli.main(['evaluate', *argv]) == 0
+        return seen['vectorizer'].char_index, seen.get('dataset_loaded', False)
+    return run
+
+
+def test_evaluate_picks_the_model_tokenizer(evaluate, tmp_path):
+    # A Keras model was trained on the dataset's character index.
+    assert evaluate('--model', 'model.h5') == (DATASET_INDEX, True)
+    # model.json is the app's model, and needs no dataset.
+    assert evaluate('--model', 'model.json') == (NEURAL_CHAR_INDEX, False)
+    tokenizer = tmp_path / 'tokenizer.txt'
+    tokenizer.write_text(str({'@': 1, 'z': 2}))
+    assert evaluate('--model', 'model.h5', '--tokenizer', str(tokenizer)) == ({'@': 1, 'z': 2}, False)
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+
+from blabrecs import dataset
+from blabrecs.dataset import Split, cached_dataset, dataset_key, load_dataset, save_dataset
+from blabrecs.packed import MAX_WORD_LENGTH
+from blabrecs.wordgen import generate_words
+
+PARAMS = {'random_dist': 'uniform', 'seed': 1}
+CHAR_INDEX = {'@': 1, 'e': 2}
+
+
+def _splits(seed, sizes=(101, 13)):
+    rng = np.random.default_rng(seed)
+    splits = {}
+    for name, n in zip(('train', 'test'), sizes):
+        words = generate_words(n, seed=rng)
+        splits[name] = Split(rng.integers(0, 40, (n, MAX_WORD_LENGTH), dtype=np.uint8), rng.random(n) < 0.3, words)
+    return splits
+
+
+def _assert_same(loaded, expected):
+    assert loaded.keys() == expected.keys()
+    for name, split in expected.items():
+        for a, b in zip(loaded[name], split):
+            np.testing.assert_array_equal(a, b)
+
+
+def test_round_trip(tmp_path):
+    splits = _splits(0)
+    save_dataset(str(tmp_path / 'd'), splits, PARAMS, CHAR_INDEX)
+    loaded, manifest = load_dataset(str(tmp_path / 'd'))
+    _assert_same(loaded, splits)
+    assert loaded['train'].labels.dtype == bool and not loaded['train'].tokens.flags.writeable
+    assert manifest['char_index'] == CHAR_INDEX and manifest['key'] == dataset_key(PARAMS)
+    assert manifest['splits']['test'] == {'count': 13, 'positives': int(splits['test'].labels.sum())}
+    assert os.listdir(tmp_path) == ['d']
+
+
+def test_cached_dataset_builds_once(tmp_path):
+    builds = []
+
+    def build():
+        builds.append(1)
+        return _splits(len(builds)), CHAR_INDEX
+
+    first, char_index = cached_dataset(PARAMS, build, root=str(tmp_path))
+    again, _ = cached_dataset(PARAMS, build, root=str(tmp_path))
+    assert len(builds) == 1 and char_index == CHAR_INDEX
+    _assert_same(again, _splits(1))
+    rebuilt, _ = cached_dataset(PARAMS, build, root=str(tmp_path), rebuild=True)
+    assert len(builds) == 2
+    _assert_same(rebuilt, _splits(2))
+    assert os.listdir(tmp_path) == [dataset_key(PARAMS)]
+
+
+def test_interrupted_rebuild_keeps_the_old_cache(tmp_path, monkeypatch):
+    cached_dataset(PARAMS, lambda: (_splits(0), CHAR_INDEX), root=str(tmp_path))
+    real_save = np.save
+    calls = []
+
+    def failing_save(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 4:
+            raise KeyboardInterrupt
+        real_save(*args, **kwargs)
+
+    monkeypatch.setattr(dataset.np, 'save', failing_save)
+    with pytest.raises(KeyboardInterrupt):
+        cached_dataset(PARAMS, lambda: (_splits(1, sizes=(50, 7)), CHAR_INDEX), root=str(tmp_path), rebuild=True)
+    monkeypatch.undo()
+    # The half-written copy is gone and the old one is complete and unchanged.
+    assert os.listdir(tmp_path) == [dataset_key(PARAMS)]
+    _assert_same(load_dataset(str(tmp_path / dataset_key(PARAMS)))[0], _splits(0))
+
+
+def test_directory_without_manifest_is_rebuilt(tmp_path):
+    path = tmp_path / dataset_key(PARAMS)
+    path.mkdir()
+    np.save(str(path / 'train_tokens.npy'), np.zeros((3, MAX_WORD_LENGTH), dtype=np.uint8))
+    splits, _ = cached_dataset(PARAMS, lambda: (_splits(0), CHAR_INDEX), root=str(tmp_path))
+    _assert_same(splits, _splits(0))
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from blabrecs import dictionary
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.packed import pack_words, unpack_words
+from blabrecs.wordgen import generate_words
+
+
+def _random_words(n, seed):
+    return unpack_words(generate_words(n, random_dist='uniform', letter_dist='random', seed=seed))
+
+
+@pytest.fixture
+def words():
+    return sorted(set(_random_words(5000, 1) + ['a', 'aa', 'ab', 'abc', 'zz', 'zzz', 'z' * 24, 'a' * 24]))
+
+
+def test_contains_matches_set(words):
+    index = DictionaryIndex.from_words(words)
+    queries = words + _random_words(5000, 2) + ['', 'b', 'zzzz', 'a' * 23]
+    expected = np.array([q in set(words) for q in queries])
+    np.testing.assert_array_equal(index.contains(queries), expected)
+    np.testing.assert_array_equal(index.contains(pack_words(queries)), expected)
+    assert len(index) == len(words)
+    assert 'abc' in index and 'abd' not in index
+
+
+def test_too_long_words_are_not_found(words):
+    index = DictionaryIndex.from_words(words + ['electroencephalographies'])
+    assert 'electroencephalographies' in index
+    queries = ['electroencephalographies' + 'x', 'electroencephalographiesxyz', 'z' * 25, 'a' * 24]
+    assert index.contains(queries).tolist() == [False, False, False, True]
+
+
+def test_every_row_is_placed_once(words):
+    index = DictionaryIndex.from_words(words)
+    rows = index.table[index.table != dictionary._EMPTY]
+    np.testing.assert_array_equal(np.sort(rows), np.arange(len(words)))
+
+
+def test_colliding_hashes_wrap_around(monkeypatch, words):
+    # Every word hashes to one of the last few slots, so building claims
+    # slots over many rounds and probing wraps past the end of the table.
+    def bad_hash(packed):
+        return np.asarray(packed, dtype=np.uint64)[:, 0] % np.uint64(4) | np.uint64(2 ** 64 - 4)
+
+    monkeypatch.setattr(dictionary, 'hash_packed', bad_hash)
+    subset = words[:300]
+    index = DictionaryIndex.from_words(subset)
+    rows = index.table[index.table != dictionary._EMPTY]
+    np.testing.assert_array_equal(np.sort(rows), np.arange(len(subset)))
+    assert index.table[0] != dictionary._EMPTY
+    queries = subset + words[300:600]
+    np.testing.assert_array_equal(index.contains(queries), np.array([q in set(subset) for q in queries]))
+
+
+def test_empty_index():
+    index = DictionaryIndex.from_words([])
+    assert len(index) == 0
+    assert not index.contains(['a', 'word']).any()
+    assert index.count_prefix('') == 0
+
+
+@pytest.mark.parametrize('prefix', ['', 'a', 'aa', 'ab', 'q', 'z', 'zz', 'zzzz', 'z' * 24, 'a' * 24, '0', '~'])
+def test_prefix_queries_match_scan(words, prefix):
+    index = DictionaryIndex.from_words(words)
+    expected = [w for w in words if w.startswith(prefix)]
+    assert index.count_prefix(prefix) == len(expected)
+    assert index.with_prefix(prefix) == expected
+    assert index.with_prefix(prefix, limit=3) == expected[:3]
+
+
+def test_save_load_round_trip(tmp_path, words):
+    index = DictionaryIndex.from_words(words)
+    index.save(str(tmp_path / 'index'))
+    loaded = DictionaryIndex.load(str(tmp_path / 'index'))
+    np.testing.assert_array_equal(loaded.words, index.words)
+    np.testing.assert_array_equal(loaded.table, index.table)
+    queries = words[::7] + _random_words(1000, 3)
+    np.testing.assert_array_equal(loaded.contains(queries), index.contains(queries))
+    assert loaded.with_prefix('ab') == index.with_prefix('ab')
+
+
+def test_cached_rebuilds_when_source_changes(tmp_path):
+    source = tmp_path / 'words.txt'
+    source.write_text('Glorp\nwug\n\n')
+    path = str(tmp_path / 'index')
+    assert DictionaryIndex.cached([str(source)], path).with_prefix('') == ['glorp', 'wug']
+    source.write_text('glorp\nwug\nblick\n')
+    assert DictionaryIndex.cached([str(source)], path).with_prefix('') == ['blick', 'glorp', 'wug']
@@ -0,0 +1,68 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from blabrecs.dataset import Split
+from blabrecs.distill import distillation_data, distillation_report
+from blabrecs.inference import NumpyModel
+from blabrecs.packed import unpack_words
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+TINY_CNN = os.path.join(os.path.dirname(__file__), 'data', 'tiny_cnn', 'model.json')
+
+
+class _Constant:
+    def __init__(self, score):
+        self.score = score
+        self.weights = {'kernel': np.zeros((2, 3))}
+
+    def predict(self, tokens):
+        return np.full((len(tokens), 1), self.score, dtype=np.float32)
+
+
+def test_generated_words_skip_the_real_ones_without_a_dictionary():
+    # With no Markov share, the candidates are the first draw from the seeded stream.
+    drawn = generate_words(400, letter_dist='english', seed=np.random.default_rng(3))
+    candidates = unpack_words(drawn)
+    real_words = np.concatenate([generate_words(200, seed=4), drawn[::2]])
+    vectorizer = CharVectorizer()
+    tokens, scores, is_real = distillation_data(_Constant(0.3), vectorizer, real_words, candidates=400,
+                                                markov_fraction=0, seed=3)
+    real_set = set(unpack_words(real_words))
+    assert is_real.sum() == len(real_set)
+    fake_tokens = {row.tobytes() for row in tokens[~is_real]}
+    assert fake_tokens == {row.tobytes() for row in vectorizer.transform(sorted(set(candidates) - real_set))}
+    assert scores.shape == (len(tokens),) and np.all(scores == np.float32(0.3))
+
+
+def test_report_uses_the_app_threshold():
+    tokens = CharVectorizer().transform(['glorp', 'table'])
+    report = distillation_report(_Constant(0.85), _Constant(0.7), tokens, [1, 1])
+    assert report['threshold'] == 0.82
+    assert report['teacher']['accuracy'] == 1.0 and report['student']['accuracy'] == 0.0
+    assert report['agreement'] == 0.0
+    assert distillation_report(_Constant(0.85), _Constant(0.7), tokens, [1, 1], threshold=0.5)['agreement'] == 1.0
+
+
+def test_distill_trains_and_exports_a_student(tmp_path):
+    pytest.importorskip('tensorflow')
+    from blabrecs.distill import distill
+
+    vectorizer = CharVectorizer()
+    rng = np.random.default_rng(0)
+    splits = {}
+    for name, n in (('train', 300), ('valid', 60), ('test', 60)):
+        words = generate_words(n, seed=rng)
+        splits[name] = Split(vectorizer.transform_packed(words), rng.random(n) < 0.5, words)
+    student = {'blocks': 1, 'filters': 4, 'kernel_size': 3, 'embedding_dim': 4, 'dropout_rate': 0.0}
+    report = distill(NumpyModel.load(TINY_CNN), splits, vectorizer, str(tmp_path), student=student,
+                     candidates=300, markov_fraction=0, seed=0, epochs=2, batch_size=64)
+    with open(tmp_path / 'distillation_report.json') as f:
+        assert json.load(f) == report
+    assert report['threshold'] == 0.82 and report['student']['config'] == student
+    assert report['student']['parameters'] < report['teacher']['parameters']
+    predictions = NumpyModel.load(str(tmp_path / 'model.json')).predict(splits['test'].tokens)
+    assert predictions.shape == (60, 1) and np.all((predictions >= 0) & (predictions <= 1))
@@ -0,0 +1,63 @@
+import json
+import os
+
+import numpy as np
+
+from blabrecs import evaluate
+from blabrecs.evaluate import evaluate_sets, length_histogram, predict_all, summarize
+from blabrecs.packed import MAX_WORD_LENGTH, unpack_words, word_lengths
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+
+def _scored(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    words = generate_words(n, seed=rng)
+    # Coarse float32 scores, with ties sitting exactly on float32(0.8).
+    scores = np.round(rng.random(n), 2).astype(np.float32)
+    scores[rng.random(n) < 0.05] = np.float32(0.8)
+    return words, scores
+
+
+def test_summary_matches_brute_force():
+    words, scores = _scored()
+    thresholds = (0.5, 0.8, np.float64(0.8), 0.82, 0.9)
+    summary = summarize(words, scores, thresholds, extremes=5)
+    assert summary['count'] == len(scores)
+    assert summary['accept_rate'] == {str(t): float((scores > t).mean()) for t in (0.5, 0.8, 0.82, 0.9)}
+    assert summary['median'] == float(np.median(scores))
+    assert summary['quantiles']['0.25'] == float(np.sort(scores)[len(scores) // 4])
+    assert summary['length_histogram'] == np.bincount(word_lengths(words), minlength=MAX_WORD_LENGTH + 1).tolist()
+    strings = unpack_words(words)
+    assert sum(summary['char_histogram'].values()) == sum(map(len, strings))
+    assert [s for _, s in summary['lowest']] == sorted(scores.tolist())[:5]
+    assert [s for _, s in summary['highest']] == sorted(scores.tolist())[::-1][:5]
+    empty = summarize(words[:0], scores[:0])
+    assert empty['count'] == 0 and set(empty['accept_rate'].values()) == {0.0}
+
+
+def test_report_plots_the_sorted_scores(tmp_path, monkeypatch):
+    words, _ = _scored(3000, seed=1)
+    vectorizer = CharVectorizer()
+
+    def predict(tokens):
+        return (np.count_nonzero(tokens, axis=1) / np.float32(MAX_WORD_LENGTH)).astype(np.float32)[:, None]
+
+    plotted = {}
+
+    def fake_plot(ranked, title, filename):
+        plotted[title] = ranked
+        return filename
+
+    monkeypatch.setattr(evaluate, 'plot_sorted_predictions', fake_plot)
+    report = evaluate_sets(predict, vectorizer, {'Fake Words': words, 'None': words[:0]}, str(tmp_path), 'm',
+                           batch_size=1000)
+    scores = np.load(os.path.join(tmp_path, 'fake_words.npy'))
+    np.testing.assert_array_equal(scores, predict_all(predict, vectorizer.transform_packed(words)))
+    np.testing.assert_array_equal(plotted['m Prediction of Fake Words'], np.sort(scores))
+    assert list(plotted) == ['m Prediction of Fake Words']
+    with open(os.path.join(tmp_path, 'report.json')) as f:
+        assert json.load(f) == json.loads(json.dumps(report))
+    assert report['sets']['Fake Words']['plot'] == 'fake_words.png'
+    assert report['sets']['Fake Words']['length_histogram'] == length_histogram(words).tolist()
+    assert os.path.exists(os.path.join(tmp_path, 'report.html'))
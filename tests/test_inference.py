@@ -0,0 +1,45 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from blabrecs.inference import NumpyModel
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+TINY_CNN = os.path.join(DATA, 'tiny_cnn', 'model.json')
+SHIPPED_MODEL = os.path.join(os.path.dirname(__file__), os.pardir, 'model.json')
+
+
+# Reference predictions come from Keras; see data/make_keras_reference.py.
+@pytest.mark.parametrize('model_json, reference', [(TINY_CNN, os.path.join(DATA, 'tiny_cnn', 'reference.npz')),
+                                                   (SHIPPED_MODEL, os.path.join(DATA, 'model_keras_reference.npz'))])
+def test_predictions_match_keras(model_json, reference):
+    reference = np.load(reference)
+    predictions = NumpyModel.load(model_json).predict(reference['tokens'], batch_size=100)
+    np.testing.assert_allclose(predictions, reference['predictions'], rtol=1e-5, atol=1e-6)
+
+
+def _layers_with(class_name, **changes):
+    with open(TINY_CNN) as f:
+        layers = json.load(f)['modelTopology']['model_config']['config']['layers']
+    layer = next(l for l in layers if l['class_name'] == class_name)
+    layer['config'].update(changes)
+    return layers
+
+
+@pytest.mark.parametrize('class_name, changes', [('MaxPooling1D', {'padding': 'same'}),
+                                                 ('MaxPooling1D', {'data_format': 'channels_first'}),
+                                                 ('Conv1D', {'strides': [2]}),
+                                                 ('Conv1D', {'padding': 'causal'})])
+def test_unsupported_configs_raise(class_name, changes):
+    with pytest.raises(NotImplementedError):
+        NumpyModel(_layers_with(class_name, **changes), {})
+
+
+def test_save_load_round_trip(tmp_path):
+    reference = np.load(os.path.join(DATA, 'tiny_cnn', 'reference.npz'))
+    model = NumpyModel.load(TINY_CNN)
+    path = model.save(str(tmp_path))
+    np.testing.assert_array_equal(NumpyModel.load(path).predict(reference['tokens']),
+                                  model.predict(reference['tokens']))
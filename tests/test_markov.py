@@ -0,0 +1,107 @@
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+import pytest
+
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.markov import END, MIN_WORD_LENGTH, N, START, MarkovModel, TrigramCounts
+from blabrecs.packed import MAX_WORD_LENGTH, word_lengths
+
+CORPUS = ['glorp', 'glop', 'blorp', 'wug', 'wugs', 'snorp', 'gloppy', 'lorp', 'a', 'an', 'ant', 'pant', 'plant']
+
+
+def _ngrams(word):
+    # `word->ngrams` in markov.cljc
+    word = '^' + word.lower() + '$'
+    return [word[i:i + 3] for i in range(len(word) - 2)]
+
+
+def _build_model(words):
+    # `build-model` in markov.cljc
+    counts = defaultdict(Counter)
+    for word in words:
+        for gram in _ngrams(word):
+            counts[gram[:2]][gram[2]] += 1
+    return {prefix: {c: n / sum(following.values()) for c, n in following.items()}
+            for prefix, following in counts.items()}
+
+
+def _probability(model, word):
+    # `probability` in markov.cljc, with a missing transition counting as 0
+    return math.prod(model.get(g[:2], {}).get(g[2], 0.0) for g in _ngrams(word))
+
+
+@pytest.fixture
+def reference():
+    return _build_model(CORPUS)
+
+
+QUERIES = CORPUS + ['', 'glorpant', 'plorp', 'zzz', 'GLORP', 'an' * 12, 'wu-g']
+
+
+def test_probability_matches_reference(reference):
+    model = MarkovModel.from_dict(reference)
+    expected = np.array([_probability(reference, w) for w in QUERIES])
+    np.testing.assert_allclose(model.probability(QUERIES), expected, rtol=1e-12)
+    assert np.isneginf(model.log_probability(['zzz'])[0])
+
+
+def test_sufficiently_probable_matches_reference(reference):
+    model = MarkovModel.from_dict(reference)
+    probs = [p for following in reference.values() for p in following.values()]
+    avg = sum(probs) / len(probs)
+    expected = [_probability(reference, w) > avg ** len(w) for w in QUERIES]
+    assert model.sufficiently_probable(QUERIES).tolist() == expected
+
+
+def test_trained_counts_match_build_model(reference, tmp_path):
+    # 'wu-g' has a non-letter and is skipped, as build-model never sees one.
+    counts = TrigramCounts().add(CORPUS[:6]).merge(TrigramCounts().add(CORPUS[6:] + ['wu-g']))
+    edn = str(tmp_path / 'model.edn')
+    counts.write_edn(edn)
+    expected = MarkovModel.from_dict(reference)
+    for model in (counts.to_model(), MarkovModel.load(edn)):
+        np.testing.assert_array_equal(model.present, expected.present)
+        np.testing.assert_allclose(model.probs, expected.probs, rtol=1e-12)
+
+
+def _free_running_lengths(sampler_model, first, max_length):
+    # Exact length distribution of a walk that runs until `$`, kept only
+    # between MIN_WORD_LENGTH and max_length letters.
+    probs = sampler_model.probs
+    state = np.zeros((N, N))
+    state[START] = first / first.sum()
+    ends = np.zeros(max_length + 1)
+    for length in range(1, max_length + 1):
+        ends[length] = (state * probs[:, :, END]).sum()
+        state = np.einsum('ab,abc->bc', state, probs)
+        state[:, END] = 0.0
+    ends[:MIN_WORD_LENGTH] = 0.0
+    return ends / ends.sum()
+
+
+@pytest.mark.parametrize('max_length', [MAX_WORD_LENGTH, 6])
+def test_free_running_lengths_follow_the_chain(max_length):
+    counts = TrigramCounts().add(CORPUS)
+    first = counts.counts[START].sum(axis=1).astype(np.float64)
+    words = counts.sampler(random_dist=None, max_length=max_length).generate(20000, seed=0)
+    assert words.shape == (20000, max_length)
+    histogram = np.bincount(word_lengths(words), minlength=max_length + 1)
+    expected = 20000 * _free_running_lengths(counts.to_model(), first, max_length)
+    assert histogram[:MIN_WORD_LENGTH].sum() == 0
+    # Nothing piles up at the cap: every length is within a few standard deviations.
+    assert (np.abs(histogram - expected) <= 4 * np.sqrt(expected) + 1).all()
+
+
+def test_sampled_words_have_the_requested_lengths(reference):
+    model = MarkovModel.from_dict(reference)
+    lengths = np.random.default_rng(1).integers(3, 6, 5000)
+    dictionary = DictionaryIndex.from_words(['wug', 'ant', 'glop', 'lorp', 'plorp'])
+    words = model.sampler(dictionary=dictionary).generate(5000, lengths=lengths, seed=2)
+    np.testing.assert_array_equal(word_lengths(words), lengths)
+    # Every transition, including the final `$`, is one the model has seen.
+    assert (model.probability(words) > 0).all()
+    assert not dictionary.contains(words).any()
+    sampler = model.sampler(random_dist=None)
+    np.testing.assert_array_equal(sampler.generate(100, seed=3), sampler.generate(100, seed=3))
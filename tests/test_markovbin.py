@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from blabrecs.dictionary import read_word_file
+from blabrecs.markovbin import ENCODINGS, export_model, read_header, verify
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+MODEL_EDN = os.path.join(ROOT, 'model.edn')
+ENABLE = read_word_file(os.path.join(ROOT, 'enable.txt'))
+
+
+@pytest.mark.parametrize('encoding', ENCODINGS)
+def test_export_round_trips(tmp_path, encoding):
+    path = str(tmp_path / 'model.bin')
+    data = export_model(MODEL_EDN, path, encoding)
+    assert read_header(data)['encoding'] == encoding and read_header(data)['size'] == len(data)
+    report = verify(MODEL_EDN, path, ENABLE)
+    assert report['ok'] and report['words_checked'] == len(ENABLE)
+    assert report['decisions_differing'] == (0 if encoding == 'float32' else 1)
+
+
+def test_shipped_model_bin_matches_model_edn():
+    report = verify(MODEL_EDN, os.path.join(ROOT, 'model.bin'), ENABLE)
+    assert report['ok'] and report['encoding'] == 'float32' and report['decisions_differing'] == 0
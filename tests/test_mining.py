@@ -0,0 +1,77 @@
+import itertools
+import string
+
+import numpy as np
+import pytest
+
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.mining import HardNegativePool, mine_hard_negatives, mining_callback
+from blabrecs.packed import pack_words, unpack_words, word_lengths
+from blabrecs.pipeline import GeneratedNegatives
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+# Every three-letter string, so that plenty of generated words are "real".
+DICTIONARY = DictionaryIndex.from_words(''.join(w) for w in itertools.product(string.ascii_lowercase, repeat=3))
+
+
+def _score_by_length(tokens):
+    # Words of six letters or more are the ones the "model" gets wrong.
+    return (np.count_nonzero(tokens, axis=1) >= 6).astype(np.float32) * 0.9
+
+
+def test_mined_words_are_distinct_hard_and_not_real():
+    candidates = generate_words(5000, seed=0)
+    candidates = np.concatenate([candidates, candidates[:500], pack_words(['abc', 'glorpish'])])
+    words, scores = mine_hard_negatives(_score_by_length, CharVectorizer(), candidates, 0.5, DICTIONARY)
+    mined = unpack_words(words)
+    assert len(mined) == len(set(mined)) and 'glorpish' in mined
+    assert np.all(scores > 0.5) and np.all(word_lengths(words) >= 6)
+    expected = {w for w in unpack_words(candidates) if len(w) >= 6}
+    assert set(mined) == expected
+
+    short, _ = mine_hard_negatives(lambda t: np.full(len(t), 0.9, np.float32), CharVectorizer(),
+                                   candidates, 0.5, DICTIONARY)
+    assert not DICTIONARY.contains(short).any() and len(short) > 0
+
+
+def test_pool_draws_the_fraction_and_never_dictionary_words():
+    pool = HardNegativePool(GeneratedNegatives(dictionary=DICTIONARY), fraction=0.3, capacity=1000)
+    before = pool.sample(0, 1000)
+    assert len(before) == 1000 and not DICTIONARY.contains(before).any()
+    # The english_table lengths put about 1 in 20 words at three letters, which the dictionary replaces.
+    assert np.all(word_lengths(before) != 3)
+
+    mined, _ = mine_hard_negatives(_score_by_length, CharVectorizer(), generate_words(5000, seed=1), 0.5, DICTIONARY)
+    pool.update(mined)
+    assert len(pool) == min(len(mined), 1000)
+    hard_words = set(unpack_words(pool.words))
+    for count in (1000, 7):
+        batch = pool.sample(np.random.default_rng(2), count)
+        hard = int(round(count * 0.3))
+        assert len(batch) == count and not DICTIONARY.contains(batch).any()
+        assert set(unpack_words(batch[:hard])) <= hard_words
+    assert np.array_equal(pool.sample(3, 100), pool.sample(3, 100))
+
+
+def test_update_keeps_the_newest_words():
+    pool = HardNegativePool(GeneratedNegatives(), capacity=3)
+    pool.update(pack_words(['aaaa', 'bbbb']))
+    pool.update(pack_words(['cccc', 'dddd']))
+    assert unpack_words(pool.words) == ['bbbb', 'cccc', 'dddd']
+
+
+def test_callback_refills_the_pool_every_few_epochs():
+    pytest.importorskip('tensorflow')
+
+    class Model:
+        def predict(self, tokens, verbose=0):
+            return _score_by_length(tokens)[:, None]
+
+    pool = HardNegativePool(GeneratedNegatives(dictionary=DICTIONARY))
+    callback = mining_callback(pool, CharVectorizer(), every=2, candidates=2000, dictionary=DICTIONARY)
+    callback.set_model(Model())
+    callback.on_epoch_end(0)
+    assert len(pool) == 0
+    callback.on_epoch_end(1)
+    assert len(pool) > 0 and np.all(word_lengths(pool.words) >= 6)
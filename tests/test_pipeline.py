@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from blabrecs.pipeline import negative_batches, split_batch, steps_per_epoch
+from blabrecs.wordgen import generate_words
+
+# Only batch contents are checked, so the packed words skip tokenizing.
+POSITIVES = generate_words(1000, seed=0)
+
+
+def _epoch(epoch, num_shards=3, **kwargs):
+    return [batch for shard in range(num_shards)
+            for batch in negative_batches(POSITIVES, np.asarray, batch_size=70,
+                                          negative_multiplier=6, seed=1, epoch=epoch, shard=shard,
+                                          num_shards=num_shards, **kwargs)]
+
+
+def test_epoch_sees_every_positive_once():
+    batches = _epoch(0)
+    assert len(batches) == steps_per_epoch(len(POSITIVES), 70, 6, num_shards=3)
+    x = np.concatenate([x for x, _ in batches])
+    y = np.concatenate([y for _, y in batches])
+    assert y.sum() == len(POSITIVES)
+    assert (y == 0).sum() == 6 * len(POSITIVES)
+    seen = {row.tobytes() for row in x[y == 1].astype(POSITIVES.dtype)}
+    assert seen == {row.tobytes() for row in POSITIVES}
+    assert split_batch(70, 6) == (10, 60)
+
+
+def test_negatives_are_fresh_every_epoch():
+    first = [x for x, _ in _epoch(0)]
+    again = [x for x, _ in _epoch(0)]
+    second = [x for x, _ in _epoch(1)]
+    assert all(np.array_equal(a, b) for a, b in zip(first, again))
+    assert not any(np.array_equal(a, b) for a, b in zip(first, second))
+
+
+def test_make_dataset_runs_past_the_first_epoch():
+    tf = pytest.importorskip('tensorflow')
+    from blabrecs.pipeline import make_dataset
+
+    dataset, steps = make_dataset(POSITIVES, np.asarray, batch_size=70,
+                                  negative_multiplier=6, seed=1, num_shards=3)
+    batches = [x.numpy() for x, _ in dataset.take(3 * steps)]
+    assert len(batches) == 3 * steps
+    epochs = [batches[i * steps:(i + 1) * steps] for i in range(3)]
+    for earlier, later in ((0, 1), (1, 2)):
+        assert not any(np.array_equal(a, b) for a, b in zip(epochs[earlier], epochs[later]))
+    assert tf.data.experimental.cardinality(dataset) == tf.data.experimental.INFINITE_CARDINALITY
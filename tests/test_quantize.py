@@ -0,0 +1,39 @@
+import json
+import os
+
+import numpy as np
+
+from blabrecs.inference import NumpyModel
+from blabrecs.quantize import export_quantized, quantize_and_report
+
+DATA = os.path.join(os.path.dirname(__file__), 'data')
+TINY_CNN = os.path.join(DATA, 'tiny_cnn', 'model.json')
+
+
+def test_dequantized_weights_are_within_half_a_step(tmp_path):
+    model = NumpyModel.load(TINY_CNN)
+    sizes = export_quantized(model, str(tmp_path))
+    quantized = NumpyModel.load(sizes['model_json'])
+    with open(sizes['model_json']) as f:
+        manifest = {w['name']: w for w in json.load(f)['weightsManifest'][0]['weights']}
+    for name, weight in model.weights.items():
+        quantization = manifest[name].get('quantization')
+        if weight.ndim >= 2:
+            assert quantization['dtype'] == 'uint8'
+            step = quantization['scale']
+        else:
+            assert quantization is None
+            step = 0.0
+        np.testing.assert_allclose(quantized.weights[name], weight, rtol=0, atol=step / 2 + 1e-6)
+    assert os.path.getsize(tmp_path / 'group1-shard1of1.bin') < sizes['float32_bytes'] / 3
+
+
+def test_report_compares_the_reloaded_model(tmp_path):
+    reference = np.load(os.path.join(DATA, 'tiny_cnn', 'reference.npz'))
+    labels = reference['predictions'][:, 0] > 0.5
+    report = quantize_and_report(NumpyModel.load(TINY_CNN), str(tmp_path), reference['tokens'], labels)
+    assert set(report) == {'count', 'threshold', 'float32', 'tfjs_uint8', 'sizes'}
+    assert report['float32']['accuracy'] == 1.0
+    assert report['tfjs_uint8']['max_abs_diff'] < 0.05
+    assert report['tfjs_uint8']['flipped'] <= 0.05
+    assert os.path.exists(tmp_path / 'quantization_report.json')
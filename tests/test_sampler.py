@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.packed import unpack_words
+from blabrecs.sampler import sample_plausible_words
+from blabrecs.wordgen import generate_words
+
+
+class _ScoreByLength:
+    # Scores every word 0.1 * its length; the tokens' non-zero count is the length.
+    def predict(self, tokens):
+        return (np.count_nonzero(tokens, axis=1) / np.float32(10)).astype(np.float32)[:, None]
+
+
+def test_yields_k_distinct_non_dictionary_words_above_the_cutoff():
+    # Uniform lengths are 3-24, so most candidates score above 0.75.
+    dictionary = DictionaryIndex.from_words(unpack_words(generate_words(2000, random_dist='uniform', seed=0)))
+    found = list(sample_plausible_words(500, 0.75, predict=_ScoreByLength().predict, dictionary=dictionary,
+                                        random_dist='uniform', seed=0, min_batch=256))
+    words = [word for word, _ in found]
+    assert len(words) == len(set(words)) == 500
+    assert all(len(word) >= 8 and score > 0.75 for word, score in found)
+    assert not dictionary.contains(words).any()
+
+
+def test_unreachable_cutoff_raises():
+    # No candidate is longer than 24 letters, so nothing scores above 2.5.
+    with pytest.raises(ValueError, match='found 0 of 10 words'):
+        list(sample_plausible_words(10, 2.5, predict=_ScoreByLength().predict, random_dist='uniform',
+                                    seed=0, min_batch=64, max_batch=256, max_idle_batches=5))
+
+
+def test_max_candidates_stops_early_without_raising():
+    found = list(sample_plausible_words(10, 2.5, predict=_ScoreByLength().predict, random_dist='uniform',
+                                        seed=0, min_batch=64, max_batch=256, max_candidates=1000))
+    assert found == []
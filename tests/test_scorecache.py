@@ -0,0 +1,66 @@
+import os
+
+import numpy as np
+
+from blabrecs.inference import NumpyModel
+from blabrecs.packed import unpack_words
+from blabrecs.scorecache import CachedScorer, ScoreCache, model_digest
+from blabrecs.vectorize import CharVectorizer
+from blabrecs.wordgen import generate_words
+
+TINY_CNN = os.path.join(os.path.dirname(__file__), 'data', 'tiny_cnn', 'model.json')
+
+
+class _Counting:
+    def __init__(self, model):
+        self.model = model
+        self.weights = model.weights
+        self.scored = 0
+
+    def predict(self, tokens):
+        self.scored += len(tokens)
+        return self.model.predict(tokens)
+
+
+def test_hits_and_misses_give_the_model_scores(tmp_path):
+    model = NumpyModel.load(TINY_CNN)
+    words = unpack_words(generate_words(300, letter_dist='english', seed=0))
+    expected = model.predict(CharVectorizer().transform(words))[:, 0]
+    path = str(tmp_path / 'scores.sqlite')
+
+    counting = _Counting(model)
+    scorer = CachedScorer.for_model(counting, cache=ScoreCache(path, capacity=100), batch_size=64)
+    np.testing.assert_array_equal(scorer.score_words(words[:200]), expected[:200])
+    assert counting.scored == len(set(words[:200]))
+    # The LRU holds the last 100 words scored, so words[50:100] are only on disk.
+    mixed = words[50:] + words[100:150]
+    np.testing.assert_array_equal(scorer.score_words(mixed), np.concatenate([expected[50:], expected[100:150]]))
+    assert counting.scored == len(set(words))
+    report = scorer.cache.report()
+    assert report['disk_hits'] == 50 and report['memory_hits'] == 150 and report['memory_entries'] == 100
+    assert report['lookups'] == 200 + len(mixed)
+    scorer.cache.close()
+
+    counting = _Counting(model)
+    reopened = CachedScorer.for_model(counting, cache=ScoreCache(path))
+    np.testing.assert_array_equal(reopened.score_words(words), expected)
+    assert counting.scored == 0 and reopened.cache.report()['hit_rate'] == 1.0
+
+
+def test_a_changed_model_or_tokenizer_misses():
+    model = NumpyModel.load(TINY_CNN)
+    weights = dict(model.weights)
+    name = sorted(weights)[0]
+    weights[name] = weights[name] + 1
+    changed = NumpyModel(model.layers, weights, model.model_topology)
+    assert model_digest(changed.weights) != model_digest(model.weights)
+    assert (model_digest(model.weights, CharVectorizer({'a': 1, 'b': 2}))
+            != model_digest(model.weights, CharVectorizer()))
+
+    cache = ScoreCache()
+    words = ['glorp', 'blick', 'snurfle']
+    CachedScorer.for_model(model, cache=cache).score_words(words)
+    counting = _Counting(changed)
+    scores = CachedScorer.for_model(counting, cache=cache).score_words(words)
+    np.testing.assert_array_equal(scores, changed.predict(CharVectorizer().transform(words))[:, 0])
+    assert counting.scored == 3
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+
+from blabrecs.markov import MarkovModel
+from blabrecs.server import MicroBatcher, WordChecker, _handle
+
+ROOT = os.path.join(os.path.dirname(__file__), os.pardir)
+SCORES = {'glorp': 0.95, 'blick': 0.2, 'snorp': np.float32(0.82), 'bumfle': 0.9}
+
+
+class _Words:
+    # Stands in for the vectorizer so that `predict` sees the words themselves.
+    def transform(self, words):
+        return words
+
+
+def _predict(words):
+    return np.array([SCORES[w] for w in words], dtype=np.float32)
+
+
+def _checker(**kwargs):
+    return WordChecker({'table', 'glorps'}, 'neural', predict=_predict, vectorizer=_Words(),
+                       badwords=['bum'], **kwargs)
+
+
+def test_checks_give_the_app_messages():
+    async def check_all(words):
+        checker = _checker()
+        try:
+            return await asyncio.gather(*(checker.check(w) for w in words))
+        finally:
+            await checker.batcher.stop()
+
+    words = ['', '  ', 'gl0rp', 'ab', 'a' * 16, 'Table', 'blick', 'snorp', 'bumfle', ' GLORP ']
+    results = asyncio.run(check_all(words))
+    assert [(r['status'], r['msg']) for r in results] == [
+        ('empty', 'type in a word!'),
+        ('empty', 'type in a word!'),
+        ('err', 'hey! letters only!'),
+        ('err', "that's too short to be a word!"),
+        ('err', "that's too long, it won't fit on the board!"),
+        ('err', "can't play that, it's in the dictionary!"),
+        ('err', "no way that's a word!"),
+        # Like the app, a score must exceed 0.82.
+        ('err', "no way that's a word!"),
+        ('err', "no way that's a word!"),
+        ('ok', 'looks good to me!')]
+    assert results[-1]['score'] == np.float32(0.95) and results[0]['score'] is None
+
+
+def test_concurrent_words_are_scored_in_one_batch():
+    calls = []
+
+    def score_batch(words):
+        calls.append(list(words))
+        return [len(w) for w in words]
+
+    async def score_all():
+        batcher = MicroBatcher(score_batch, max_batch=4, max_delay=0.05)
+        try:
+            return await asyncio.gather(*(batcher.score(w) for w in ['a', 'bb', 'ccc', 'dddd', 'eeeee', 'ff']))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(score_all()) == [1.0, 2.0, 3.0, 4.0, 5.0, 2.0]
+    assert calls == [['a', 'bb', 'ccc', 'dddd'], ['eeeee', 'ff']]
+
+
+def test_markov_mode_matches_the_model():
+    markov = MarkovModel.load(os.path.join(ROOT, 'model.edn'))
+    words = ['glorp', 'blick', 'xzqvv', 'snurfle', 'qqqqq', 'tharn']
+
+    async def check_all():
+        checker = WordChecker(set(), 'markov', markov=markov)
+        try:
+            return await asyncio.gather(*(checker.check(w) for w in words))
+        finally:
+            await checker.batcher.stop()
+
+    results = asyncio.run(check_all())
+    assert [r['status'] == 'ok' for r in results] == markov.sufficiently_probable(words).tolist()
+    assert {r['status'] for r in results} == {'ok', 'err'}
+
+
+def test_line_protocol_answers_in_order():
+    async def session():
+        checker = _checker(max_delay=0.01)
+        server = await asyncio.start_server(lambda r, w: _handle(checker, r, w), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'glorp\nab\nblick\nSTATS\n')
+            await writer.drain()
+            writer.write_eof()
+            replies = [json.loads(line) async for line in reader]
+            writer.close()
+            return replies
+        finally:
+            server.close()
+            await checker.batcher.stop()
+
+    glorp, ab, blick, stats = asyncio.run(session())
+    assert (glorp['word'], glorp['status']) == ('glorp', 'ok')
+    assert (ab['word'], ab['msg']) == ('ab', "that's too short to be a word!")
+    assert (blick['word'], blick['status']) == ('blick', 'err')
+    assert stats['requests'] == 2 and stats['batches'] == 1 and stats['batch_size_histogram'] == {'2': 1}
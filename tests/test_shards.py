@@ -0,0 +1,57 @@
+import numpy as np
+
+from blabrecs.dictionary import DictionaryIndex
+from blabrecs.packed import pack_words, unique_packed, unpack_words
+from blabrecs.shards import BloomDictionary, BloomFilter, NegativeShards, build_shards
+from blabrecs.wordgen import generate_words
+
+
+def test_bloom_filter_has_no_false_negatives():
+    words = generate_words(20000, seed=0)
+    bloom = BloomFilter.for_capacity(len(words), error_rate=0.01)
+    bloom.add(words)
+    assert bloom.might_contain(words).all()
+    others = unique_packed(generate_words(20000, seed=1))
+    others = others[~DictionaryIndex.from_words(unpack_words(words)).contains(others)]
+    assert bloom.might_contain(others).mean() < 0.03
+
+
+def test_bloom_dictionary_is_exact():
+    index = DictionaryIndex.from_words(unpack_words(generate_words(5000, random_dist='uniform', seed=2, max_length=3)))
+    bloom = BloomDictionary(index)
+    # Three-letter words, so about a quarter of the queries are in the dictionary.
+    queries = pack_words(unpack_words(generate_words(20000, random_dist='uniform', seed=3, max_length=3)))
+    np.testing.assert_array_equal(bloom.contains(queries), index.contains(queries))
+    assert bloom.stats['queries'] == len(queries)
+    assert 0 < bloom.stats['found'] < len(queries)
+    # A word one letter too long packs to the same 24 letters but is not in the dictionary.
+    long_words = BloomDictionary(DictionaryIndex.from_words(['electroencephalographies']))
+    assert long_words.contains(['electroencephalographies', 'electroencephalographiesx']).tolist() == [True, False]
+
+
+def test_shards_hold_each_generated_word_once(tmp_path):
+    dictionary = DictionaryIndex.from_words(unpack_words(generate_words(2000, seed=4)))
+    path = str(tmp_path / 'negatives')
+    manifest = build_shards(path, 30000, seed=5, dictionary=dictionary,
+                            shard_size=7000, bucket_size=10000, chunk_size=8000)
+    negatives = NegativeShards(path)
+    words = np.concatenate(list(negatives))
+    assert len(words) == len(negatives) == manifest['count']
+    assert [len(s) for s in negatives] == [7000] * (len(words) // 7000) + ([len(words) % 7000] if len(words) % 7000 else [])
+    assert len(unique_packed(words)) == len(words)
+    assert not dictionary.contains(words).any()
+    stats = manifest['stats']
+    assert stats['generated'] == 30000
+    assert stats['generated'] - stats['dictionary_rejected'] - stats['duplicates'] == len(words)
+
+    rows = np.random.default_rng(6).integers(0, len(words), 5000)
+    np.testing.assert_array_equal(negatives.take(rows), words[rows])
+    assert negatives.sample(7, 100).shape == (100, words.shape[1])
+
+
+def test_shards_depend_only_on_seed(tmp_path):
+    kwargs = dict(seed=8, shard_size=5000, bucket_size=4000, chunk_size=3000)
+    build_shards(str(tmp_path / 'a'), 12000, **kwargs)
+    build_shards(str(tmp_path / 'b'), 12000, **kwargs)
+    for a, b in zip(NegativeShards(str(tmp_path / 'a')), NegativeShards(str(tmp_path / 'b'))):
+        np.testing.assert_array_equal(a, b)
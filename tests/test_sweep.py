@@ -0,0 +1,74 @@
+import csv
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from blabrecs.sweep import _batches, grid, kfold_indices, leaderboard, random_search, run_sweep
+
+
+def test_kfold_indices_partition_the_split():
+    folds = kfold_indices(103, 5, seed=1)
+    assert len(folds) == 5
+    valid = np.concatenate([v for _, v in folds])
+    assert sorted(valid.tolist()) == list(range(103))
+    for train, v in folds:
+        assert len(v) in (20, 21) and not np.intersect1d(train, v).size
+        assert len(train) + len(v) == 103
+    assert all(np.array_equal(a, b) for fold, same in zip(folds, kfold_indices(103, 5, seed=1))
+               for a, b in zip(fold, same))
+
+
+def test_batches_cover_every_index_once_per_epoch():
+    tokens = np.arange(50)[:, None] * np.ones((1, 3), dtype=int)
+    labels = np.arange(50) % 2 == 0
+    indices = np.arange(0, 50, 2)
+    generate = _batches(tokens, labels, indices, 10, seed=0, epoch_counter=itertools.count())
+    epochs = [list(generate()), list(generate())]
+    for batches in epochs:
+        rows = np.concatenate([x[:, 0] for x, _ in batches])
+        assert sorted(rows.tolist()) == indices.tolist()
+        assert all(np.all(np.diff(x[:, 0]) > 0) and y.all() for x, y in batches)
+    assert [x[:, 0].tolist() for x, _ in epochs[0]] != [x[:, 0].tolist() for x, _ in epochs[1]]
+
+
+def test_configs_reject_unknown_params():
+    assert grid({'filters': [32, 64], 'blocks': [1]}) == [{'blocks': 1, 'filters': 32}, {'blocks': 1, 'filters': 64}]
+    assert random_search({'filters': [32, 64]}, 3, seed=0) == random_search({'filters': [32, 64]}, 3, seed=0)
+    with pytest.raises(ValueError):
+        grid({'epochs': [1]})
+
+
+def _result(filters, fold, val_acc):
+    return {'config': {'filters': filters}, 'fold': fold, 'val_acc': val_acc, 'val_loss': 1 - val_acc,
+            'wall_seconds': 1.0}
+
+
+def test_leaderboard_averages_folds_and_ranks():
+    results = [_result(32, 0, 0.8), _result(64, 0, 0.9), _result(32, 1, 0.9), _result(64, 1, 0.7),
+               _result(16, 0, 0.86)]
+    rows = leaderboard(results)
+    assert [(row['rank'], row['config']['filters']) for row in rows] == [(1, 16), (2, 32), (3, 64)]
+    assert rows[1]['val_acc'] == pytest.approx(0.85) and rows[1]['val_acc_std'] == pytest.approx(0.05)
+    assert rows[1]['folds'] == 2 and rows[1]['wall_seconds'] == 2.0
+    assert [row['config']['filters'] for row in leaderboard(results, 'val_loss', False)] == [16, 32, 64]
+
+
+def _fake_trial(dataset_path, config, fold, folds, threads=1):
+    # Runs in a spawned worker, so it is a module-level function.
+    return _result(config['filters'], fold, config['filters'] / 100 + fold / 1000)
+
+
+def test_run_sweep_writes_trials_and_leaderboard(tmp_path):
+    rows = run_sweep('unused', grid({'filters': [10, 30]}), folds=3, out_dir=str(tmp_path), workers=2,
+                     trial=_fake_trial)
+    assert [(row['config'], row['folds']) for row in rows] == [({'filters': 30}, 3), ({'filters': 10}, 3)]
+    with open(tmp_path / 'trials.jsonl') as f:
+        trials = [json.loads(line) for line in f]
+    assert sorted((t['config']['filters'], t['fold']) for t in trials) == [(f, k) for f in (10, 30) for k in range(3)]
+    with open(tmp_path / 'leaderboard.csv') as f:
+        table = list(csv.reader(f))
+    assert table[0][:2] == ['rank', 'filters'] and [r[:2] for r in table[1:]] == [['1', '30'], ['2', '10']]
+    with open(tmp_path / 'leaderboard.json') as f:
+        assert json.load(f) == rows
@@ -0,0 +1,65 @@
+import os
+
+import pytest
+
+from blabrecs.trace import NullTracer, Tracer, read_trace, trace_callback
+
+
+def test_nested_stages_and_events(tmp_path):
+    path = str(tmp_path / 'logs' / 'trace.jsonl')
+    tracer = Tracer(path, echo=False)
+    with tracer.stage('build', seed=3) as build:
+        with tracer.stage('generate', items=100):
+            tracer.event('chunk', rows=50)
+        with pytest.raises(ValueError):
+            with tracer.stage('tokenize'):
+                raise ValueError('bad word')
+        build['items'] = 7
+    records = read_trace(path)
+    assert [(r['type'], r['name'], r['parent']) for r in records] == [('event', 'chunk', 'build/generate'),
+                                                                       ('stage', 'generate', 'build'),
+                                                                       ('stage', 'tokenize', 'build'),
+                                                                       ('stage', 'build', None)]
+    event, generate, tokenize, build = records
+    assert event['rows'] == 50
+    assert generate['items'] == 100 and generate['items_per_second'] > 0
+    assert tokenize['error'] == "ValueError('bad word')" and tokenize['items'] is None
+    assert build['items'] == 7 and build['seed'] == 3
+    assert build['wall_seconds'] >= generate['wall_seconds'] + tokenize['wall_seconds']
+    assert all(r['cpu_seconds'] >= 0 for r in records[1:])
+
+
+def test_echo_prints_one_line_per_stage(tmp_path, capsys):
+    tracer = Tracer(str(tmp_path / 'trace.jsonl'))
+    with tracer.stage('outer'):
+        with tracer.stage('inner', items=1234):
+            pass
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(':')[0] for line in lines] == ['[trace] outer/inner', '[trace] outer']
+    assert lines[0].endswith('1,234 items')
+
+
+def test_null_tracer_writes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracer = NullTracer()
+    with tracer.stage('outer') as stage:
+        tracer.event('tick')
+        stage['items'] = 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_epoch_records_split_step_and_wait_time(tmp_path):
+    pytest.importorskip('tensorflow')
+    path = str(tmp_path / 'trace.jsonl')
+    tracer = Tracer(path, echo=False)
+    callback = trace_callback(tracer)
+    with tracer.stage('fit'):
+        callback.on_epoch_begin(0)
+        for batch in range(3):
+            callback.on_train_batch_begin(batch)
+            callback.on_train_batch_end(batch)
+        callback.on_epoch_end(0, {'loss': 0.5})
+    epoch = read_trace(path)[0]
+    assert epoch['type'] == 'epoch' and epoch['parent'] == 'fit' and epoch['steps'] == 3
+    assert epoch['logs'] == {'loss': 0.5}
+    assert epoch['step_seconds_total'] + epoch['input_wait_seconds'] <= epoch['wall_seconds']
@@ -0,0 +1,43 @@
+from collections import Counter
+
+import numpy as np
+
+from blabrecs.packed import MAX_WORD_LENGTH, pack_words
+from blabrecs.vectorize import NEURAL_CHAR_INDEX, CharVectorizer, fit_char_index
+
+WORDS = ['glorp', 'Wug', "don't", '', 'x', 'a' * MAX_WORD_LENGTH, 'abcdefghijklmnopqrstuvwxyz0123', 'é-ok', 'q9']
+
+
+def _reference(words, char_index, max_length=MAX_WORD_LENGTH):
+    # Tokenizer(char_level=True, lower=True, oov_token='@') + pad_sequences(padding='post').
+    out = np.zeros((len(words), max_length), dtype=np.int64)
+    for i, word in enumerate(words):
+        tokens = [char_index.get(c, char_index['@']) for c in word.lower()][-max_length:]
+        out[i, :len(tokens)] = tokens
+    return out
+
+
+def test_transform_matches_reference():
+    vectorizer = CharVectorizer()
+    ascii_words = [w.encode('ascii', 'replace').decode() for w in WORDS]
+    np.testing.assert_array_equal(vectorizer.transform(WORDS), _reference(ascii_words, NEURAL_CHAR_INDEX))
+    short = [w for w in ascii_words if len(w) <= MAX_WORD_LENGTH]
+    np.testing.assert_array_equal(vectorizer.transform(short), _reference(short, NEURAL_CHAR_INDEX))
+
+
+def test_transform_buffer_and_packed_agree():
+    vectorizer = CharVectorizer()
+    words = [w for w in WORDS if w.isascii() and len(w) <= MAX_WORD_LENGTH]
+    expected = vectorizer.transform(words)
+    buffer = '\r\n'.join(words).encode('ascii') + b'\n'
+    np.testing.assert_array_equal(vectorizer.transform_buffer(buffer), expected)
+    np.testing.assert_array_equal(vectorizer.transform_packed(pack_words(words)), expected)
+    assert vectorizer.transform_buffer(b'').shape == (0, MAX_WORD_LENGTH)
+
+
+def test_fit_char_index_orders_by_frequency_then_first_occurrence():
+    words = ['banana', 'Cab', 'dab']
+    counts = Counter(''.join(words).lower())
+    first = {c: i for i, c in reversed(list(enumerate(''.join(words).lower())))}
+    chars = sorted(counts, key=lambda c: (-counts[c], first[c]))
+    assert fit_char_index(words) == {'@': 1, **{c: i + 2 for i, c in enumerate(chars)}}
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from blabrecs.packed import MAX_WORD_LENGTH, pack_words, unique_packed, unpack_words, word_lengths
+from blabrecs.wordgen import (RANDOM_DISTS, english_letters, generate_lengths, generate_words,
+                              generate_words_parallel)
+
+
+def test_pack_unpack_round_trip():
+    words = ['a', 'glorp', 'z' * MAX_WORD_LENGTH, 'wug']
+    packed = pack_words(words)
+    assert packed.shape == (4, MAX_WORD_LENGTH) and packed.dtype == np.uint8
+    assert unpack_words(packed) == words
+    np.testing.assert_array_equal(word_lengths(packed), [1, 5, 24, 3])
+    assert pack_words([]).shape == (0, MAX_WORD_LENGTH)
+
+
+def test_unique_packed_matches_sorted_set():
+    words = unpack_words(generate_words(20000, random_dist='uniform', seed=0, max_length=4)) * 2
+    assert unpack_words(unique_packed(pack_words(words))) == sorted(set(words))
+
+
+@pytest.mark.parametrize('random_dist', RANDOM_DISTS)
+def test_lengths_in_range(random_dist):
+    lengths = generate_lengths(50000, random_dist, seed=1)
+    assert lengths.min() >= 3 and lengths.max() <= MAX_WORD_LENGTH
+
+
+@pytest.mark.parametrize('letter_dist', ['random', 'english'])
+def test_words_are_padded_and_use_the_letter_set(letter_dist):
+    words = generate_words(20000, letter_dist=letter_dist, seed=2)
+    lengths = word_lengths(words)
+    # All characters come first, then only padding.
+    columns = np.arange(MAX_WORD_LENGTH)
+    np.testing.assert_array_equal(words != 0, columns < lengths[:, None])
+    chars = set(np.unique(words[words != 0]).tobytes().decode('ascii'))
+    allowed = set('abcdefghijklmnopqrstuvwxyz') if letter_dist == 'random' else set(english_letters)
+    assert chars <= allowed
+
+
+def test_same_seed_same_words():
+    np.testing.assert_array_equal(generate_words(70000, seed=3), generate_words(70000, seed=3))
+    assert not np.array_equal(generate_words(1000, seed=3), generate_words(1000, seed=4))
+
+
+def test_unknown_distributions_raise():
+    with pytest.raises(ValueError):
+        generate_words(10, random_dist='nope')
+    with pytest.raises(ValueError):
+        generate_words(10, letter_dist='nope')
+
+
+def test_parallel_generation_is_deterministic():
+    first = generate_words_parallel(10001, seed=5, workers=3)
+    np.testing.assert_array_equal(first, generate_words_parallel(10001, seed=5, workers=3))
+    np.testing.assert_array_equal(generate_words_parallel(1000, seed=5, workers=1),
+                                  generate_words(1000, seed=np.random.SeedSequence(5).spawn(1)[0]))
+
+
+def test_parallel_generation_accepts_seed_sequence_children():
+    # makeUpSomeWords passes children of one SeedSequence.
+    child = np.random.SeedSequence(6).spawn(2)[1]
+    words = generate_words_parallel(5000, seed=child, workers=2)
+    assert words.shape == (5000, MAX_WORD_LENGTH)